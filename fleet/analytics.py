@@ -0,0 +1,264 @@
+# fleet/analytics.py
+"""รายงานหนัก (เทียบหลายปีงบฯ / แนวโน้มค่าซ่อมรายคัน / อัตราการใช้รถ)
+
+engine ตั้งด้วย env FLEET_ANALYTICS:
+    auto     (ค่าเริ่มต้น) ใช้ DuckDB ถ้าติดตั้งไว้ ไม่งั้นใช้ SQLite
+    duckdb   บังคับ DuckDB (ไม่มี -> error)
+    sqlite   ไม่ใช้ DuckDB
+
+DuckDB แนบไฟล์ fleet.db แบบ READ_ONLY (extension sqlite) แล้วรันแบบ vectorized หลาย core
+อ่านจากตารางต้นทางโดยตรง ; การเขียนของหน้าเว็บยังอยู่บน SQLite ตามเดิม (ไม่ถือ lock เขียน)
+SQLite (fallback) ใช้ rollup (fleet/rollups.py) + snapshot คอลัมน์ (fleet/columnar.py)
+ทั้งสองทางรวมประวัติที่ย้ายไป *_archive แล้ว (fleet/archive.py)
+ผลของทั้งสอง engine นับด้วยเงื่อนไขเดียวกับ rollup
+
+    python -m fleet.analytics fy-compare 2021 2025
+    python -m fleet.analytics cost-trend 2023 2025 [car_id]
+    python -m fleet.analytics utilization 2025-10-01 2025-11-01
+"""
+from __future__ import annotations
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import text
+
+from fleet.db import DATABASE_URL, engine
+from fleet.fiscal import FISCAL_START_MONTH, now_local, sql_fiscal_year
+
+ENGINE = os.getenv("FLEET_ANALYTICS", "auto").strip().lower()
+
+_lock = threading.Lock()
+_local = threading.local()
+_duck = None            # connection หลักของ DuckDB (in-memory + แนบ fleet.db)
+
+
+def _sqlite_path() -> str | None:
+    prefix = "sqlite:///"
+    return DATABASE_URL[len(prefix):] if DATABASE_URL.startswith(prefix) else None
+
+def _duck_root():
+    """สร้าง connection DuckDB ครั้งแรกที่เรียก (import duckdb แบบ lazy)"""
+    global _duck
+    with _lock:
+        if _duck is None:
+            import duckdb
+            path = _sqlite_path()
+            if path is None:
+                raise RuntimeError("DuckDB analytics ต้องใช้ฐานข้อมูล SQLite แบบไฟล์")
+            con = duckdb.connect()
+            try:
+                con.execute("LOAD sqlite")
+            except Exception:
+                con.execute("INSTALL sqlite")
+                con.execute("LOAD sqlite")
+            # ค่าเวลาใน SQLite เป็นข้อความ -> อ่านเป็น VARCHAR แล้ว TRY_CAST เอง (แถวเพี้ยนไม่ทำให้ทั้ง query ล้ม)
+            con.execute("SET sqlite_all_varchar = true")
+            con.execute(f"ATTACH '{path}' AS fleet (TYPE SQLITE, READ_ONLY)")
+            for name, sql in _DUCK_VIEWS.items():
+                con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql}")
+            _duck = con
+    return _duck
+
+def _duck_cursor():
+    """cursor ต่อ thread (connection เดียวกันใช้พร้อมกันหลาย thread ไม่ได้)"""
+    cur = getattr(_local, "cur", None)
+    if cur is None:
+        cur = _local.cur = _duck_root().cursor()
+    return cur
+
+def use_duckdb() -> bool:
+    if ENGINE == "sqlite":
+        return False
+    if ENGINE == "duckdb":
+        return True
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return _sqlite_path() is not None
+
+def _duck_rows(sql: str, params: dict) -> list[dict]:
+    cur = _duck_cursor().execute(sql, params)
+    cols = [d[0] for d in cur.description]
+    return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+def _rows(sql: str, params: dict) -> list[dict]:
+    with engine.begin() as conn:
+        return [dict(r) for r in conn.execute(text(sql), params).mappings().all()]
+
+
+# ---------- DuckDB views (เงื่อนไขเดียวกับ rollups._usage_counts / _maint_counts) ----------
+_DUCK_VIEWS = {
+    "a_cars": """
+        SELECT TRY_CAST(id AS INTEGER) AS id, plate, car_condition FROM fleet.cars
+    """,
+    "a_usage": """
+        SELECT TRY_CAST(car_id AS INTEGER)             AS car_id,
+               TRY_CAST(start_time AS TIMESTAMP)       AS st,
+               TRY_CAST(returned_at AS TIMESTAMP)      AS rt,
+               TRY_CAST(planned_end_time AS TIMESTAMP) AS pe,
+               COALESCE(TRY_CAST(is_maintenance AS INTEGER), 0) AS im
+        FROM (SELECT car_id, start_time, returned_at, planned_end_time, is_maintenance FROM fleet.usage_logs
+              UNION ALL
+              SELECT car_id, start_time, returned_at, planned_end_time, is_maintenance FROM fleet.usage_logs_archive)
+    """,
+    "a_orders": """
+        SELECT TRY_CAST(car_id AS INTEGER)               AS car_id,
+               TRY_CAST(accept_date AS DATE)             AS ad,
+               COALESCE(TRY_CAST(grand_total AS DOUBLE), 0) AS gt
+        FROM (SELECT car_id, accept_date, grand_total FROM fleet.maintenance_orders
+              UNION ALL
+              SELECT car_id, accept_date, grand_total FROM fleet.maintenance_orders_archive)
+        WHERE accept_date IS NOT NULL AND accept_date <> ''
+    """,
+}
+
+def _duck_fy(col: str) -> str:
+    return f"year({col} - INTERVAL {FISCAL_START_MONTH - 1} MONTH)"
+
+
+# ---------- reports ----------
+def fy_compare(first_fy: int, last_fy: int) -> list[dict]:
+    """ต่อปีงบฯ: จำนวนใบงาน, ยอดซ่อม, จำนวนเที่ยว, ชั่วโมงใช้งาน (ปีที่ไม่มีข้อมูลได้ 0)"""
+    if use_duckdb():
+        rows = _duck_rows(f"""
+            WITH m AS (
+                SELECT {_duck_fy('ad')} AS fy, COUNT(*) AS orders, SUM(gt) AS spend
+                FROM a_orders WHERE ad IS NOT NULL AND car_id IS NOT NULL
+                GROUP BY 1
+            ), u AS (
+                SELECT {_duck_fy('st')} AS fy, COUNT(*) AS trips,
+                       SUM(CASE WHEN rt IS NOT NULL THEN epoch(rt) - epoch(st) ELSE 0 END) / 3600.0 AS hours
+                FROM a_usage WHERE im = 0 AND st IS NOT NULL AND car_id IS NOT NULL
+                GROUP BY 1
+            )
+            SELECT fy, m.orders, m.spend, u.trips, u.hours
+            FROM m FULL JOIN u USING (fy)
+            WHERE fy BETWEEN $lo AND $hi
+        """, {"lo": first_fy, "hi": last_fy})
+    else:
+        rows = _rows(f"""
+            SELECT {sql_fiscal_year('month')} AS fy, SUM(orders) AS orders, SUM(spend) AS spend,
+                   NULL AS trips, NULL AS hours
+            FROM maint_monthly GROUP BY 1
+            UNION ALL
+            SELECT {sql_fiscal_year('day')} AS fy, NULL, NULL, SUM(trips), SUM(hours)
+            FROM usage_daily GROUP BY 1
+        """, {})
+    out = {fy: {"fy": fy, "orders": 0, "spend": 0.0, "trips": 0, "hours": 0.0}
+           for fy in range(first_fy, last_fy + 1)}
+    for r in rows:
+        acc = out.get(int(r["fy"]))
+        if acc is None:
+            continue
+        for k in ("orders", "trips"):
+            acc[k] += int(r[k] or 0)
+        for k in ("spend", "hours"):
+            acc[k] = round(acc[k] + float(r[k] or 0.0), 2)
+    return list(out.values())
+
+def cost_trend(first_fy: int, last_fy: int, car_id: int | None = None) -> list[dict]:
+    """ยอดซ่อมต่อคันต่อปีงบฯ (เรียงตามคัน แล้วตามปี)"""
+    params = {"lo": first_fy, "hi": last_fy, "car": car_id}
+    if use_duckdb():
+        return _duck_rows(f"""
+            SELECT o.car_id, COALESCE(c.plate, 'ID ' || o.car_id) AS plate,
+                   {_duck_fy('o.ad')} AS fy, COUNT(*) AS orders, ROUND(SUM(o.gt), 2) AS spend
+            FROM a_orders o LEFT JOIN a_cars c ON c.id = o.car_id
+            WHERE o.ad IS NOT NULL AND o.car_id IS NOT NULL
+              AND ($car IS NULL OR o.car_id = $car)
+              AND {_duck_fy('o.ad')} BETWEEN $lo AND $hi
+            GROUP BY 1, 2, 3 ORDER BY 1, 3
+        """, params)
+    return _rows(f"""
+        SELECT r.car_id, COALESCE(c.plate, 'ID ' || r.car_id) AS plate,
+               {sql_fiscal_year('r.month')} AS fy, SUM(r.orders) AS orders, ROUND(SUM(r.spend), 2) AS spend
+        FROM maint_monthly r LEFT JOIN cars c ON c.id = r.car_id
+        WHERE (:car IS NULL OR r.car_id = :car)
+          AND r.month >= :ms AND r.month < :me
+        GROUP BY 1, 2, 3 ORDER BY 1, 3
+    """, {"car": car_id, "ms": f"{first_fy:04d}-{FISCAL_START_MONTH:02d}",
+          "me": f"{last_fy + 1:04d}-{FISCAL_START_MONTH:02d}"})
+
+def utilization(start: datetime, end: datetime) -> list[dict]:
+    """ต่อคัน: ชั่วโมงที่ถูกใช้ / เข้าซ่อม ภายใน [start, end) และ % ของช่วงเวลา
+
+    รายการที่ยังไม่คืนนับถึงกำหนดคืน (ไม่มีกำหนด -> ถึงตอนนี้)
+    """
+    window_h = (end - start).total_seconds() / 3600.0
+    if window_h <= 0:
+        return []
+    now = now_local().replace(microsecond=0)
+    if use_duckdb():
+        rows = _duck_rows("""
+            WITH w AS (
+                SELECT car_id, im,
+                       epoch(LEAST(COALESCE(rt, pe, $now), $e)) - epoch(GREATEST(st, $s)) AS sec
+                FROM a_usage
+                WHERE st IS NOT NULL AND car_id IS NOT NULL AND st < $e
+                  AND COALESCE(rt, pe, $now) > $s
+            )
+            SELECT car_id,
+                   COUNT(*) FILTER (WHERE im = 0)            AS trips,
+                   SUM(sec) FILTER (WHERE im = 0) / 3600.0   AS hours,
+                   SUM(sec) FILTER (WHERE im = 1) / 3600.0   AS maint_hours
+            FROM w WHERE sec > 0 GROUP BY car_id
+        """, {"s": start, "e": end, "now": now})
+    else:
+        rows = _columnar_utilization(start, end, now)
+
+    plates = {r["id"]: r["plate"] for r in _rows("SELECT id, plate FROM cars", {})}
+    out = []
+    for r in rows:
+        hours = float(r["hours"] or 0.0)
+        out.append({
+            "car_id": int(r["car_id"]),
+            "plate": plates.get(r["car_id"], f"ID {r['car_id']}"),
+            "trips": int(r["trips"] or 0),
+            "hours": round(hours, 2),
+            "maint_hours": round(float(r["maint_hours"] or 0.0), 2),
+            "pct": round(min(hours / window_h * 100.0, 100.0), 1),
+        })
+    return sorted(out, key=lambda r: r["pct"], reverse=True)
+
+def _columnar_utilization(start: datetime, end: datetime, now: datetime) -> list[dict]:
+    from fleet.columnar import USAGE
+    c = USAGE.columns()
+    s, e = np.datetime64(start, "s"), np.datetime64(end, "s")
+    until = np.where(np.isnat(c["returned_at"]), c["planned_end"], c["returned_at"])
+    until = np.where(np.isnat(until), np.datetime64(now, "s"), until)
+    lo = np.maximum(c["start"], s)
+    hi = np.minimum(until, e)
+    car = c["car_id"]
+    ok = ~np.isnat(c["start"]) & (car > 0) & (hi > lo)
+    sec = np.where(ok, (hi - lo).astype(np.int64), 0)
+    use = ok & (c["is_maintenance"] == 0)
+    mnt = ok & (c["is_maintenance"] != 0)
+    n = int(car.max()) + 1 if len(car) else 0
+    trips = np.bincount(car[use], minlength=n)
+    hours = np.bincount(car[use], weights=sec[use], minlength=n) / 3600.0
+    maint = np.bincount(car[mnt], weights=sec[mnt], minlength=n) / 3600.0
+    ids = np.flatnonzero(trips + (maint > 0))
+    return [{"car_id": int(i), "trips": int(trips[i]), "hours": float(hours[i]),
+             "maint_hours": float(maint[i])} for i in ids]
+
+
+REPORTS = {"fy-compare": fy_compare, "cost-trend": cost_trend, "utilization": utilization}
+
+
+if __name__ == "__main__":
+    name, args = (sys.argv[1], sys.argv[2:]) if len(sys.argv) > 1 else (None, [])
+    if name not in REPORTS:
+        print("Usage: python -m fleet.analytics {fy-compare|cost-trend|utilization} ARGS...")
+        sys.exit(2)
+    conv = datetime.fromisoformat if name == "utilization" else int
+    t0 = time.perf_counter()
+    result = REPORTS[name](*[conv(a) for a in args])
+    ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    print(f"⏱ {name} ({'duckdb' if use_duckdb() else 'sqlite'}) {ms:.1f} ms", file=sys.stderr)
@@ -0,0 +1,268 @@
+# fleet/api.py
+"""JSON API สำหรับระบบอื่นที่ต้อง poll สถานะรถ (ไม่ต้องผ่าน Dash UI)
+
+- แบ่งหน้าแบบ cursor (?cursor=...&limit=...) ตอบกลับ {"items": [...], "next_cursor": ...}
+- เลือกคอลัมน์ได้ด้วย ?fields=id,plate,status_display
+- ทุก GET มี ETag; ส่ง If-None-Match มาเหมือนเดิม -> 304 (ไม่ต้องส่ง body ซ้ำ)
+- ใช้ฟังก์ชันอ่านชุดเดียวกับหน้าเว็บ (fleet/queries.py)
+- FLEET_ASYNC_DB=1 -> ตัวอ่านที่ถูกเรียกบ่อยวิ่งผ่าน async engine (fleet/aqueries.py)
+"""
+from __future__ import annotations
+import base64
+import hashlib
+import inspect
+import json
+from datetime import date, datetime, timedelta
+from functools import partial
+import asyncio
+from fastapi import APIRouter, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+from fleet import analytics, events, live, parallel, queries
+from fleet.db import ASYNC_DB_ENABLED
+from fleet.fiscal import as_local, fiscal_year, fy_bounds, now_local
+from fleet.usage_service import UsageError, checkout, return_usage
+from fleet.version import __version__
+
+MAX_LIMIT = 500
+
+api = FastAPI(title="Fleet API", version=__version__)
+router = APIRouter(prefix="/api/v1")
+
+
+# ---------- helpers ----------
+def hot(name: str):
+    """ตัวอ่าน async (ถ้าเปิด async engine) ไม่งั้นใช้ตัว sync ใน thread pool"""
+    if ASYNC_DB_ENABLED:
+        from fleet import aqueries
+        return getattr(aqueries, name)
+    return getattr(queries, name)
+
+async def call(reader, *args, **kwargs):
+    if inspect.iscoroutinefunction(reader):
+        return await reader(*args, **kwargs)
+    return await run_in_threadpool(reader, *args, **kwargs)
+
+def encode_cursor(last_id: int) -> str:
+    raw = json.dumps({"id": int(last_id)}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str | None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(cursor + pad))["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor ไม่ถูกต้อง")
+
+def select_fields(rows: list[dict], fields: str | None, allowed: list[str]) -> list[dict]:
+    if not fields:
+        return rows
+    wanted = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in wanted if f not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"ไม่รู้จัก field: {', '.join(unknown)}")
+    return [{k: r.get(k) for k in wanted} for r in rows]
+
+def json_response(request: Request, payload, status_code: int = 200) -> Response:
+    """serialize + ใส่ ETag (weak) และตอบ 304 ถ้า client มีเวอร์ชันเดียวกันอยู่แล้ว"""
+    body = json.dumps(payload, ensure_ascii=False, default=str, separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if status_code == 200 and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, status_code=status_code,
+                    media_type="application/json", headers=headers)
+
+async def paged(request: Request, reader, cursor: str | None, limit: int,
+                fields: str | None, allowed: list[str], **kwargs) -> Response:
+    """เรียก reader(limit=limit+1) แล้วตัดหน้า + คำนวณ next_cursor จาก id แถวสุดท้าย"""
+    rows = await call(reader, decode_cursor(cursor), limit + 1, **kwargs)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return json_response(request, {
+        "items": select_fields(rows, fields, allowed),
+        "next_cursor": encode_cursor(rows[-1]["id"]) if more and rows else None,
+    })
+
+
+# ---------- cars / users ----------
+@router.get("/cars")
+async def list_cars(request: Request, cursor: str | None = None,
+                    limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: str | None = None):
+    return await paged(request, hot("fetch_cars"), cursor, limit, fields, queries.CAR_COLUMNS)
+
+@router.get("/cars/{car_id}")
+async def get_car(request: Request, car_id: int, fields: str | None = None):
+    row = await run_in_threadpool(queries.get_car, car_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="ไม่พบรถ")
+    return json_response(request, select_fields([row], fields, queries.CAR_COLUMNS)[0])
+
+@router.get("/users")
+async def list_users(request: Request, cursor: str | None = None,
+                     limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: str | None = None):
+    return await paged(request, queries.fetch_users, cursor, limit, fields, queries.USER_COLUMNS)
+
+
+# ---------- usage (เบิก/คืน) ----------
+class CheckoutIn(BaseModel):
+    car_id: int
+    borrower_id: int
+    start_time: datetime
+    planned_end_time: datetime | None = None
+    purpose: str | None = None
+    is_maintenance: bool = False
+
+class ReturnIn(BaseModel):
+    returned_at: datetime | None = None
+
+@router.get("/usage")
+async def list_usage(request: Request, cursor: str | None = None,
+                     limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: str | None = None,
+                     open_only: bool = False, status: str | None = None,
+                     start: datetime | None = None, end: datetime | None = None):
+    """?start=&end= = ช่วงเวลาที่รายการเบิกซ้อนทับ (end ไม่รวม) ; ?status=in_use|overdue|maintenance|returned"""
+    if status and status not in (*queries.OPEN_STATUSES, "returned"):
+        raise HTTPException(status_code=400, detail=f"ไม่รู้จัก status: {status}")
+    return await paged(request, hot("fetch_usage"), cursor, limit, fields,
+                       queries.USAGE_COLUMNS, open_only=open_only,
+                       status=status, start=as_local(start), end=as_local(end))
+
+@router.get("/usage/{usage_id}")
+async def get_usage(request: Request, usage_id: int, fields: str | None = None):
+    row = await run_in_threadpool(queries.get_usage, usage_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="ไม่พบรายการเบิก")
+    return json_response(request, select_fields([row], fields, queries.USAGE_COLUMNS)[0])
+
+@router.post("/usage", status_code=201)
+async def create_usage(request: Request, body: CheckoutIn):
+    try:
+        usage_id = await run_in_threadpool(
+            checkout, body.car_id, body.borrower_id, as_local(body.start_time),
+            as_local(body.planned_end_time), body.purpose, body.is_maintenance)
+    except UsageError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    row = await run_in_threadpool(queries.get_usage, usage_id)
+    return json_response(request, row, status_code=201)
+
+@router.post("/usage/{usage_id}/return")
+async def return_car(request: Request, usage_id: int, body: ReturnIn | None = None):
+    try:
+        await run_in_threadpool(return_usage, usage_id, as_local(body.returned_at) if body else None)
+    except UsageError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    row = await run_in_threadpool(queries.get_usage, usage_id)
+    return json_response(request, row)
+
+
+# ---------- calendar ----------
+@router.get("/calendar")
+async def list_bookings(request: Request, start: date, end: date, cursor: str | None = None,
+                        limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: str | None = None):
+    if end < start:
+        raise HTTPException(status_code=400, detail="end ต้องไม่ก่อน start")
+    return await paged(request, partial(hot("fetch_calendar"), start, end),
+                       cursor, limit, fields, queries.CALENDAR_COLUMNS)
+
+
+# ---------- maintenance ----------
+@router.get("/maintenance/orders")
+async def list_orders(request: Request, cursor: str | None = None,
+                      limit: int = Query(100, ge=1, le=MAX_LIMIT), fields: str | None = None):
+    return await paged(request, queries.fetch_orders, cursor, limit, fields, queries.ORDER_COLUMNS)
+
+@router.get("/maintenance/orders/{order_id}/items")
+async def list_order_items(request: Request, order_id: int):
+    rows = await run_in_threadpool(queries.fetch_order_items, order_id)
+    return json_response(request, {"items": rows})
+
+
+# ---------- dashboard ----------
+@router.get("/dashboard")
+async def dashboard(request: Request, fy: int | None = None):
+    """ตัวเลขสรุปของ Dashboard (สถานะรถ, KPI, Top 5, ยอดซ่อมรายเดือน) ของปีงบประมาณ fy"""
+    now = now_local()                       # เวลาไทย: server อยู่ timezone อื่นก็ได้ปีงบฯ/วันเดียวกับหน้าเว็บ
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if fy is None:
+        fy = fiscal_year(now)
+    fy_start, fy_end = fy_bounds(fy)
+    m_start = today.replace(day=1)
+    m_end = (m_start + timedelta(days=32)).replace(day=1)
+    data = await call(hot("fetch_dashboard"), fy_start, fy_end, today, m_start, m_end)
+    return json_response(request, {"fy": fy, **data})
+
+
+# ---------- reports (fleet/analytics.py ; DuckDB ถ้ามี) ----------
+def _check_fy_range(first_fy: int, last_fy: int):
+    if last_fy < first_fy or last_fy - first_fy > 50:
+        raise HTTPException(status_code=400, detail="ช่วงปีงบประมาณไม่ถูกต้อง")
+
+@router.get("/reports/fy-compare")
+async def report_fy_compare(request: Request, first_fy: int, last_fy: int):
+    _check_fy_range(first_fy, last_fy)
+    rows = await run_in_threadpool(analytics.fy_compare, first_fy, last_fy)
+    return json_response(request, {"items": rows})
+
+@router.get("/reports/cost-trend")
+async def report_cost_trend(request: Request, first_fy: int, last_fy: int, car_id: int | None = None):
+    _check_fy_range(first_fy, last_fy)
+    rows = await run_in_threadpool(analytics.cost_trend, first_fy, last_fy, car_id)
+    return json_response(request, {"items": rows})
+
+@router.get("/reports/utilization")
+async def report_utilization(request: Request, start: date, end: date):
+    """% เวลาที่รถแต่ละคันถูกใช้ในช่วง [start, end) (end ไม่รวม)"""
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end ต้องมากกว่า start")
+    rows = await run_in_threadpool(analytics.utilization,
+                                   datetime.combine(start, datetime.min.time()),
+                                   datetime.combine(end, datetime.min.time()))
+    return json_response(request, {"items": rows})
+
+
+# ---------- events ----------
+@router.get("/events")
+async def list_events(request: Request, after_id: int = 0, kind: str | None = None,
+                      limit: int = Query(100, ge=1, le=MAX_LIMIT)):
+    """เหตุการณ์ใหม่กว่า after_id (เช่น usage.overdue) สำหรับระบบที่ poll"""
+    rows = await run_in_threadpool(events.recent, after_id, limit, kind)
+    return json_response(request, {"items": rows, "last_id": rows[-1]["id"] if rows else after_id})
+
+
+@router.get("/health")
+async def health():
+    return {"status": "ok", "version": __version__}
+
+@router.get("/health/queries")
+async def query_timings():
+    """เวลาต่อ query ของ Dashboard (fleet/parallel.py) ในหน่วย ms : n, p50, max, last"""
+    return {"items": parallel.stats()}
+
+
+api.include_router(router)
+
+
+# ---------- live status (SSE) ----------
+# อยู่นอก /api/v1 เพื่อใช้ URL เดียวกับ route ของ Flask (fleet/live.py) ; ต้องลงทะเบียนก่อน mount Dash
+@api.get("/live/status", include_in_schema=False)
+async def live_status(request: Request):
+    async def gen():
+        q = live.HUB.listen_async()
+        try:
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(q.get(), live.KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield live.sse(payload)
+        finally:
+            live.HUB.unlisten_async(q)
+
+    return StreamingResponse(gen(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
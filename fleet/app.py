@@ -2,12 +2,20 @@
 import dash
 from dash import html, dcc
 from .db import init_db
+from .attachments import start_backfill_thread
+from .scheduler import start_scheduler
+from .live import register_flask as register_live
+from .jobs import MANAGER as background_manager
 from .version import __version__
 
 
 init_db()
+start_backfill_thread()   # ลงทะเบียนไฟล์เดิมใน uploads/ เข้า attachments (เบื้องหลัง)
+start_scheduler()         # ตรวจรายการเลยกำหนดคืนทุกนาที -> events + notifier
 
-app = dash.Dash(__name__,use_pages=True, suppress_callback_exceptions=True, title=f"ระบบยานพาหนะ v{__version__}",)
+app = dash.Dash(__name__,use_pages=True, suppress_callback_exceptions=True, title=f"ระบบยานพาหนะ v{__version__}",
+                background_callback_manager=background_manager)   # export/รายงานหนักรันใน process แยก (fleet/jobs.py)
+register_live(app.server)   # GET /live/status (SSE) -> assets/live.js
 
 app.layout = html.Div([
     html.H1(["ระบบบริหารยานพาหนะ สำนักสำรวจและประเมินศักยภาพน้ำบาดาล", 
@@ -19,7 +27,8 @@ app.layout = html.Div([
         dcc.Link("Usage", href="/usage"), " | ",
         dcc.Link("Users", href="/users"), " | ",
         dcc.Link("Maintenance", href="/maintenance")," | ",
-        dcc.Link("Calendar", href="/carlendar")
+        dcc.Link("Calendar", href="/carlendar"), " | ",
+        dcc.Link("Imports", href="/imports")
 
     ]),
     html.Hr(),
@@ -0,0 +1,40 @@
+# fleet/aqueries.py
+"""เวอร์ชัน async ของตัวอ่านที่ถูกเรียกบ่อย (ใช้ SQL ชุดเดียวกับ fleet/queries.py)
+
+ทำงานผ่าน SQLAlchemy asyncio + aiosqlite ; request หลายตัวจึงรอ I/O ซ้อนกันได้
+แทนที่จะต่อคิวกันใน thread pool
+"""
+from __future__ import annotations
+import asyncio
+from datetime import date, datetime
+from sqlalchemy import text
+from fleet.db import get_async_engine
+from fleet import queries
+
+
+async def _arows(sql: str, params: dict | None = None) -> list[dict]:
+    async with get_async_engine().connect() as conn:
+        rs = await conn.execute(text(sql), params or {})
+        return [dict(r) for r in rs.mappings().all()]
+
+
+async def fetch_usage(before_id: int | None = None, limit: int | None = None,
+                      open_only: bool = False, now: datetime | None = None,
+                      status: str | None = None, start: datetime | None = None,
+                      end: datetime | None = None) -> list[dict]:
+    return await _arows(*queries.usage_sql(before_id, limit, open_only, now, status, start, end))
+
+async def fetch_cars(after_id: int | None = None, limit: int | None = None) -> list[dict]:
+    """รถพร้อม status_display"""
+    return await _arows(*queries.cars_sql(after_id, limit))
+
+async def fetch_calendar(start_date: date, end_date: date,
+                         after_id: int | None = None, limit: int | None = None) -> list[dict]:
+    return await _arows(*queries.calendar_sql(start_date, end_date, after_id, limit))
+
+async def fetch_dashboard(fy_start: datetime, fy_end: datetime, today: datetime,
+                          m_start: datetime, m_end: datetime) -> dict[str, list[dict]]:
+    """ตัวเลข Dashboard ทุกชุด รันพร้อมกันด้วย asyncio.gather"""
+    parts = queries.dashboard_sql(fy_start, fy_end, today, m_start, m_end)
+    results = await asyncio.gather(*(_arows(sql, p) for sql, p in parts.values()))
+    return dict(zip(parts.keys(), results))
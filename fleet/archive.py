@@ -0,0 +1,181 @@
+# fleet/archive.py
+"""แยกประวัติเก่า (ปิดแล้ว) ออกจากตารางที่ใช้งานประจำวัน -> ตาราง *_archive ในไฟล์เดียวกัน
+
+    python -m fleet.archive --dry-run             # นับแถวที่จะย้าย (ไม่แก้ข้อมูล)
+    python -m fleet.archive                       # ย้ายจริง (เก็บ FLEET_ARCHIVE_KEEP_FY ปีงบฯ ล่าสุดไว้)
+    python -m fleet.archive --keep 5 --dry-run
+
+- ตารางร้อน (usage_logs, maintenance_*) เหลือเฉพาะปีงบฯ ล่าสุด + รายการที่ยังไม่ปิด
+  หน้าเว็บอ่านตารางร้อนเหมือนเดิม -> index ตื้น / working set เล็ก
+- อ่านข้ามทั้งสองส่วนผ่าน view *_all (UNION ALL) : rollup rebuild, รายงาน (analytics), columnar
+- "ปิดแล้ว": usage คืนรถแล้ว / ใบงานมี accept_date ; ใบงานย้ายพร้อมรายการซ่อมและกรรมการ
+- ย้ายทีละ BATCH ใบงาน/รายการต่อ transaction (ไม่ถือ lock เขียนนาน) ; id เดิมไม่เปลี่ยน
+- การย้ายไม่ใช่การลบ: trigger ฝั่ง DELETE (rollup, สถานะรถ) ถูกปิดชั่วคราวใน transaction เดียวกัน
+  rollup จึงยังรวมประวัติที่ย้ายไปแล้ว ; trigger tv_* ยังทำงาน (cache รู้ว่าตารางเปลี่ยน)
+"""
+from __future__ import annotations
+import os
+import sys
+from sqlalchemy import text
+
+from fleet.db import engine
+from fleet.fiscal import fiscal_year, fy_bounds, now_local
+
+KEEP_FY = int(os.getenv("FLEET_ARCHIVE_KEEP_FY", "3"))    # ปีงบฯ ล่าสุดที่เก็บไว้ในตารางร้อน (รวมปีปัจจุบัน)
+BATCH = 2000
+
+# ตาราง -> (คอลัมน์ที่ทำ index ในตาราง archive)
+ARCHIVED = {
+    "usage_logs":            ("start_time", "car_id"),
+    "maintenance_orders":    ("accept_date", "car_id"),
+    "maintenance_items":     ("order_id",),
+    "maintenance_committee": ("user_id",),
+}
+
+# usage_logs ไม่มี AUTOINCREMENT: SQLite ให้ id ใหม่ = MAX(id) ของตารางร้อน + 1 ซึ่งอาจซ้ำกับ id ที่ย้ายไปแล้ว
+# (ลบแถวบนสุดของตารางร้อนทีหลัง) -> ทุกจุดที่ INSERT ใส่ id เองด้วย NEXT_USAGE_ID (นับรวม archive ;
+# ประเมินใน statement เดียวกับ INSERT ขณะถือ write lock จึงไม่ชนกันเองระหว่าง worker)
+NEXT_USAGE_ID = """(SELECT IFNULL(MAX(m), 0) + 1 FROM (
+    SELECT MAX(id) AS m FROM usage_logs UNION ALL SELECT MAX(id) FROM usage_logs_archive))"""
+
+# ไม่ย้ายแถว id สูงสุด: กันไว้อีกชั้นสำหรับการ INSERT ที่ไม่ผ่าน NEXT_USAGE_ID (เช่น seed)
+_USAGE_WHERE = """
+    returned_at IS NOT NULL AND start_time IS NOT NULL AND start_time < :cutoff
+    AND id < (SELECT MAX(id) FROM usage_logs)
+"""
+_ORDERS_WHERE = "accept_date IS NOT NULL AND accept_date <> '' AND accept_date < :cutoff"
+
+
+def _columns(conn, table: str) -> list[tuple]:
+    """(name, type, pk) ตามลำดับคอลัมน์"""
+    return [(r[1], r[2], r[5]) for r in conn.execute(text(f"PRAGMA table_info({table})")).all()]
+
+def init_archive():
+    """สร้าง/ปรับตาราง *_archive ให้คอลัมน์ตรงกับตารางร้อน + สร้าง view *_all ใหม่ (idempotent)"""
+    with engine.begin() as conn:
+        for table, indexed in ARCHIVED.items():
+            cols = _columns(conn, table)
+            arch = f"{table}_archive"
+            pk = [name for name, _, k in sorted(cols, key=lambda c: c[2]) if k]
+            defs = ", ".join(f'"{name}" {ctype}' for name, ctype, _ in cols)
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {arch} ({defs}, PRIMARY KEY ({', '.join(pk)}))"))
+            have = {name for name, _, _ in _columns(conn, arch)}
+            for name, ctype, _ in cols:                  # ตารางร้อนถูก ALTER เพิ่มคอลัมน์ภายหลัง
+                if name not in have:
+                    conn.execute(text(f'ALTER TABLE {arch} ADD COLUMN "{name}" {ctype}'))
+            for col in indexed:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{arch}_{col} ON {arch} ({col})"))
+            names = ", ".join(f'"{name}"' for name, _, _ in cols)
+            view = (f"CREATE VIEW {table}_all AS SELECT {names} FROM {table} "
+                    f"UNION ALL SELECT {names} FROM {arch}")
+            old = conn.execute(text("SELECT sql FROM sqlite_master WHERE type='view' AND name=:n"),
+                               {"n": f"{table}_all"}).scalar()
+            if old != view:                              # สร้างใหม่เฉพาะเมื่อคอลัมน์เปลี่ยน
+                conn.execute(text(f"DROP VIEW IF EXISTS {table}_all"))
+                conn.execute(text(view))
+
+def cutoff(keep_fy: int = KEEP_FY, today=None) -> str:
+    """วันแรกของปีงบฯ เก่าสุดที่เก็บไว้ (YYYY-MM-DD) ; ข้อมูลก่อนวันนี้ย้ายได้"""
+    fy = fiscal_year(today or now_local()) - max(1, keep_fy) + 1
+    return fy_bounds(fy)[0].strftime("%Y-%m-%d")
+
+
+# ---------- plan / run ----------
+def plan(keep_fy: int = KEEP_FY) -> dict:
+    """จำนวนแถวที่จะย้ายต่อตาราง (ไม่แก้ข้อมูล)"""
+    p = {"cutoff": cutoff(keep_fy)}
+    orders = f"SELECT id FROM maintenance_orders WHERE {_ORDERS_WHERE}"
+    with engine.begin() as conn:
+        def one(sql: str) -> int:
+            return conn.execute(text(sql), p).scalar() or 0
+        counts = {
+            "usage_logs": one(f"SELECT COUNT(*) FROM usage_logs WHERE {_USAGE_WHERE}"),
+            "maintenance_orders": one(f"SELECT COUNT(*) FROM ({orders})"),
+            "maintenance_items": one(f"SELECT COUNT(*) FROM maintenance_items WHERE order_id IN ({orders})"),
+            "maintenance_committee": one(f"SELECT COUNT(*) FROM maintenance_committee WHERE order_id IN ({orders})"),
+        }
+    return {"cutoff": p["cutoff"], "rows": counts}
+
+def _without_delete_triggers(conn, fn):
+    """ปิด trigger (ยกเว้น tv_*) ของตารางร้อนระหว่าง fn(conn) แล้วสร้างคืนใน transaction เดียวกัน"""
+    names = ", ".join(f"'{t}'" for t in ARCHIVED)
+    saved = conn.execute(text(f"""
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name IN ({names}) AND name NOT LIKE 'tv\\_%' ESCAPE '\\'
+    """)).all()
+    for name, _ in saved:
+        conn.exec_driver_sql(f"DROP TRIGGER {name}")
+    try:
+        return fn(conn)
+    finally:
+        for _, sql in saved:
+            conn.exec_driver_sql(sql)
+
+def _move(conn, table: str, where: str, params: dict) -> int:
+    names = ", ".join(f'"{c[0]}"' for c in _columns(conn, table))
+    conn.execute(text(f"INSERT INTO {table}_archive ({names}) SELECT {names} FROM {table} WHERE {where}"), params)
+    return conn.execute(text(f"DELETE FROM {table} WHERE {where}"), params).rowcount
+
+def _batch_usage(conn, p: dict) -> int:
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _arch_ids AS
+        SELECT id FROM usage_logs WHERE {_USAGE_WHERE} ORDER BY id LIMIT :n
+    """), p)
+    try:
+        return _move(conn, "usage_logs", "id IN (SELECT id FROM _arch_ids)", {})
+    finally:
+        conn.execute(text("DROP TABLE temp._arch_ids"))
+
+def _batch_orders(conn, p: dict) -> dict:
+    conn.execute(text(f"""
+        CREATE TEMP TABLE _arch_ids AS
+        SELECT id FROM maintenance_orders WHERE {_ORDERS_WHERE} ORDER BY id LIMIT :n
+    """), p)
+    try:
+        sel = "(SELECT id FROM _arch_ids)"
+        return {
+            "maintenance_items": _move(conn, "maintenance_items", f"order_id IN {sel}", {}),
+            "maintenance_committee": _move(conn, "maintenance_committee", f"order_id IN {sel}", {}),
+            "maintenance_orders": _move(conn, "maintenance_orders", f"id IN {sel}", {}),
+        }
+    finally:
+        conn.execute(text("DROP TABLE temp._arch_ids"))
+
+def run(keep_fy: int = KEEP_FY, batch: int = BATCH) -> dict:
+    """ย้ายแถวที่ปิดแล้วและเก่ากว่า cutoff ; คืน {"cutoff", "rows": {table: n}}"""
+    from fleet.cache import bump
+    init_archive()
+    p = {"cutoff": cutoff(keep_fy), "n": int(batch)}
+    moved = dict.fromkeys(ARCHIVED, 0)
+    while True:
+        with engine.begin() as conn:
+            n = _without_delete_triggers(conn, lambda c: _batch_usage(c, p))
+        moved["usage_logs"] += n
+        if n < batch:
+            break
+    while True:
+        with engine.begin() as conn:
+            counts = _without_delete_triggers(conn, lambda c: _batch_orders(c, p))
+        for t, n in counts.items():
+            moved[t] += n
+        if counts["maintenance_orders"] < batch:
+            break
+    bump(*[t for t, n in moved.items() if n])
+    return {"cutoff": p["cutoff"], "rows": moved}
+
+
+if __name__ == "__main__":
+    from fleet.db import init_db
+    args = sys.argv[1:]
+    keep = int(args[args.index("--keep") + 1]) if "--keep" in args else KEEP_FY
+    init_db()
+    dry = "--dry-run" in args
+    result = plan(keep) if dry else run(keep)
+    print(f"{'(dry-run) ' if dry else ''}cutoff {result['cutoff']} (เก็บ {keep} ปีงบฯ ล่าสุด)")
+    for table, n in result["rows"].items():
+        print(f"  {table:24s} {'จะย้าย' if dry else 'ย้ายแล้ว'} {n:8,d} แถว")
+    with engine.begin() as conn:
+        for table in ARCHIVED:
+            hot = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            cold = conn.execute(text(f"SELECT COUNT(*) FROM {table}_archive")).scalar()
+            print(f"  {table:24s} ร้อน {hot:8,d}  archive {cold:8,d}")
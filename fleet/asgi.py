@@ -0,0 +1,21 @@
+# fleet/asgi.py
+"""รัน JSON API + Dash ใน process เดียว
+
+    uvicorn fleet.asgi:app --host 0.0.0.0 --port 9000
+
+/api/v1/* -> FastAPI (async), ที่เหลือทั้งหมด -> Dash (Flask/WSGI) ผ่าน WSGI middleware
+"""
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # ไม่มี a2wsgi ก็ใช้ของ starlette แทนได้
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+from fleet.api import api
+from fleet.app import app as dash_app
+
+api.mount("/", WSGIMiddleware(dash_app.server))
+app = api
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=9000)
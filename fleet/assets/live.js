@@ -0,0 +1,55 @@
+// fleet/assets/live.js
+// ฟังสถานะรถแบบ live (SSE: /live/status) แล้วส่งเข้า dcc.Store "live-status" ของหน้า Dashboard
+// การอัปเดต donut/KPI ทำใน clientside callback (fleet/pages/dashboard.py) ไม่ต้องเรียก server ซ้ำ
+// เปิด stream เฉพาะตอนอยู่หน้า Dashboard (มี #live-status) ; เปลี่ยนไปหน้าอื่น -> ปิด ไม่ค้าง connection/thread ของ server
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+    var es = null;
+
+    function push(data) {
+        if (window.dash_clientside && window.dash_clientside.set_props) {
+            window.dash_clientside.set_props("live-status", {data: data});
+        }
+    }
+
+    function open() {
+        es = new EventSource("/live/status");
+        es.addEventListener("status", function (e) {
+            var data;
+            try {
+                data = JSON.parse(e.data);
+            } catch (err) {
+                return;
+            }
+            if (document.getElementById("live-status")) {
+                push(data);
+            }
+        });
+    }
+
+    function close() {
+        es.close();
+        es = null;
+    }
+
+    // ตรวจทุกวินาทีว่าอยู่หน้า Dashboard ไหม (เปลี่ยนหน้าใน Dash ไม่โหลดหน้าใหม่)
+    // เปิดใหม่แล้ว server ส่งสถานะล่าสุดให้ทันทีเป็น event แรก
+    function sync() {
+        var here = !!document.getElementById("live-status");
+        if (here && !es) {
+            open();
+        } else if (!here && es) {
+            close();
+        }
+    }
+
+    setInterval(sync, 1000);
+    window.addEventListener("pagehide", function () {
+        if (es) {
+            close();
+        }
+    });
+    sync();
+})();
@@ -0,0 +1,190 @@
+# fleet/attachments.py
+from __future__ import annotations
+import hashlib
+import mimetypes
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import text
+from fleet.db import engine, UPLOAD_DIR
+from fleet.fiscal import now_local
+
+# ---------- ที่เก็บไฟล์ ----------
+MAINT_UPLOAD_DIR = (UPLOAD_DIR.parent / "maintenance")
+MAINT_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+
+ENTITY_DIRS = {
+    "car":         UPLOAD_DIR,
+    "maintenance": MAINT_UPLOAD_DIR,
+}
+FILE_PREFIX = {"car": "car", "maintenance": "maint"}
+
+# คอลัมน์ pdf_path เดิม (ยังชี้ไฟล์ล่าสุด เพื่อให้คอลัมน์ "PDF ✓" ในตารางทำงานเหมือนเดิม)
+LEGACY_COLUMN = {
+    "car":         ("cars", "pdf_path"),
+    "maintenance": ("maintenance_orders", "pdf_path"),
+}
+
+# car_2.pdf / maint_1.pdf / car_2_ab12cd34ef56.pdf
+_FILE_RE = re.compile(r"^(car|maint)_(\d+)(?:_[0-9a-f]+)?\.[A-Za-z0-9]+$")
+
+ATTACH_COLS = "id, entity_type, entity_id, kind, filename, path, sha256, size, mime, uploaded_at"
+
+
+def _check_entity(entity_type: str):
+    if entity_type not in ENTITY_DIRS:
+        raise ValueError(f"entity_type ไม่รองรับ: {entity_type}")
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _insert(conn, entity_type, entity_id, kind, filename, path, sha, size, mime, uploaded_at=None):
+    """INSERT OR IGNORE (ไฟล์ซ้ำของ entity เดิมจะถูกข้าม) แล้วคืนแถวที่อยู่ใน DB
+
+    uploaded_at ไม่ส่ง -> เวลาไทยตอนนี้ (CURRENT_TIMESTAMP ของ SQLite เป็น UTC ; DB เก็บเวลาไทย)
+    """
+    conn.execute(text("""
+        INSERT OR IGNORE INTO attachments
+            (entity_type, entity_id, kind, filename, path, sha256, size, mime, uploaded_at)
+        VALUES (:et, :eid, :kind, :fn, :path, :sha, :size, :mime, :ts)
+    """), {"et": entity_type, "eid": int(entity_id), "kind": kind, "fn": filename,
+           "path": path, "sha": sha, "size": int(size), "mime": mime,
+           "ts": uploaded_at or now_local().strftime("%Y-%m-%d %H:%M:%S")})
+    return conn.execute(text(f"""
+        SELECT {ATTACH_COLS} FROM attachments
+        WHERE entity_type=:et AND entity_id=:eid AND sha256=:sha
+    """), {"et": entity_type, "eid": int(entity_id), "sha": sha}).mappings().first()
+
+
+# ---------- เขียน ----------
+def save_attachment(entity_type: str, entity_id: int, data: bytes,
+                    filename: str | None = None, kind: str = "pdf",
+                    mime: str | None = None) -> dict:
+    """เก็บไฟล์ใหม่ของ entity (ไม่ทับไฟล์เดิม) + บันทึก metadata แล้วคืนแถว attachments"""
+    _check_entity(entity_type)
+    sha = hashlib.sha256(data).hexdigest()
+    ext = Path(filename or "").suffix.lower() or f".{kind}"
+    mime = mime or mimetypes.guess_type(filename or f"x{ext}")[0] or "application/octet-stream"
+
+    # ชื่อไฟล์ผูกกับ hash -> อัปโหลดไฟล์ใหม่ไม่ทำลายไฟล์เก่า
+    target = ENTITY_DIRS[entity_type] / f"{FILE_PREFIX[entity_type]}_{int(entity_id)}_{sha[:12]}{ext}"
+    if not target.exists():
+        tmp = target.with_suffix(target.suffix + ".part")
+        tmp.write_bytes(data)
+        tmp.replace(target)
+    path = target.as_posix()
+
+    table, col = LEGACY_COLUMN[entity_type]
+    with engine.begin() as conn:
+        row = _insert(conn, entity_type, entity_id, kind, filename, path, sha, len(data), mime)
+        conn.execute(text(f"UPDATE {table} SET {col}=:p WHERE id=:i"),
+                     {"p": row["path"], "i": int(entity_id)})
+    return dict(row)
+
+def save_upload(entity_type: str, entity_id: int, contents: str,
+                filename: str | None = None, kind: str = "pdf") -> dict:
+    """รับค่า contents จาก dcc.Upload ("data:<mime>;base64,<...>")"""
+    import base64
+    header, b64 = contents.split(",", 1)
+    mime = header[5:].split(";", 1)[0] if header.startswith("data:") else None
+    return save_attachment(entity_type, entity_id, base64.b64decode(b64),
+                           filename=filename, kind=kind, mime=mime or None)
+
+
+# ---------- อ่าน (ไม่แตะ filesystem) ----------
+def list_attachments(entity_type: str, entity_id: int, kind: str | None = None,
+                     limit: int = 50, before_id: int | None = None) -> list[dict]:
+    """รายการไฟล์แนบของ entity เรียงใหม่ -> เก่า แบบ keyset
+       หน้าถัดไป: ส่ง before_id = id ของแถวสุดท้ายในหน้าปัจจุบัน"""
+    _check_entity(entity_type)
+    where = ["entity_type=:et", "entity_id=:eid"]
+    params = {"et": entity_type, "eid": int(entity_id), "lim": int(limit)}
+    if kind:
+        where.append("kind=:kind"); params["kind"] = kind
+    if before_id:
+        where.append("id < :before"); params["before"] = int(before_id)
+    sql = f"""
+        SELECT {ATTACH_COLS} FROM attachments
+        WHERE {' AND '.join(where)}
+        ORDER BY id DESC
+        LIMIT :lim
+    """
+    with engine.begin() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return [dict(r) for r in rows]
+
+def iter_attachments(after_id: int = 0, limit: int = 500) -> list[dict]:
+    """ไล่อ่านทั้งตารางตาม primary key (สำหรับงาน export/ตรวจสอบ)"""
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"""
+            SELECT {ATTACH_COLS} FROM attachments
+            WHERE id > :a ORDER BY id LIMIT :lim
+        """), {"a": int(after_id), "lim": int(limit)}).mappings().all()
+    return [dict(r) for r in rows]
+
+def get_attachment(attachment_id: int) -> dict | None:
+    with engine.begin() as conn:
+        row = conn.execute(text(f"SELECT {ATTACH_COLS} FROM attachments WHERE id=:i"),
+                           {"i": int(attachment_id)}).mappings().first()
+    return dict(row) if row else None
+
+def latest_attachment(entity_type: str, entity_id: int, kind: str | None = "pdf") -> dict | None:
+    rows = list_attachments(entity_type, entity_id, kind=kind, limit=1)
+    return rows[0] if rows else None
+
+def attachment_options(entity_type: str, entity_id: int, limit: int = 50) -> list[dict]:
+    """options สำหรับ dropdown เลือกไฟล์แนบ"""
+    return [
+        {"label": f'{(a["filename"] or Path(a["path"]).name)} | {a["uploaded_at"]} | {a["size"]/1024:,.0f} KB',
+         "value": a["id"]}
+        for a in list_attachments(entity_type, entity_id, limit=limit)
+    ]
+
+
+# ---------- backfill ไฟล์เดิมใน uploads/ ----------
+def backfill_uploads() -> int:
+    """สแกน uploads/cars และ uploads/maintenance แล้วลงทะเบียนไฟล์ที่ยังไม่มีใน attachments
+       (รันซ้ำได้ เพราะ unique (entity_type, entity_id, sha256))"""
+    with engine.begin() as conn:
+        known = {r[0] for r in conn.execute(text("SELECT path FROM attachments")).all()}
+
+    added = 0
+    for entity_type, folder in ENTITY_DIRS.items():
+        for p in sorted(folder.glob("*")):
+            m = _FILE_RE.match(p.name)
+            if not p.is_file() or not m or p.as_posix() in known:
+                continue
+            if FILE_PREFIX[entity_type] != m.group(1):
+                continue
+            st = p.stat()
+            uploaded = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
+            mime = mimetypes.guess_type(p.name)[0] or "application/octet-stream"
+            with engine.begin() as conn:
+                row = _insert(conn, entity_type, int(m.group(2)), p.suffix.lstrip(".").lower() or "file",
+                              p.name, p.as_posix(), _sha256_file(p), st.st_size, mime, uploaded)
+            if row and row["path"] == p.as_posix():
+                added += 1
+    print(f"📎 Attachments backfill: เพิ่ม {added} ไฟล์")
+    return added
+
+def start_backfill_thread() -> threading.Thread:
+    """รัน backfill เป็น background thread (ไม่หน่วงการเปิดแอป)"""
+    def _run():
+        try:
+            backfill_uploads()
+        except Exception as e:
+            print("attachments backfill error:", e)
+    t = threading.Thread(target=_run, name="attachments-backfill", daemon=True)
+    t.start()
+    return t
+
+
+if __name__ == "__main__":
+    from fleet.db import init_db
+    init_db()
+    backfill_uploads()
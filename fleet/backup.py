@@ -0,0 +1,171 @@
+# fleet/backup.py
+"""สำรองฐานข้อมูล SQLite ขณะระบบทำงาน (online backup API) + บีบอัด + หมุนเวียน + ตรวจความถูกต้อง
+
+    python -m fleet.backup                        # สำรองทันที -> backups/fleet-YYYYmmdd-HHMMSS.db.gz
+    python -m fleet.backup --list                 # รายการไฟล์สำรอง
+    python -m fleet.backup --verify FILE.db.gz    # แตกไฟล์ชั่วคราวแล้ว PRAGMA integrity_check
+    python -m fleet.backup --restore FILE.db.gz new.db
+
+- คัดลอกทีละ FLEET_BACKUP_PAGES หน้า แล้วพัก FLEET_BACKUP_PAUSE วินาทีระหว่างรอบ
+  (ถือ read lock แค่ช่วงสั้น ๆ ; โหมด WAL ผู้เขียนไม่ต้องรอ ; การยืม/คืนรถไม่สะดุดระหว่างสำรอง)
+- ได้ภาพ ณ จุดเวลาเดียวเสมอ (ไม่ใช่ไฟล์ครึ่ง ๆ): โหมด WAL อ่านทุกรอบจาก read transaction เดียว ;
+  โหมดอื่นถ้ามีการเขียนระหว่างสำรอง SQLite เริ่มคัดลอกใหม่เอง
+- ทุกไฟล์ถูกตรวจหลังบีบอัด: แตกกลับ -> เปิด -> PRAGMA integrity_check ต้องได้ "ok" ; ไม่ผ่าน -> ลบทิ้ง + raise
+- เก็บไว้ FLEET_BACKUP_KEEP ไฟล์ล่าสุด (ค่าเริ่มต้น 14) ; scheduler สำรองทุก FLEET_BACKUP_INTERVAL วินาที
+- ไฟล์ที่มี label (เช่น fleet-...-pre-reset.db.gz จาก reset_db) ไม่ถูกหมุนเวียน ต้องลบเอง
+"""
+from __future__ import annotations
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from fleet.db import PROJECT_DIR, engine
+
+BACKUP_DIR = Path(os.getenv("FLEET_BACKUP_DIR", PROJECT_DIR / "backups"))
+BACKUP_KEEP = int(os.getenv("FLEET_BACKUP_KEEP", "14"))
+BACKUP_INTERVAL = int(os.getenv("FLEET_BACKUP_INTERVAL", "21600"))   # 6 ชม. ; 0 = ไม่ตั้งเวลา
+PAGES_PER_STEP = int(os.getenv("FLEET_BACKUP_PAGES", "256"))        # 256 หน้า x 4 KB = 1 MB ต่อรอบ
+PAUSE_S = float(os.getenv("FLEET_BACKUP_PAUSE", "0.02"))
+PREFIX, SUFFIX = "fleet-", ".db.gz"
+_ROTATED = re.compile(r"fleet-\d{8}-\d{6}\.db\.gz")      # ไฟล์ตามรอบ (ไม่มี label) เท่านั้นที่ถูกหมุนเวียน
+
+
+def _source_path() -> Path:
+    if engine.url.get_backend_name() != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        raise RuntimeError("backup รองรับเฉพาะฐานข้อมูล SQLite แบบไฟล์")
+    return Path(engine.url.database).resolve()
+
+def _integrity(db_file: Path) -> str:
+    conn = sqlite3.connect(f"file:{db_file.as_posix()}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "\n".join(r[0] for r in rows)
+
+def _gunzip(src: Path, dst: Path):
+    with gzip.open(src, "rb") as f, open(dst, "wb") as out:
+        shutil.copyfileobj(f, out, 1 << 20)
+
+
+# ---------- backup ----------
+def take(out_dir: Path = BACKUP_DIR, label: str = "") -> dict:
+    """สำรอง 1 ไฟล์ (ตรวจแล้ว) + หมุนเวียน ; คืน {"path", "bytes", "pages", "seconds"}"""
+    src_path = _source_path()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    name = PREFIX + datetime.now().strftime("%Y%m%d-%H%M%S") + (f"-{label}" if label else "")
+    raw = out_dir / (name + ".db.part")
+    final = out_dir / (name + SUFFIX)
+
+    t0 = time.perf_counter()
+    pages = 0
+    def _step(status, remaining, total):
+        nonlocal pages
+        pages = total
+        if remaining:
+            time.sleep(PAUSE_S)                     # เปิดช่องให้ผู้เขียนระหว่างรอบ
+
+    src = sqlite3.connect(f"file:{src_path.as_posix()}?mode=ro", uri=True, isolation_level=None)
+    dst = sqlite3.connect(raw)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # เปิด read transaction ค้างไว้: ทุกรอบอ่านจาก snapshot เดียวกัน -> การเขียนระหว่างนั้น
+            # ไม่ทำให้ต้องเริ่มใหม่ และ WAL ไม่บล็อกผู้เขียน
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=PAGES_PER_STEP, progress=_step)
+    finally:
+        dst.close()
+        src.close()
+
+    try:
+        tmp = final.with_suffix(".tmp")
+        with open(raw, "rb") as f, gzip.open(tmp, "wb", compresslevel=6) as out:
+            shutil.copyfileobj(f, out, 1 << 20)
+        os.replace(tmp, final)
+        result = verify(final)
+        if result != "ok":
+            final.unlink(missing_ok=True)
+            raise RuntimeError(f"integrity_check ไม่ผ่าน: {result}")
+    finally:
+        raw.unlink(missing_ok=True)
+
+    rotate(out_dir)
+    return {"path": str(final), "bytes": final.stat().st_size, "pages": pages,
+            "seconds": round(time.perf_counter() - t0, 2)}
+
+def list_backups(out_dir: Path = BACKUP_DIR, labelled: bool = True) -> list[Path]:
+    """ไฟล์สำรองเรียงจากเก่าไปใหม่ (ชื่อมี timestamp) ; labelled=False -> เฉพาะไฟล์ตามรอบ"""
+    files = sorted(Path(out_dir).glob(f"{PREFIX}*{SUFFIX}"))
+    return files if labelled else [p for p in files if _ROTATED.fullmatch(p.name)]
+
+def rotate(out_dir: Path = BACKUP_DIR, keep: int | None = None) -> list[Path]:
+    """ลบไฟล์ตามรอบที่เก่าเกิน keep ไฟล์ (ค่าเริ่มต้น BACKUP_KEEP) ; ไฟล์ที่มี label ไม่แตะ ; คืนรายการที่ลบ"""
+    keep = BACKUP_KEEP if keep is None else keep
+    old = list_backups(out_dir, labelled=False)[:-keep] if keep > 0 else []
+    for p in old:
+        p.unlink(missing_ok=True)
+    return old
+
+def scheduled():
+    """งานตามรอบของ scheduler: ข้ามถ้ามีไฟล์ที่ใหม่กว่ารอบอยู่แล้ว (หลาย worker/รีสตาร์ทไม่สำรองซ้ำ)"""
+    try:
+        _source_path()
+    except RuntimeError:
+        return None
+    latest = list_backups(labelled=False)
+    if latest and time.time() - latest[-1].stat().st_mtime < BACKUP_INTERVAL:
+        return None
+    info = take()
+    print(f"🧰 backup: {info['path']} ({info['bytes'] / 1e6:.1f} MB, {info['seconds']} s)")
+    return info
+
+
+# ---------- verify / restore ----------
+def verify(backup_file: Path) -> str:
+    """แตกไฟล์สำรองลงที่ชั่วคราวแล้วรัน integrity_check ; คืน "ok" หรือข้อความปัญหา"""
+    with tempfile.TemporaryDirectory() as d:
+        db_file = Path(d) / "verify.db"
+        _gunzip(Path(backup_file), db_file)
+        return _integrity(db_file)
+
+def restore(backup_file: Path, target: Path) -> Path:
+    """แตกไฟล์สำรองเป็นฐานข้อมูลใหม่ (ไม่เขียนทับไฟล์ที่มีอยู่) แล้วตรวจก่อนส่งคืน"""
+    target = Path(target)
+    if target.exists():
+        raise FileExistsError(f"{target} มีอยู่แล้ว")
+    tmp = target.with_name(target.name + ".part")
+    _gunzip(Path(backup_file), tmp)
+    result = _integrity(tmp)
+    if result != "ok":
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"integrity_check ไม่ผ่าน: {result}")
+    os.replace(tmp, target)
+    return target
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--list" in args:
+        for p in list_backups():
+            print(f"{p.name:40s} {p.stat().st_size / 1e6:8.1f} MB")
+    elif "--verify" in args:
+        f = Path(args[args.index("--verify") + 1])
+        result = verify(f)
+        print(f"{'✅' if result == 'ok' else '❌'} {f.name}: {result}")
+        sys.exit(0 if result == "ok" else 1)
+    elif "--restore" in args:
+        i = args.index("--restore")
+        target = restore(Path(args[i + 1]), Path(args[i + 2]))
+        print(f"✅ Restored -> {target}")
+    else:
+        info = take()
+        print(f"✅ Backup -> {info['path']} ({info['pages']} pages, {info['seconds']} s)")
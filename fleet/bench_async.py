@@ -0,0 +1,92 @@
+# fleet/bench_async.py
+"""เทียบ throughput ของตัวอ่านแบบ sync (thread pool) กับแบบ async (aiosqlite)
+
+    python -m fleet.bench_async --requests 400 --concurrency 32 --reader usage
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from fleet import queries, aqueries
+from fleet.fiscal import fiscal_year, fy_bounds
+
+
+def _args_for(reader: str):
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    fy_start, fy_end = fy_bounds(fiscal_year(now))
+    m_start = today.replace(day=1)
+    return {
+        "usage":     ("fetch_usage", (), {"limit": 200}),
+        "cars":      ("fetch_cars", (), {}),
+        "calendar":  ("fetch_calendar", (date.today().replace(day=1), date.today() + timedelta(days=92)), {}),
+        "dashboard": ("fetch_dashboard", (fy_start, fy_end, today,
+                                          m_start, (m_start + timedelta(days=32)).replace(day=1)), {}),
+    }[reader]
+
+def _summary(label: str, lat: list[float], wall: float) -> dict:
+    lat = sorted(lat)
+    res = {
+        "mode": label,
+        "requests": len(lat),
+        "wall_s": round(wall, 3),
+        "rps": round(len(lat) / wall, 1) if wall else 0.0,
+        "p50_ms": round(statistics.median(lat) * 1000, 2),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1] * 1000, 2),
+    }
+    print(f"{label:>5}: {res['rps']:>8} req/s | p50 {res['p50_ms']} ms | p95 {res['p95_ms']} ms")
+    return res
+
+def bench_sync(reader: str, n: int, concurrency: int) -> dict:
+    name, args, kwargs = _args_for(reader)
+    fn = getattr(queries, name)
+
+    def one(_):
+        t = time.perf_counter()
+        fn(*args, **kwargs)
+        return time.perf_counter() - t
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        lat = list(ex.map(one, range(n)))
+    return _summary("sync", lat, time.perf_counter() - t0)
+
+async def _bench_async(reader: str, n: int, concurrency: int) -> dict:
+    name, args, kwargs = _args_for(reader)
+    fn = getattr(aqueries, name)
+    sem = asyncio.Semaphore(concurrency)
+    lat: list[float] = []
+
+    async def one():
+        async with sem:
+            t = time.perf_counter()
+            await fn(*args, **kwargs)
+            lat.append(time.perf_counter() - t)
+
+    await fn(*args, **kwargs)   # warm-up: เปิด connection pool ก่อนจับเวลา
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    return _summary("async", lat, time.perf_counter() - t0)
+
+def bench_async(reader: str, n: int, concurrency: int) -> dict:
+    return asyncio.run(_bench_async(reader, n, concurrency))
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--reader", choices=["usage", "cars", "calendar", "dashboard"], default="usage")
+    a = ap.parse_args()
+
+    print(f"reader={a.reader} requests={a.requests} concurrency={a.concurrency}")
+    s = bench_sync(a.reader, a.requests, a.concurrency)
+    r = bench_async(a.reader, a.requests, a.concurrency)
+    if s["rps"]:
+        print(f"async/sync throughput = {r['rps'] / s['rps']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+# fleet/cache.py
+"""เวอร์ชันของตาราง + memo ที่ผูกกับเวอร์ชัน
+
+ทุกจุดที่เขียนตารางเรียก bump("usage_logs", ...) ; ฟังก์ชันที่ห่อด้วย @versioned(...)
+จะคืนผลเดิมจนกว่าเวอร์ชันของตารางที่ผูกไว้ (หรือค่า key() เสริม) จะเปลี่ยน
+
+เวอร์ชันของตาราง = (ตัวนับใน process, ตัวนับใน DB)
+- ตัวนับใน process เพิ่มด้วย bump() (มีผลทันที แม้ DB ไม่ใช่ SQLite)
+- ตัวนับใน DB อยู่ในตาราง table_versions (trigger เพิ่มให้, db.init_table_versions)
+  ทำให้หลาย worker เห็นการเขียนของกันและกัน ; การตรวจแต่ละครั้งเรียกแค่ PRAGMA data_version
+  บน connection อ่านอย่างเดียวของ process และอ่าน table_versions เฉพาะเมื่อมี commit ใหม่
+
+ผลของ @versioned(..., shared=True) เก็บใน cache กลางที่ทุก worker ใช้ร่วมกันได้ (FLEET_CACHE_URL):
+    memory (ค่าเริ่มต้น)          ไม่มี cache กลาง (memo ใน process อย่างเดียว)
+    sqlite:///path/cache.db       ไฟล์ SQLite (WAL) บนเครื่องเดียวกัน ; "sqlite://" = fleet/cache.db
+    redis://host:6379/0           เซิร์ฟเวอร์ที่พูดโปรโตคอล Redis (client ในไฟล์นี้ ไม่ต้องติดตั้งเพิ่ม)
+ค่าใน cache กลางผูกกับตัวนับใน DB (ไม่ใช่ตัวนับใน process) จึงใช้ข้าม worker ได้ถูกต้อง
+และใช้เฉพาะเมื่อตัวนับใน DB ใช้งานได้ ; worker ใหม่อ่านผลที่คำนวณไว้แล้วได้ทันที (ไม่ต้อง warm up เอง)
+"""
+from __future__ import annotations
+import functools
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+_lock = threading.Lock()
+_versions: dict[str, int] = {}
+
+
+def bump(*tables: str) -> None:
+    """ประกาศว่าตารางเหล่านี้ถูกแก้ไขแล้ว (cache ที่ผูกไว้จะคำนวณใหม่ครั้งถัดไป)
+
+    แจ้ง "tables.changed" บน events bus ด้วย (fleet/live.py ใช้ส่งสถานะ live)
+    """
+    with _lock:
+        for t in tables:
+            _versions[t] = _versions.get(t, 0) + 1
+    from fleet.events import publish
+    publish({"kind": "tables.changed", "tables": list(tables)})
+
+def version(*tables: str) -> tuple[tuple[int, int], ...]:
+    shared = _shared_versions()
+    return tuple((_versions.get(t, 0), shared.get(t, 0)) for t in tables)
+
+
+# ---------- ตัวนับใน DB (ข้าม process) ----------
+_db_lock = threading.Lock()
+_db = None              # sqlite3.Connection ; False = ใช้ไม่ได้ (ไม่ใช่ไฟล์ SQLite)
+_db_seen = None
+_db_versions: dict[str, int] = {}
+
+def _connect():
+    from fleet.db import engine
+    path = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or not path or path == ":memory:":
+        return False
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+def _shared_versions() -> dict[str, int]:
+    global _db, _db_seen, _db_versions
+    with _db_lock:
+        if _db is None:
+            try:
+                _db = _connect()
+            except sqlite3.Error:
+                _db = False
+        if _db is False:
+            return _db_versions
+        try:
+            # data_version เปลี่ยนเมื่อ connection อื่น (ทั้งใน/นอก process) commit
+            seen = _db.execute("PRAGMA data_version").fetchone()[0]
+            if seen != _db_seen:
+                _db_versions = dict(_db.execute("SELECT name, version FROM table_versions").fetchall())
+                _db_seen = seen
+        except sqlite3.Error:
+            pass                                    # ยังไม่มีตาราง/ไฟล์ (ก่อน init_db) -> ใช้ค่าเดิม
+        return _db_versions
+
+
+def _shared_ok() -> bool:
+    _shared_versions()
+    return bool(_db)
+
+def stamp(*tables: str) -> tuple:
+    """เวอร์ชันที่เทียบข้าม process ได้ (ตัวนับใน DB) ; ใช้ไม่ได้ -> version() ของ process นี้"""
+    v = version(*tables)
+    return tuple(s for _, s in v) if _shared_ok() else v
+
+def _after_fork():
+    # connection sqlite3 ห้ามใช้ข้าม fork -> process ลูก (เช่น background job) เปิดใหม่เอง
+    global _db, _db_seen, _db_lock
+    _db, _db_seen, _db_lock = None, None, threading.Lock()
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+# ---------- cache กลาง (ข้าม process) ----------
+# backend: get(key) -> bytes | None, set(key, bytes, ttl) ; ล้มเหลว = miss (หน้าเว็บต้องไม่พังเพราะ cache)
+SHARED_TTL = 24 * 3600
+
+class SQLiteBackend:
+    """key/value บนไฟล์ SQLite แยกจาก fleet.db (WAL: อ่านพร้อมกันหลาย worker ได้)"""
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, at REAL NOT NULL
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> bytes | None:
+        row = self._conn().execute("SELECT value, expires FROM kv WHERE key = ?", (key,)).fetchone()
+        return row[0] if row and row[1] > time.time() else None
+
+    def set(self, key: str, value: bytes, ttl: int = SHARED_TTL):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO kv (key, value, expires, at) VALUES (?, ?, ?, ?)",
+                     (key, value, now + ttl, now))
+        self._writes += 1
+        if self._writes % 200 == 0:          # ตัดของหมดอายุ/เก่าสุดเป็นระยะ
+            conn.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+            conn.execute("""
+                DELETE FROM kv WHERE key NOT IN (SELECT key FROM kv ORDER BY at DESC LIMIT ?)
+            """, (self.max_entries,))
+
+
+class RedisBackend:
+    """client โปรโตคอล Redis (RESP) ขนาดเล็ก: GET / SET EX ; หนึ่ง socket ต่อ thread
+
+    redis://[[user]:password@]host:port/db ; rediss:// = TLS
+    """
+
+    def __init__(self, url: str, timeout: float = 0.5):
+        u = urlparse(url)
+        self.addr = (u.hostname or "127.0.0.1", u.port or 6379)
+        self.username = u.username or None
+        self.password = u.password
+        self.db = int((u.path or "/0").lstrip("/") or 0)
+        self.tls = u.scheme == "rediss"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _sock(self):
+        f = getattr(self._local, "f", None)
+        if f is None:
+            sock = socket.create_connection(self.addr, timeout=self.timeout)
+            if self.tls:
+                import ssl
+                sock = ssl.create_default_context().wrap_socket(sock, server_hostname=self.addr[0])
+            f = self._local.f = sock.makefile("rwb")
+            self._local.sock = sock
+            if self.password:
+                self._call(f, "AUTH", *([self.username] if self.username else []), self.password)
+            if self.db:
+                self._call(f, "SELECT", str(self.db))
+        return f
+
+    @staticmethod
+    def _call(f, *parts):
+        out = [b"*%d\r\n" % len(parts)]
+        for p in parts:
+            b = p if isinstance(p, bytes) else str(p).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        f.write(b"".join(out))
+        f.flush()
+        line = f.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("redis: connection closed")      # server ปิด/รีสตาร์ท
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"-":
+            raise RuntimeError(rest.decode(errors="replace"))
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = f.read(n + 2)
+            if len(data) != n + 2:
+                raise ConnectionError("redis: connection closed")
+            return data[:-2]
+        return rest
+
+    def _reset(self):
+        for name in ("f", "sock"):
+            obj = getattr(self._local, name, None)
+            setattr(self._local, name, None)
+            if obj is not None:
+                try:
+                    obj.close()
+                except OSError:
+                    pass
+
+    def _do(self, *parts):
+        try:
+            return self._call(self._sock(), *parts)
+        except (OSError, RuntimeError, ValueError):
+            self._reset()                         # ต่อใหม่รอบหน้า
+            return None
+
+    def get(self, key: str) -> bytes | None:
+        return self._do("GET", key)
+
+    def set(self, key: str, value: bytes, ttl: int = SHARED_TTL):
+        self._do("SET", key, value, "EX", str(int(ttl)))
+
+
+def make_backend(url: str | None):
+    url = (url or "").strip()
+    if not url or url == "memory":
+        return None
+    if url.startswith("sqlite://"):
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else ""
+        if not path:
+            from fleet.db import PROJECT_DIR
+            path = str(PROJECT_DIR / "cache.db")
+        return SQLiteBackend(path)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    raise ValueError(f"FLEET_CACHE_URL ไม่รองรับ: {url}")
+
+BACKEND = make_backend(os.getenv("FLEET_CACHE_URL"))
+_LOCAL_MAX = int(os.getenv("FLEET_CACHE_LOCAL_MAX", "256"))   # memo ใน process ต่อฟังก์ชัน (LRU)
+_LOCAL_MAX_SHARED = 16          # memo ใน process ของฟังก์ชัน shared เก็บแค่ไม่กี่ชุด args
+
+
+def _shared_get(skey: str, sstamp):
+    try:
+        blob = BACKEND.get(skey)
+        if blob is not None:
+            stamp, value = pickle.loads(blob)
+            if stamp == sstamp:
+                return True, value
+    except Exception:
+        pass
+    return False, None
+
+def _shared_set(skey: str, sstamp, value):
+    try:
+        BACKEND.set(skey, pickle.dumps((sstamp, value), protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        pass
+
+
+def versioned(*tables: str, key=None, shared: bool = False):
+    """memo ผลล่าสุดต่อชุด args ; คำนวณใหม่เมื่อ version(*tables) หรือ key() เปลี่ยน
+
+    อ่านเวอร์ชันก่อนคำนวณ ถ้ามีการเขียนระหว่างคำนวณ ผลจะถูกเก็บด้วยเวอร์ชันเก่าและถูกคำนวณใหม่รอบหน้า
+    callback ที่ยิงพร้อมกันด้วย args เดียวกันจะรอผลของตัวแรก (คำนวณครั้งเดียว)
+    shared=True -> ผลต้อง pickle ได้ ; ถ้าตั้ง FLEET_CACHE_URL ไว้จะอ่าน/เขียน cache กลางด้วย
+    memo ใน process เก็บไม่เกิน FLEET_CACHE_LOCAL_MAX ชุด args (shared: 16) แบบ LRU พร้อม lock ของชุดนั้น
+    """
+    def deco(fn):
+        memo: OrderedDict[tuple, tuple] = OrderedDict()     # args -> (stamp, value) ; ท้ายสุด = ใช้ล่าสุด
+        locks: dict[tuple, threading.Lock] = {}
+        name = f"fleet:{fn.__module__}.{fn.__qualname__}"
+        cap = _LOCAL_MAX_SHARED if shared else _LOCAL_MAX
+
+        @functools.wraps(fn)
+        def wrapper(*args):
+            stamp = (version(*tables), key() if key else None)
+            hit = memo.get(args)
+            if hit is not None and hit[0] == stamp:
+                with _lock:
+                    if args in memo:
+                        memo.move_to_end(args)
+                return hit[1]
+            with _lock:
+                lk = locks.setdefault(args, threading.Lock())
+            try:
+                with lk:
+                    hit = memo.get(args)
+                    if hit is not None and hit[0] == stamp:
+                        return hit[1]
+                    use_shared = shared and BACKEND is not None and _shared_ok()
+                    if use_shared:
+                        # ใช้เฉพาะตัวนับใน DB (เหมือนกันทุก worker)
+                        sstamp = (tuple(v for _, v in stamp[0]), stamp[1])
+                        skey = f"{name}:{args!r}"
+                        found, value = _shared_get(skey, sstamp)
+                        if not found:
+                            value = fn(*args)
+                            _shared_set(skey, sstamp, value)
+                    else:
+                        value = fn(*args)
+                    with _lock:
+                        memo[args] = (stamp, value)
+                        memo.move_to_end(args)
+                        while len(memo) > cap:
+                            old, _ = memo.popitem(last=False)
+                            locks.pop(old, None)         # lock ของชุด args ที่ถูกไล่ออกไม่ต้องเก็บ
+                return value
+            finally:
+                with _lock:
+                    if args not in memo:                 # fn error / ถูกไล่ออกแล้ว -> ไม่ค้าง lock ไว้
+                        locks.pop(args, None)
+
+        def invalidate():
+            with _lock:
+                memo.clear()
+                locks.clear()
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return deco
@@ -0,0 +1,228 @@
+# fleet/columnar.py
+"""snapshot แบบคอลัมน์ (numpy) ของประวัติการใช้รถ / ใบงานซ่อม อยู่ในหน่วยความจำของ process
+
+- โหลดครั้งแรกทั้งตาราง จากนั้นอ่านเพิ่มเฉพาะ id > high-water mark เมื่อ cache.bump(ตาราง)
+- เวลาแปลงฝั่ง SQLite เป็น epoch วินาที (strftime('%s')) -> datetime64 ตรง ๆ ไม่ต้อง parse ใน Python
+  (ค่าเวลาใน DB เป็นเวลาท้องถิ่นแบบ naive ; epoch ที่ได้จึงแทนเวลาเดียวกันแบบ naive)
+- แถวที่ยังแก้ไขได้ (usage ที่ยังไม่คืน / ใบงานที่ถูกแก้ผ่าน touch()) ถูกอ่านซ้ำเฉพาะ id นั้น
+- จำนวนแถวใน DB ไม่ตรงกับ snapshot (มีการลบ) -> โหลดใหม่ทั้งตาราง
+- อ่านจาก view *_all (ตารางร้อน + archive, fleet/archive.py) ; การย้ายไป archive ไม่เปลี่ยนจำนวนแถว/ค่า
+  snapshot จึงไม่ต้องโหลดใหม่เมื่อ archive
+
+    from fleet.columnar import USAGE, ORDERS
+    cols = USAGE.columns()                 # dict ของ view (ไม่ copy) ยาวเท่าจำนวนแถว
+    m = usage_window(start, end)           # mask ของรายการที่คาบเกี่ยวช่วงเวลา
+    df = ORDERS.frame()                    # pandas DataFrame บน array เดิม
+"""
+from __future__ import annotations
+import threading
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from fleet.cache import version
+from fleet.db import engine
+from fleet import fiscal
+
+NAT = np.iinfo(np.int64).min                 # ค่า int64 ของ NaT
+
+
+def _epoch(col: str) -> str:
+    """นิพจน์ SQLite: ข้อความเวลา -> epoch วินาที (NULL/แปลงไม่ได้ -> NULL)"""
+    return f"CAST(strftime('%s', {col}) AS INTEGER)"
+
+
+class Snapshot:
+    """คอลัมน์ของตารางเดียว เรียงตาม id ; array จองเผื่อแล้วขยายทีละ 2 เท่า
+
+    columns: {ชื่อ: (นิพจน์ SQL, dtype)} ; dtype datetime64 เก็บเป็น int64 แล้ว view
+    mutable: เงื่อนไข (บน snapshot) ของแถวที่อาจถูก UPDATE -> อ่านซ้ำทุกครั้งที่ refresh
+    """
+
+    def __init__(self, table: str, columns: dict[str, tuple[str, str]],
+                 mutable=None, tables: tuple[str, ...] | None = None):
+        self.table = table
+        self.spec = columns
+        self.mutable = mutable
+        self.tables = tables or (table,)
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._touched: set[int] = set()
+        self._reset(0)
+
+    # ----- storage -----
+    def _reset(self, capacity: int):
+        self.n = 0
+        self.hw = 0
+        self.id = np.empty(capacity, dtype=np.int64)
+        self._data = {k: np.empty(capacity, dtype=_store_dtype(dt)) for k, (_, dt) in self.spec.items()}
+
+    def _grow(self, need: int):
+        cap = len(self.id)
+        if need <= cap:
+            return
+        cap = max(need, cap * 2, 1024)
+        self.id = _resized(self.id, cap)
+        self._data = {k: _resized(a, cap) for k, a in self._data.items()}
+
+    def _select(self, where: str) -> str:
+        cols = ", ".join(expr for expr, _ in self.spec.values())
+        return f"SELECT id, {cols} FROM {self.table} WHERE {where} ORDER BY id"
+
+    def _fetch(self, where: str, params: dict) -> list[tuple]:
+        with engine.begin() as conn:
+            return conn.execute(text(self._select(where)), params).all()
+
+    def _columns_of(self, rows: list[tuple]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+        cols = list(zip(*rows)) if rows else [()] * (len(self.spec) + 1)
+        ids = np.fromiter(cols[0], dtype=np.int64, count=len(rows))
+        out = {}
+        for (k, (_, dt)), values in zip(self.spec.items(), cols[1:]):
+            sdt = _store_dtype(dt)
+            fill = NAT if dt.startswith("datetime64") else 0
+            out[k] = np.fromiter((fill if v is None else v for v in values), dtype=sdt, count=len(rows))
+        return ids, out
+
+    def _append(self, rows: list[tuple]):
+        if not rows:
+            return
+        ids, cols = self._columns_of(rows)
+        lo, hi = self.n, self.n + len(ids)
+        self._grow(hi)
+        self.id[lo:hi] = ids
+        for k, a in cols.items():
+            self._data[k][lo:hi] = a
+        self.n = hi
+        self.hw = int(ids[-1])
+
+    def _patch(self, ids: np.ndarray) -> bool:
+        """อ่านแถวตาม id ใหม่แล้วเขียนทับ ; คืน False ถ้ามีแถวหายไป (ถูกลบ)"""
+        if len(ids) == 0:
+            return True
+        rows = []
+        for i in range(0, len(ids), 500):                 # กันเกินจำนวนตัวแปรของ SQLite
+            chunk = [int(x) for x in ids[i:i + 500]]
+            marks = ", ".join(f":p{j}" for j in range(len(chunk)))
+            rows += self._fetch(f"id IN ({marks})", {f"p{j}": v for j, v in enumerate(chunk)})
+        if len(rows) != len(ids):
+            return False
+        new_ids, cols = self._columns_of(rows)
+        pos = np.searchsorted(self.id[:self.n], new_ids)
+        for k, a in cols.items():
+            self._data[k][pos] = a
+        return True
+
+    def _count(self) -> int:
+        with engine.begin() as conn:
+            return conn.execute(text(f"SELECT COUNT(*) FROM {self.table} WHERE id <= :hw"),
+                                {"hw": self.hw}).scalar()
+
+    # ----- sync -----
+    def reload(self):
+        with self._lock:
+            self._reload()
+
+    def _reload(self):
+        self._reset(0)
+        self._touched.clear()
+        self._append(self._fetch("1=1", {}))
+
+    def touch(self, *ids: int):
+        """แจ้งว่าแถวเหล่านี้ถูก UPDATE (อ่านซ้ำตอน refresh ครั้งถัดไป)"""
+        with self._lock:
+            self._touched.update(int(i) for i in ids if i is not None)
+
+    def refresh(self) -> "Snapshot":
+        """ทำให้ทันตาราง ; ไม่มี bump ตั้งแต่ครั้งก่อน -> ไม่แตะ DB"""
+        stamp = version(*self.tables)
+        if stamp == self._stamp:
+            return self
+        with self._lock:
+            if stamp == self._stamp:
+                return self
+            # มีการเขียนจาก process อื่น (ตัวนับใน DB เปลี่ยนแต่ bump ใน process ไม่เปลี่ยน)
+            # -> ไม่รู้ว่าแถวไหนถูกแก้ ; ตารางที่ไม่มีเงื่อนไข mutable ต้องโหลดใหม่
+            foreign = (self._stamp is not None and self.mutable is None
+                       and [l for l, _ in stamp] == [l for l, _ in self._stamp])
+            if self._stamp is None or foreign:
+                self._reload()
+            else:
+                old = self.n
+                ids = self.id[:old]
+                dirty = np.zeros(old, dtype=bool)
+                if self.mutable is not None:
+                    dirty |= self.mutable(self._view(old))
+                if self._touched:
+                    dirty |= np.isin(ids, np.fromiter(self._touched, dtype=np.int64))
+                ok = self._patch(ids[dirty]) and self._count() == old
+                if ok:
+                    self._append(self._fetch("id > :hw", {"hw": self.hw}))
+                    self._touched.clear()
+                else:
+                    self._reload()
+            self._stamp = stamp
+        return self
+
+    # ----- read -----
+    def _view(self, n: int) -> dict[str, np.ndarray]:
+        out = {"id": self.id[:n]}
+        for k, (_, dt) in self.spec.items():
+            a = self._data[k][:n]
+            out[k] = a.view(dt) if dt.startswith("datetime64") else a
+        return out
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """view (ไม่ copy) ของทุกคอลัมน์ ; ห้ามแก้ค่าใน array ที่ได้"""
+        self.refresh()
+        return self._view(self.n)
+
+    def frame(self, mask: np.ndarray | None = None) -> pd.DataFrame:
+        cols = self.columns()
+        if mask is not None:
+            cols = {k: v[mask] for k, v in cols.items()}
+        return pd.DataFrame(cols, copy=False)
+
+    def __len__(self) -> int:
+        return self.refresh().n
+
+
+def _store_dtype(dt: str) -> str:
+    return "int64" if dt.startswith("datetime64") else dt
+
+def _resized(a: np.ndarray, cap: int) -> np.ndarray:
+    out = np.empty(cap, dtype=a.dtype)
+    out[:len(a)] = a
+    return out
+
+
+# ---------- snapshots ----------
+USAGE = Snapshot("usage_logs_all", {
+    "car_id":           ("car_id", "int32"),
+    "start":            (_epoch("start_time"), "datetime64[s]"),
+    "planned_end":      (_epoch("planned_end_time"), "datetime64[s]"),
+    "returned_at":      (_epoch("returned_at"), "datetime64[s]"),
+    "is_maintenance":   ("IFNULL(is_maintenance, 0)", "int8"),
+}, mutable=lambda c: np.isnat(c["returned_at"]),          # ยังไม่คืน -> อาจถูกคืน/แก้กำหนดคืน
+   tables=("usage_logs",))
+
+ORDERS = Snapshot("maintenance_orders_all", {
+    "car_id":           ("car_id", "int32"),
+    "accept_date":      (_epoch("accept_date"), "datetime64[s]"),
+    "grand_total":      ("IFNULL(grand_total, 0)", "float64"),
+}, tables=("maintenance_orders",))
+
+
+# ---------- analytics (view บน snapshot) ----------
+def usage_window(start, end) -> np.ndarray:
+    """mask ของรายการใช้รถที่คาบเกี่ยว [start, end) (ยังไม่คืน -> นับถึงกำหนดคืน/ตอนนี้)"""
+    c = USAGE.columns()
+    s, e = np.datetime64(start, "s"), np.datetime64(end, "s")
+    until = np.where(np.isnat(c["returned_at"]), c["planned_end"], c["returned_at"])
+    until = np.where(np.isnat(until), np.datetime64(fiscal.now_local(), "s"), until)
+    return (c["start"] < e) & (until >= s) & ~np.isnat(c["start"])
+
+def orders_fiscal() -> dict[str, np.ndarray]:
+    """ใบงานซ่อม + bucket ปีงบฯ ของ accept_date (คำนวณทั้งคอลัมน์)"""
+    c = ORDERS.columns()
+    return {**c, **fiscal.bucket(c["accept_date"])}
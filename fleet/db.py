@@ -17,6 +17,23 @@ engine = create_engine(DATABASE_URL, echo=True, future=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+# ---------- async engine (ตัวเลือก: ใช้กับ API / รายงานที่รันนาน) ----------
+# เปิดด้วย FLEET_ASYNC_DB=1 (ต้องติดตั้ง aiosqlite) ; ระบุ URL เองได้ด้วย FLEET_ASYNC_DB_URL
+ASYNC_DB_ENABLED = os.getenv("FLEET_ASYNC_DB", "0") not in ("", "0", "false", "no")
+ASYNC_DATABASE_URL = os.getenv(
+    "FLEET_ASYNC_DB_URL",
+    DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///", 1),
+)
+_async_engine = None
+
+def get_async_engine():
+    """สร้าง AsyncEngine ครั้งแรกที่เรียก (import sqlalchemy.ext.asyncio แบบ lazy)"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, future=True)
+    return _async_engine
+
 def init_users_table():
     with engine.begin() as conn:
         conn.execute(text("""
@@ -107,6 +124,18 @@ def init_usage_logs_table():
         add_missing("returned_at",      "returned_at DATETIME")
         add_missing("is_maintenance",   "is_maintenance INTEGER DEFAULT 0")
         add_missing("planned_end_time", "planned_end_time DATETIME")
+        # ค้นตามช่วงเวลา (fleet/queries.usage_where) + รายการที่ยังไม่คืน
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_usage_time ON usage_logs (start_time, planned_end_time)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_usage_planned_end ON usage_logs (planned_end_time)"))
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_usage_open
+            ON usage_logs (start_time) WHERE returned_at IS NULL
+        """))
+        # สถานะรถ (CAR_STATUS_SQL, trigger usage_*) : รายการที่ยังไม่คืนของรถคันนั้น
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_usage_active
+            ON usage_logs (car_id) WHERE returned_at IS NULL
+        """))
 
 def init_maintenance_tables():
     with engine.begin() as conn:
@@ -178,29 +207,47 @@ def init_maintenance_tables():
 
 def backfill_committees_from_legacy():
     """ย้ายข้อมูลจาก maintenance_orders.committee (TEXT รายชื่อคั่น ,) → maintenance_committee
-       ชื่อที่หา user_id ไม่เจอจะถูกข้ามไป"""
+       ชื่อที่หา user_id ไม่เจอจะถูกข้ามไป
+
+    แยกชื่อครั้งเดียวทั้งตารางด้วย recursive CTE -> ลบ + เพิ่มแบบ set-based (ไม่วนทีละใบงาน)
+    ใบงานที่ไม่มีชื่อไหนตรงกับผู้ใช้ -> ไม่แตะกรรมการเดิม ; ชื่อซ้ำใน users -> ใช้ id ล่าสุด
+    """
     with engine.begin() as conn:
         conn.execute(text("PRAGMA foreign_keys = ON"))
-
-        users = conn.execute(text("SELECT id, full_name FROM users")).mappings().all()
-        name2id = {u["full_name"].strip(): u["id"] for u in users}
-
-        orders = conn.execute(text("""
-            SELECT id, committee
-            FROM maintenance_orders
-            WHERE committee IS NOT NULL AND TRIM(committee) <> ''
-        """)).mappings().all()
-
-        for o in orders:
-            names = [s.strip() for s in (o["committee"] or "").split(",") if s.strip()]
-            uids  = [name2id[n] for n in names if n in name2id]
-            if not uids:
-                continue
-            conn.execute(text("DELETE FROM maintenance_committee WHERE order_id=:oid"), {"oid": o["id"]})
-            conn.execute(
-                text("INSERT OR IGNORE INTO maintenance_committee (order_id, user_id) VALUES (:oid, :uid)"),
-                [{"oid": o["id"], "uid": uid} for uid in uids]
+        conn.execute(text("""
+            CREATE TEMP TABLE _committee_backfill AS
+            WITH RECURSIVE split(order_id, name, rest) AS (
+                SELECT id, '', committee || ','
+                FROM maintenance_orders
+                WHERE committee IS NOT NULL AND TRIM(committee) <> ''
+                UNION ALL
+                SELECT order_id,
+                       TRIM(substr(rest, 1, instr(rest, ',') - 1)),
+                       substr(rest, instr(rest, ',') + 1)
+                FROM split
+                WHERE rest <> ''
+            ),
+            name2id AS (
+                SELECT TRIM(full_name) AS name, MAX(id) AS user_id
+                FROM users
+                GROUP BY TRIM(full_name)
             )
+            SELECT DISTINCT s.order_id, n.user_id
+            FROM split s
+            JOIN name2id n ON n.name = s.name
+            WHERE s.name <> ''
+        """))
+        try:
+            conn.execute(text("""
+                DELETE FROM maintenance_committee
+                WHERE order_id IN (SELECT order_id FROM _committee_backfill)
+            """))
+            conn.execute(text("""
+                INSERT OR IGNORE INTO maintenance_committee (order_id, user_id)
+                SELECT order_id, user_id FROM _committee_backfill
+            """))
+        finally:
+            conn.execute(text("DROP TABLE temp._committee_backfill"))
 
 
 def init_carlendar():
@@ -217,8 +264,107 @@ def init_carlendar():
         FOREIGN KEY(car_id) REFERENCES cars(id) ON DELETE CASCADE
     );
 """))
+        # ช่วงวันที่ทับซ้อน (fleet/queries.calendar_sql): end_date >= ต้นช่วง -> อ่านเฉพาะรายการปัจจุบัน/อนาคต
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_calendar_end ON car_calendar (end_date)"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_calendar_car ON car_calendar (car_id)"))
+
+def init_attachments_table():
+    """ไฟล์แนบหลายไฟล์ต่อรถ/ใบงานซ่อม (เก็บ metadata ไว้ค้นด้วย index แทนการเช็คไฟล์บนดิสก์)"""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS attachments (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity_type  TEXT NOT NULL,            -- car / maintenance
+                entity_id    INTEGER NOT NULL,         -- cars.id หรือ maintenance_orders.id
+                kind         TEXT NOT NULL DEFAULT 'pdf',
+                filename     TEXT,                     -- ชื่อไฟล์ตอนอัปโหลด
+                path         TEXT NOT NULL,            -- ที่เก็บจริงใน uploads/
+                sha256       TEXT NOT NULL,
+                size         INTEGER NOT NULL DEFAULT 0,
+                mime         TEXT,
+                uploaded_at  DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        # list/lookup ต่อ entity เรียงล่าสุดก่อน -> ใช้ index นี้ทั้งหมด
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_attach_entity
+            ON attachments (entity_type, entity_id, id)
+        """))
+        # ไฟล์เดียวกันแนบซ้ำกับ entity เดิมไม่ได้ (ทำให้ backfill รันซ้ำได้)
+        conn.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_attach_entity_hash
+            ON attachments (entity_type, entity_id, sha256)
+        """))
+
+def init_events_table():
+    """เหตุการณ์เปลี่ยนสถานะ (เช่น usage.overdue) ให้ scheduler บันทึก แล้วส่งต่อ notifier/client"""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS events (
+                id           INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind         TEXT NOT NULL,            -- usage.overdue ...
+                entity_type  TEXT NOT NULL,            -- usage / car / maintenance
+                entity_id    INTEGER NOT NULL,
+                payload      TEXT,                     -- JSON
+                dedup_key    TEXT UNIQUE,              -- กันบันทึกเหตุการณ์เดิมซ้ำ
+                created_at   DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_entity ON events (entity_type, entity_id, id)"))
+        # รายการที่ยังไม่คืนเรียงตามกำหนดคืน -> ตรวจ overdue ได้ด้วย index เดียว
+        conn.execute(text("""
+            CREATE INDEX IF NOT EXISTS ix_usage_overdue
+            ON usage_logs (planned_end_time) WHERE returned_at IS NULL
+        """))
+
+def init_scheduler_lease():
+    """สิทธิ์รัน scheduler (fleet/scheduler.py): หลาย worker ใช้ DB เดียวกัน -> process เดียวที่ถือ lease รันงานตามรอบ"""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS scheduler_lease (
+                name        TEXT PRIMARY KEY,
+                owner       TEXT NOT NULL,             -- host:pid
+                expires_at  REAL NOT NULL              -- epoch วินาที ; เลยแล้ว process อื่นรับต่อได้
+            )
+        """))
+
+# ตารางที่ cache ของหน้าเว็บผูกไว้ (fleet/cache.py) -> trigger นับการเปลี่ยนแปลงต่อตาราง
+VERSIONED_TABLES = ("cars", "users", "usage_logs", "maintenance_orders",
+                    "maintenance_items", "maintenance_committee", "car_calendar")
+
+def init_table_versions():
+    """table_versions(name, version) ถูกเพิ่มโดย trigger ทุกครั้งที่ตารางใน VERSIONED_TABLES ถูกเขียน
+
+    ทุก process/worker เห็นค่าเดียวกัน -> cache ในแต่ละ worker รู้ว่าอีก worker เขียนแล้ว
+    (cache.version ตรวจ PRAGMA data_version ก่อน จึงอ่านตารางนี้เฉพาะเมื่อมี commit ใหม่)
+    """
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name     TEXT PRIMARY KEY,
+                version  INTEGER NOT NULL DEFAULT 0
+            )
+        """))
+        for t in VERSIONED_TABLES:
+            for op in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(text(f"""
+                    CREATE TRIGGER IF NOT EXISTS tv_{t}_{op.lower()}
+                    AFTER {op} ON {t}
+                    BEGIN
+                        INSERT INTO table_versions (name, version) VALUES ('{t}', 1)
+                        ON CONFLICT(name) DO UPDATE SET version = version + 1;
+                    END;
+                """))
+
+def enable_wal():
+    """SQLite -> journal_mode=WAL (ค่าติดอยู่กับไฟล์) ให้ผู้อ่านหลายคนอ่านพร้อมกันได้ระหว่างมีการเขียน"""
+    if engine.url.get_backend_name() != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA journal_mode=WAL")
 
 def init_db():
+    enable_wal()
     # ถ้ามี ORM models อื่น ๆ ก็ import เพื่อ create_all ได้ แต่ไม่บังคับ
     try:
         from . import models  # noqa: F401
@@ -231,6 +377,16 @@ def init_db():
     init_usage_logs_table()
     init_maintenance_tables()
     init_carlendar()
+    init_attachments_table()
+    init_events_table()
+    init_scheduler_lease()
+    init_table_versions()
+    # ตาราง *_archive + view *_all (rollup rebuild อ่านจาก view) ต้องมีก่อน rollup
+    from .archive import init_archive
+    init_archive()
+    # rollup ของ Dashboard (ตาราง + trigger) ต้องตามหลังตารางต้นทาง
+    from .rollups import init_rollups
+    init_rollups()
 
 def install_usage_triggers():
     with engine.begin() as conn:
@@ -0,0 +1,139 @@
+# fleet/events.py
+"""บันทึกเหตุการณ์ลงตาราง events แล้วกระจายให้ผู้ฟังใน process (notifier / client ที่เชื่อมต่ออยู่)
+
+    record("usage.overdue", "usage", 42, {...}, dedup_key="usage.overdue:42:...")
+
+notifier ตั้งค่าด้วย env FLEET_NOTIFY (คั่นด้วย ,):
+    log              -> logging (logger "fleet.events")
+    file:<path>      -> ต่อท้ายไฟล์ JSON lines
+    none             -> ไม่ติดตั้ง
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable
+from sqlalchemy import text
+from fleet.db import engine
+
+log = logging.getLogger("fleet.events")
+
+_lock = threading.Lock()
+_subscribers: list[Callable[[dict], None]] = []
+
+
+# ---------- bus ----------
+def subscribe(fn: Callable[[dict], None]) -> Callable[[dict], None]:
+    with _lock:
+        _subscribers.append(fn)
+    return fn
+
+def unsubscribe(fn: Callable[[dict], None]) -> None:
+    with _lock:
+        if fn in _subscribers:
+            _subscribers.remove(fn)
+
+def publish(event: dict) -> None:
+    with _lock:
+        subs = list(_subscribers)
+    for fn in subs:
+        try:
+            fn(event)
+        except Exception as e:
+            log.warning("event subscriber error: %s", e)
+
+def listen(maxsize: int = 100) -> tuple[queue.Queue, Callable[[], None]]:
+    """คิวสำหรับ client ที่เชื่อมต่ออยู่ (เช่น stream) -> (queue, ฟังก์ชันยกเลิก)
+
+    คิวเต็ม (client ช้า) จะทิ้งเหตุการณ์ใหม่ของ client นั้น แทนที่จะบล็อกผู้ส่ง
+    """
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def put(event: dict):
+        try:
+            q.put_nowait(event)
+        except queue.Full:
+            pass
+
+    subscribe(put)
+    return q, lambda: unsubscribe(put)
+
+
+# ---------- storage ----------
+def record(kind: str, entity_type: str, entity_id: int, payload: dict | None = None,
+           dedup_key: str | None = None) -> dict | None:
+    """INSERT OR IGNORE ลง events ; ถ้าเป็นเหตุการณ์ใหม่จะ publish แล้วคืน dict ของเหตุการณ์"""
+    body = json.dumps(payload or {}, ensure_ascii=False, default=str)
+    with engine.begin() as conn:
+        rs = conn.execute(text("""
+            INSERT OR IGNORE INTO events (kind, entity_type, entity_id, payload, dedup_key)
+            VALUES (:k, :et, :eid, :p, :d)
+        """), {"k": kind, "et": entity_type, "eid": int(entity_id), "p": body, "d": dedup_key})
+        if rs.rowcount != 1:
+            return None
+        row = conn.execute(text("SELECT * FROM events WHERE id = last_insert_rowid()")).mappings().first()
+    event = _decode(dict(row))
+    publish(event)
+    return event
+
+def recent(after_id: int | None = None, limit: int = 100, kind: str | None = None) -> list[dict]:
+    """เหตุการณ์ที่ id > after_id (เก่า -> ใหม่) สำหรับ client ที่ต่อกลับมาแล้วต้องตามให้ทัน"""
+    where, params = ["id > :after"], {"after": int(after_id or 0), "lim": int(limit)}
+    if kind:
+        where.append("kind = :kind")
+        params["kind"] = kind
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"""
+            SELECT * FROM events WHERE {' AND '.join(where)} ORDER BY id ASC LIMIT :lim
+        """), params).mappings().all()
+    return [_decode(dict(r)) for r in rows]
+
+def _decode(row: dict) -> dict:
+    try:
+        row["payload"] = json.loads(row.get("payload") or "{}")
+    except ValueError:
+        pass
+    return row
+
+
+# ---------- notifiers ----------
+class LogNotifier:
+    def __call__(self, event: dict):
+        log.warning("[%s] %s #%s %s", event["kind"], event["entity_type"],
+                    event["entity_id"], event.get("payload"))
+
+class FileNotifier:
+    """ต่อท้ายไฟล์ JSON lines (หนึ่งเหตุการณ์ต่อบรรทัด)"""
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+_installed = False
+
+def install_notifiers(spec: str | None = None) -> list[Callable[[dict], None]]:
+    """ติดตั้ง notifier ตาม FLEET_NOTIFY (ครั้งเดียวต่อ process)"""
+    global _installed
+    if _installed:
+        return []
+    _installed = True
+    spec = spec if spec is not None else os.getenv("FLEET_NOTIFY", "log")
+    out = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part or part == "none":
+            continue
+        if part == "log":
+            out.append(subscribe(LogNotifier()))
+        elif part.startswith("file:"):
+            out.append(subscribe(FileNotifier(part[5:])))
+        else:
+            log.warning("unknown notifier: %s", part)
+    return out
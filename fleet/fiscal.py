@@ -0,0 +1,125 @@
+# fleet/fiscal.py
+"""ปฏิทินปีงบประมาณ (เริ่ม ต.ค.) ใช้ร่วมกันทั้ง Dashboard / export / รายงาน
+
+- bucket(values)       -> numpy arrays: fy, f_idx (ต.ค.=0 ... ก.ย.=11), quarter (1-4), label_th (พ.ศ.)
+                          คำนวณทีเดียวทั้งคอลัมน์ (ไม่วน Python ต่อแถว)
+- fiscal_year / fy_bounds / month_index  -> เวอร์ชัน scalar
+- now_local / today_local / as_local -> เวลาไทย (naive) ไม่ขึ้นกับ timezone ของเครื่อง server
+- sql_fiscal_year / sql_month_index / sql_quarter -> นิพจน์ SQLite สำหรับ bucket เดียวกันฝั่ง DB
+
+ปีงบประมาณ fy=2025 คือ [1 ต.ค. 2025, 1 ต.ค. 2026) = "ปีงบประมาณ พ.ศ. 2569"
+"""
+from __future__ import annotations
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+
+FISCAL_START_MONTH = 10
+BE_OFFSET = 543  # ค.ศ. -> พ.ศ.
+LOCAL_TZ = ZoneInfo("Asia/Bangkok")
+
+MONTHS_TH_CAL = ["ม.ค.","ก.พ.","มี.ค.","เม.ย.","พ.ค.","มิ.ย.",
+                 "ก.ค.","ส.ค.","ก.ย.","ต.ค.","พ.ย.","ธ.ค."]
+
+def month_labels(start_month: int = FISCAL_START_MONTH) -> list[str]:
+    """ชื่อเดือนไทยเรียงตามปีงบฯ (index 0 = เดือนแรกของปีงบฯ)"""
+    k = start_month - 1
+    return MONTHS_TH_CAL[k:] + MONTHS_TH_CAL[:k]
+
+MONTHS_TH = month_labels()
+
+
+# ---------- scalar ----------
+def now_local() -> datetime:
+    """เวลาปัจจุบันตามเวลาไทย ตัด tzinfo ออก (DB เก็บเวลาไทยแบบ naive)"""
+    return datetime.now(LOCAL_TZ).replace(tzinfo=None)
+
+def as_local(ts: datetime | None) -> datetime | None:
+    """เวลาที่มี timezone (เช่น ISO8601 ที่ลงท้าย Z/+00:00 จาก API) -> เวลาไทยแบบ naive ; naive คงเดิม"""
+    if ts is None or ts.tzinfo is None:
+        return ts
+    return ts.astimezone(LOCAL_TZ).replace(tzinfo=None)
+
+def today_local() -> datetime:
+    """วันนี้ 00:00 ตามเวลาไทย (naive)"""
+    return now_local().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def fiscal_year(ts, start_month: int = FISCAL_START_MONTH) -> int:
+    return ts.year if ts.month >= start_month else ts.year - 1
+
+def month_index(month: int, start_month: int = FISCAL_START_MONTH) -> int:
+    """เดือนปฏิทิน (1-12) -> ลำดับในปีงบฯ (0-11)"""
+    return (month - start_month) % 12
+
+def fy_bounds(fy: int, start_month: int = FISCAL_START_MONTH) -> tuple[datetime, datetime]:
+    """[วันแรกของปีงบฯ fy, วันแรกของปีงบฯ ถัดไป)"""
+    return datetime(fy, start_month, 1), datetime(fy + 1, start_month, 1)
+
+def fy_label(fy: int) -> str:
+    """ป้ายแบบที่หน้าเว็บใช้ เช่น 2025/26"""
+    return f"{fy}/{(fy + 1) % 100:02d}"
+
+def thai_label(fy: int, start_month: int = FISCAL_START_MONTH) -> str:
+    """ปีงบประมาณแบบ พ.ศ. (ตั้งชื่อตามปีที่สิ้นสุด) เช่น fy=2025 -> 2569"""
+    end_year = fy + 1 if start_month > 1 else fy
+    return str(end_year + BE_OFFSET)
+
+
+# ---------- vectorized ----------
+def _months_since_epoch(values) -> tuple[np.ndarray, np.ndarray]:
+    """แปลงค่าเวลา (list/Series/ndarray/str) -> (เดือนนับจาก 1970-01, mask ค่าว่าง)"""
+    s = pd.to_datetime(values if isinstance(values, pd.Series) else pd.Series(values), errors="coerce")
+    if getattr(s.dt, "tz", None) is not None:
+        s = s.dt.tz_localize(None)
+    nat = s.isna().to_numpy()
+    m = s.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+    m[nat] = 0
+    return m, nat
+
+def bucket(values, start_month: int = FISCAL_START_MONTH) -> dict[str, np.ndarray]:
+    """คืน dict ของ array ยาวเท่า values: fy, f_idx, quarter, label_th
+
+    แถวที่แปลงเวลาไม่ได้จะได้ fy=-1, f_idx=-1, quarter=0, label_th=""
+    """
+    m, nat = _months_since_epoch(values)
+    year = m // 12 + 1970
+    month0 = m % 12                                   # 0 = ม.ค.
+    f_idx = (month0 - (start_month - 1)) % 12
+    fy = year - (month0 < start_month - 1)
+    quarter = f_idx // 3 + 1
+
+    fy[nat] = -1
+    f_idx[nat] = -1
+    quarter[nat] = 0
+
+    # ป้าย พ.ศ. : สร้างเฉพาะปีที่ไม่ซ้ำ แล้วกระจายกลับด้วย index
+    uniq, inv = np.unique(fy, return_inverse=True)
+    names = np.array([thai_label(int(y), start_month) if y >= 0 else "" for y in uniq], dtype=object)
+    return {"fy": fy, "f_idx": f_idx, "quarter": quarter, "label_th": names[inv]}
+
+def bucket_frame(df: pd.DataFrame, col: str, start_month: int = FISCAL_START_MONTH,
+                 prefix: str = "") -> pd.DataFrame:
+    """เพิ่มคอลัมน์ fy/f_idx/quarter/label_th ให้ DataFrame จากคอลัมน์เวลา col"""
+    out = df.copy()
+    for k, v in bucket(out[col], start_month).items():
+        out[prefix + k] = v
+    return out
+
+
+# ---------- SQL (SQLite) ----------
+# ใช้ substr เพื่อรองรับทั้ง 'YYYY-MM', 'YYYY-MM-DD' และ 'YYYY-MM-DD HH:MM:SS...'
+def _sql_y(col: str) -> str:
+    return f"CAST(substr({col}, 1, 4) AS INTEGER)"
+
+def _sql_m(col: str) -> str:
+    return f"CAST(substr({col}, 6, 2) AS INTEGER)"
+
+def sql_fiscal_year(col: str, start_month: int = FISCAL_START_MONTH) -> str:
+    return f"({_sql_y(col)} - ({_sql_m(col)} < {int(start_month)}))"
+
+def sql_month_index(col: str, start_month: int = FISCAL_START_MONTH) -> str:
+    return f"(({_sql_m(col)} + {12 - int(start_month)}) % 12)"
+
+def sql_quarter(col: str, start_month: int = FISCAL_START_MONTH) -> str:
+    return f"({sql_month_index(col, start_month)} / 3 + 1)"
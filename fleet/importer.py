@@ -0,0 +1,352 @@
+# fleet/importer.py
+"""นำเข้าข้อมูลจำนวนมากจาก CSV/Excel: รถ / ผู้ใช้ / ประวัติการใช้รถ
+
+    python -m fleet.importer cars  cars.csv
+    python -m fleet.importer users users.xlsx --dry-run
+    python -m fleet.importer usage trips.csv --errors trips_errors.csv
+
+- อ่านทีละ CHUNK แถว (CSV อ่านแบบ stream ; Excel อ่านทั้ง sheet แล้วแบ่ง chunk)
+- ตรวจทั้ง chunk ทีเดียวด้วย pandas: ช่องบังคับ, ทะเบียนซ้ำ (ในไฟล์ + กับ UNIQUE ใน DB),
+  ทะเบียน -> cars.id, ชื่อผู้เบิก -> users.id, วันเวลา (รองรับปี พ.ศ.)
+- แถวที่ผ่านเขียนด้วย executemany หนึ่ง transaction ต่อ chunk ; แถวที่ไม่ผ่านไม่ถูกเขียน
+  และอยู่ในรายงาน (row = เลขบรรทัดในไฟล์, column, value, message)
+- นำเข้าไฟล์เดิมซ้ำได้: ทะเบียน / ชื่อผู้ใช้ / รายการใช้รถ (รถ + เวลาเริ่ม) ที่มีอยู่แล้วถูกรายงานว่าซ้ำ
+- รายการใช้รถที่ช่วง [start_time, returned_at) ทับกับรายการอื่นของรถคันเดียวกัน (ในไฟล์ หรือใน
+  usage_logs_all ; รายการที่ยังไม่คืนนับว่าไม่มีเวลาสิ้นสุด) ไม่ถูกเขียน
+- ประวัติการใช้รถต้องคืนรถแล้ว (มี returned_at) ; rollup/table_versions อัปเดตผ่าน trigger ตามปกติ
+"""
+from __future__ import annotations
+import sys
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from fleet.archive import NEXT_USAGE_ID
+from fleet.cache import bump
+from fleet.db import engine
+
+CHUNK = 20_000
+BE_OFFSET = 543
+
+# ชนิด -> คอลัมน์ในไฟล์ (ตัวแรก ๆ ใน required ต้องมี) + ตารางที่ถูกเขียน
+KINDS = {
+    "cars": {
+        "columns": ("plate", "brand", "model", "year", "color", "asset_number", "vehicle_type",
+                    "description", "chassis_number", "engine_number", "car_condition", "caretaker_org"),
+        "required": ("plate",),
+        "tables": ("cars",),
+    },
+    "users": {
+        "columns": ("full_name", "position", "org"),
+        "required": ("full_name",),
+        "tables": ("users",),
+    },
+    "usage": {
+        "columns": ("plate", "borrower", "start_time", "returned_at", "planned_end_time",
+                    "purpose", "is_maintenance"),
+        "required": ("plate", "borrower", "start_time", "returned_at"),
+        "tables": ("usage_logs",),
+    },
+}
+
+_INSERT = {
+    "cars": """
+        INSERT INTO cars (plate, status, brand, model, year, color, asset_number, vehicle_type,
+                          description, chassis_number, engine_number, car_condition, caretaker_org)
+        VALUES (:plate, 'available', :brand, :model, :year, :color, :asset_number, :vehicle_type,
+                :description, :chassis_number, :engine_number, :car_condition, :caretaker_org)
+    """,
+    "users": "INSERT INTO users (full_name, position, org) VALUES (:full_name, :position, :org)",
+    "usage": f"""
+        INSERT INTO usage_logs (id, car_id, borrower_id, start_time, end_time, planned_end_time,
+                                returned_at, purpose, is_maintenance)
+        VALUES ({NEXT_USAGE_ID}, :car_id, :borrower_id, :start_time, :planned_end_time, :planned_end_time,
+                :returned_at, :purpose, :is_maintenance)
+    """,
+}
+
+_TRUE = {"1", "true", "yes", "y", "ใช่", "ซ่อม"}
+
+
+class ImportFileError(ValueError):
+    """ไฟล์ทั้งไฟล์ใช้ไม่ได้ (ชนิดไม่รู้จัก / ไม่มีคอลัมน์บังคับ)"""
+
+
+# ---------- อ่านไฟล์ ----------
+def _chunks(source, filename: str | None = None):
+    """DataFrame ของข้อความ (dtype=str, ช่องว่าง = "") ทีละ CHUNK แถว + เลขแถวในไฟล์ (__row)"""
+    ext = Path(filename or str(source)).suffix.lower()
+    if ext in (".xlsx", ".xlsm", ".xls"):
+        df = pd.read_excel(source, dtype=str).fillna("")
+        parts = (df.iloc[i:i + CHUNK] for i in range(0, len(df), CHUNK))
+    else:
+        parts = pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=CHUNK,
+                            encoding="utf-8-sig", skipinitialspace=True)
+    offset = 0
+    for df in parts:
+        df = df.rename(columns=lambda c: str(c).strip().lower())
+        df["__row"] = range(offset + 2, offset + 2 + len(df))        # บรรทัดที่ 1 คือหัวตาราง
+        offset += len(df)
+        yield df.reset_index(drop=True)
+
+
+# ---------- ค่าช่วยตรวจ (ทั้งคอลัมน์) ----------
+def _text(s: pd.Series) -> pd.Series:
+    """ตัดช่องว่างหัวท้าย + ช่องว่างซ้ำกลางข้อความ"""
+    return s.fillna("").astype(str).str.split().str.join(" ")
+
+def _key(s: pd.Series) -> pd.Series:
+    """คีย์เทียบซ้ำ: ไม่สนช่องว่าง/ตัวเล็กใหญ่ (แบบเดียวกับ cars.add_car)"""
+    return _text(s).str.replace(" ", "", regex=False).str.lower()
+
+def _datetime(s: pd.Series) -> pd.Series:
+    """ข้อความ -> datetime (NaT ถ้าว่าง/แปลงไม่ได้) ; ปี พ.ศ. (>= 2400) แปลงเป็น ค.ศ.
+
+    YYYY-MM-DD[ HH:MM[:SS]] ก่อน ; ที่เหลือ (เช่น 01/02/2568 08:00) อ่านแบบวันขึ้นก่อน
+    """
+    s = _text(s).str.replace(r"\b(2[4-9]\d\d)\b", lambda m: str(int(m.group(1)) - BE_OFFSET), regex=True)
+    s = s.where(s != "")
+    dt = pd.to_datetime(s, errors="coerce", format="ISO8601")
+    rest = dt.isna() & s.notna()
+    if rest.any():
+        dt[rest] = pd.to_datetime(s[rest], errors="coerce", format="mixed", dayfirst=True)
+    return dt
+
+def _sql_dt(dt: pd.Series) -> pd.Series:
+    return dt.dt.strftime("%Y-%m-%d %H:%M:%S").where(dt.notna(), None)
+
+
+# ---------- ช่วงเวลาทับกัน (รถคันเดียวกัน) ----------
+def _windows(spans: pd.DataFrame) -> pd.DataFrame:
+    """ช่วง [start, end) ของ (car_id, start, end) เรียงตามเวลาเริ่ม
+    + reach = เวลาสิ้นสุดที่ไกลสุดของรายการที่เริ่มก่อน (รวมตัวเอง) ของรถคันเดียวกัน"""
+    w = spans[["car_id", "start", "end"]].dropna(subset=["car_id", "start"])
+    w = w.astype({"car_id": "int64", "start": "datetime64[ns]", "end": "datetime64[ns]"})
+    w = w.sort_values(["start", "car_id"], kind="stable").reset_index(drop=True)
+    w["reach"] = w["end"].fillna(pd.Timestamp.max).groupby(w["car_id"]).cummax()   # ยังไม่คืน -> ไม่สิ้นสุด
+    return w
+
+def _overlap_in_file(car_id: pd.Series, start: pd.Series, end: pd.Series) -> pd.Series:
+    """แถวที่เริ่มก่อนรายการที่เริ่มก่อนหน้าของรถคันเดียวกันในชุดนี้จะสิ้นสุด (รายการที่เริ่มก่อนไม่ถูก flag)"""
+    df = pd.DataFrame({"car_id": car_id, "start": start, "end": end})
+    df = df.sort_values(["car_id", "start"], kind="stable")
+    prev = df.assign(reach=df.groupby("car_id")["end"].cummax()).groupby("car_id")["reach"].shift()
+    return (df["start"] < prev).reindex(car_id.index, fill_value=False)
+
+def _overlap_existing(car_id: pd.Series, start: pd.Series, end: pd.Series, w: pd.DataFrame) -> pd.Series:
+    """แถวที่ทับกับช่วงใน w (จาก _windows) ของรถคันเดียวกัน ; merge_asof หาเพื่อนบ้านก่อน/หลังตามเวลาเริ่ม"""
+    if not len(car_id) or not len(w):
+        return pd.Series(False, index=car_id.index)
+    q = pd.DataFrame({"car_id": car_id.astype("int64"), "start": start.astype("datetime64[ns]"),
+                      "end": end.astype("datetime64[ns]"), "__i": car_id.index})
+    q = q.sort_values("start", kind="stable")
+    before = pd.merge_asof(q, w[["car_id", "start", "reach"]], on="start", by="car_id", direction="backward")
+    after = pd.merge_asof(q, w[["car_id", "start"]].rename(columns={"start": "next"}),
+                          left_on="start", right_on="next", by="car_id", direction="forward")
+    hit = (before["reach"] > before["start"]) | (after["next"] < after["end"])     # NaN/NaT -> False
+    return pd.Series(hit.to_numpy(), index=q["__i"].to_numpy()).reindex(car_id.index, fill_value=False)
+
+
+class _Check:
+    """สะสมข้อผิดพลาดรายแถวของ chunk เดียว"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.bad = pd.Series(False, index=df.index)
+        self.errors: list[pd.DataFrame] = []
+
+    def flag(self, mask: pd.Series, column: str, message: str):
+        mask = mask & ~self.bad                 # รายงานปัญหาแรกของแต่ละแถว
+        if mask.any():
+            self.errors.append(pd.DataFrame({
+                "row": self.df.loc[mask, "__row"], "column": column,
+                "value": self.df.loc[mask, column] if column in self.df else "", "message": message,
+            }))
+            self.bad |= mask
+
+    def required(self, cols):
+        for c in cols:
+            self.flag(_text(self.df[c]) == "", c, "ต้องไม่ว่าง")
+
+
+# ---------- ตรวจแต่ละชนิด -> (records ที่จะเขียน, ตัวตรวจ) ----------
+def _check_cars(df: pd.DataFrame, ctx: dict):
+    chk = _Check(df)
+    chk.required(KINDS["cars"]["required"])
+    key = _key(df["plate"])
+    chk.flag(key.duplicated(), "plate", "ทะเบียนซ้ำในไฟล์")
+    chk.flag(key.isin(ctx["plates"]), "plate", "ทะเบียนนี้มีอยู่แล้ว")
+    year = pd.to_numeric(df["year"].where(_text(df["year"]) != ""), errors="coerce")
+    chk.flag(_text(df["year"]).ne("") & (year.isna() | (year % 1 != 0)), "year", "ปีต้องเป็นตัวเลข")
+    year = year.where(year % 1 == 0)
+    out = pd.DataFrame({c: _text(df[c]) for c in KINDS["cars"]["columns"]})
+    out["year"] = year.astype("Int64").astype(object).where(year.notna(), None)
+    out["car_condition"] = out["car_condition"].where(out["car_condition"] != "", "ปกติ")
+    ok = ~chk.bad
+    ctx["plates"].update(key[ok])
+    return out[ok], chk
+
+def _check_users(df: pd.DataFrame, ctx: dict):
+    chk = _Check(df)
+    chk.required(KINDS["users"]["required"])
+    key = _key(df["full_name"])
+    chk.flag(key.duplicated(), "full_name", "ชื่อซ้ำในไฟล์")
+    chk.flag(key.isin(ctx["names"]), "full_name", "มีผู้ใช้ชื่อนี้อยู่แล้ว")
+    out = pd.DataFrame({c: _text(df[c]) for c in KINDS["users"]["columns"]})
+    ok = ~chk.bad
+    ctx["names"].update(key[ok])
+    return out[ok], chk
+
+def _check_usage(df: pd.DataFrame, ctx: dict):
+    chk = _Check(df)
+    chk.required(KINDS["usage"]["required"])
+    car_id = _key(df["plate"]).map(ctx["cars"])
+    chk.flag(car_id.isna(), "plate", "ไม่พบทะเบียนรถนี้")
+    borrower_id = _key(df["borrower"]).map(ctx["users"])
+    chk.flag(borrower_id.isna(), "borrower", "ไม่พบผู้ใช้ชื่อนี้")
+    chk.flag(borrower_id.eq(-1), "borrower", "มีผู้ใช้ชื่อนี้หลายคน (ระบุไม่ได้)")
+
+    start, returned, planned = (_datetime(df[c]) for c in ("start_time", "returned_at", "planned_end_time"))
+    for col, dt in (("start_time", start), ("returned_at", returned), ("planned_end_time", planned)):
+        chk.flag(_text(df[col]).ne("") & dt.isna(), col, "รูปแบบวันเวลาไม่ถูกต้อง")
+    chk.flag(returned < start, "returned_at", "เวลาคืนก่อนเวลาเริ่ม")
+    chk.flag(planned < start, "planned_end_time", "กำหนดคืนก่อนเวลาเริ่ม")
+
+    start_s = _sql_dt(start)
+    dedup = car_id.astype("Int64").astype(str) + "|" + start_s.fillna("")
+    chk.flag(dedup.duplicated(), "start_time", "รายการซ้ำในไฟล์ (รถ + เวลาเริ่ม)")
+    chk.flag(dedup.isin(ctx["trips"]), "start_time", "มีรายการนี้อยู่แล้ว (รถ + เวลาเริ่ม)")
+
+    live = ~chk.bad
+    c, s, e = car_id[live], start[live], returned[live]
+    chk.flag(_overlap_in_file(c, s, e).reindex(df.index, fill_value=False), "start_time",
+             "ช่วงเวลาทับกับรายการอื่นของรถคันนี้ในไฟล์")
+    chk.flag(_overlap_existing(c, s, e, ctx["windows"]).reindex(df.index, fill_value=False), "start_time",
+             "ช่วงเวลาทับกับรายการที่มีอยู่แล้วของรถคันนี้")
+
+    out = pd.DataFrame({
+        "car_id": car_id, "borrower_id": borrower_id,
+        "start_time": start_s, "returned_at": _sql_dt(returned), "planned_end_time": _sql_dt(planned),
+        "purpose": _text(df["purpose"]).where(_text(df["purpose"]) != "", None),
+        "is_maintenance": _text(df["is_maintenance"]).str.lower().isin(_TRUE).astype(int),
+    })
+    ok = ~chk.bad
+    out = out[ok].astype(object)
+    out["car_id"] = out["car_id"].astype(int)
+    out["borrower_id"] = out["borrower_id"].astype(int)
+    ctx["trips"].update(dedup[ok])
+    ctx["windows"] = _windows(pd.concat([
+        ctx["windows"], pd.DataFrame({"car_id": car_id[ok], "start": start[ok], "end": returned[ok]})]))
+    return out, chk
+
+_CHECKS = {"cars": _check_cars, "users": _check_users, "usage": _check_usage}
+
+
+def _context(kind: str) -> dict:
+    """ข้อมูลใน DB ที่ใช้ตรวจ (อ่านครั้งเดียวต่อการนำเข้า)"""
+    with engine.begin() as conn:
+        def keys(sql):
+            return [r[0] for r in conn.execute(text(sql)).all()]
+        if kind == "cars":
+            return {"plates": set(keys("SELECT lower(replace(plate, ' ', '')) FROM cars"))}
+        if kind == "users":
+            return {"names": set(_key(pd.Series(keys("SELECT full_name FROM users"), dtype=object)))}
+        cars = conn.execute(text("SELECT id, plate FROM cars")).all()
+        users = conn.execute(text("SELECT id, full_name FROM users")).all()
+        trips = keys("SELECT car_id || '|' || substr(start_time, 1, 19) FROM usage_logs_all")
+        spans = conn.execute(text("""
+            SELECT car_id, substr(start_time, 1, 19), substr(returned_at, 1, 19) FROM usage_logs_all
+            WHERE car_id IS NOT NULL AND start_time IS NOT NULL
+        """)).all()
+    user_keys = _key(pd.Series([r[1] for r in users], dtype=object))
+    user_map: dict[str, int] = {}
+    for k, (uid, _) in zip(user_keys, users):
+        user_map[k] = -1 if k in user_map else uid              # ชื่อซ้ำ -> ระบุไม่ได้
+    plate_keys = _key(pd.Series([r[1] for r in cars], dtype=object))
+    spans = pd.DataFrame(spans, columns=["car_id", "start", "end"], dtype=object)
+    for c in ("start", "end"):
+        spans[c] = pd.to_datetime(spans[c], errors="coerce", format="ISO8601")
+    return {"cars": dict(zip(plate_keys, (r[0] for r in cars))), "users": user_map, "trips": set(trips),
+            "windows": _windows(spans)}
+
+
+# ---------- เขียน ----------
+def _write(kind: str, records: list[dict], rows: list[int]) -> tuple[int, list[dict]]:
+    """executemany ทั้ง chunk ; ล้มเหลว (เช่น มีคนเพิ่มทะเบียนเดียวกันระหว่างนำเข้า) -> เขียนทีละแถวเพื่อรายงานแถวที่มีปัญหา"""
+    sql = text(_INSERT[kind])
+    try:
+        with engine.begin() as conn:
+            conn.execute(sql, records)
+        return len(records), []
+    except SQLAlchemyError:
+        pass
+    written, errors = 0, []
+    for rec, row in zip(records, rows):
+        try:
+            with engine.begin() as conn:
+                conn.execute(sql, rec)
+            written += 1
+        except SQLAlchemyError as e:
+            errors.append({"row": row, "column": "", "value": "",
+                           "message": f"บันทึกไม่สำเร็จ: {getattr(e, 'orig', e)}"})
+    return written, errors
+
+def run(kind: str, source, filename: str | None = None, dry_run: bool = False, progress=None) -> dict:
+    """นำเข้าไฟล์ ; คืน {"kind", "rows", "inserted", "errors": [{"row", "column", "value", "message"}]}
+
+    progress(rows_done) ถูกเรียกหลังแต่ละ chunk (ใช้กับ background callback)
+    """
+    if kind not in KINDS:
+        raise ImportFileError(f"ไม่รู้จักชนิดข้อมูล '{kind}' (ใช้ {', '.join(KINDS)})")
+    spec = KINDS[kind]
+    ctx = _context(kind)
+    total, inserted, errors = 0, 0, []
+    for df in _chunks(source, filename):
+        missing = [c for c in spec["required"] if c not in df.columns]
+        if missing:
+            raise ImportFileError(f"ไม่มีคอลัมน์ {', '.join(missing)} (ต้องมี: {', '.join(spec['columns'])})")
+        for c in spec["columns"]:
+            if c not in df.columns:
+                df[c] = ""
+        out, chk = _CHECKS[kind](df, ctx)
+        if chk.errors:
+            errors += pd.concat(chk.errors).sort_values("row").to_dict("records")
+        if len(out) and not dry_run:
+            records = out.astype(object).where(out.notna(), None).to_dict("records")
+            n, errs = _write(kind, records, df.loc[out.index, "__row"].tolist())
+            inserted += n
+            errors += errs
+        elif dry_run:
+            inserted += len(out)
+        total += len(df)
+        if progress:
+            progress(total)
+    if inserted and not dry_run:
+        bump(*spec["tables"])
+    return {"kind": kind, "rows": total, "inserted": inserted, "dry_run": dry_run, "errors": errors}
+
+def template(kind: str) -> str:
+    """หัวตาราง CSV ของชนิดนั้น"""
+    return ",".join(KINDS[kind]["columns"]) + "\r\n"
+
+
+if __name__ == "__main__":
+    import time
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in KINDS:
+        print("Usage: python -m fleet.importer {cars|users|usage} FILE [--dry-run] [--errors OUT.csv]")
+        sys.exit(2)
+    from fleet.db import init_db
+    init_db()
+    t0 = time.perf_counter()
+    res = run(args[0], args[1], dry_run="--dry-run" in args)
+    secs = time.perf_counter() - t0
+    verb = "ผ่านการตรวจ" if res["dry_run"] else "นำเข้าแล้ว"
+    print(f"{'(dry-run) ' if res['dry_run'] else ''}{res['kind']}: {res['rows']:,} แถว, "
+          f"{verb} {res['inserted']:,}, ผิดพลาด {len(res['errors']):,} ({secs:.1f} s)")
+    if res["errors"]:
+        out = args[args.index("--errors") + 1] if "--errors" in args else f"{Path(args[1]).stem}_errors.csv"
+        pd.DataFrame(res["errors"]).to_csv(out, index=False, encoding="utf-8-sig")
+        print(f"รายงานข้อผิดพลาด -> {out}")
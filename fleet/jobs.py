@@ -0,0 +1,82 @@
+# fleet/jobs.py
+"""งานหนัก (export Excel/CSV, รายงาน) รันเป็น Dash background callback ใน process แยก
+
+- DiskcacheManager: สถานะงาน/ผลลัพธ์อยู่ในไฟล์ (FLEET_JOBS_DIR, ค่าเริ่มต้น fleet/jobs_cache)
+  แต่ละงานรันใน process ลูก -> worker ที่รับ request ว่างทันที callback ปกติไม่ต้องต่อคิวหลัง export
+- รันพร้อมกันได้ไม่เกิน FLEET_JOBS งาน (ค่าเริ่มต้น 2) ; งานที่เกินรอคิวโดยแสดง "รอคิว" ในช่อง progress
+- ผลถูก cache ตาม hash ของ input + เวอร์ชันของตารางที่งานอ่าน (กดซ้ำโดยข้อมูลไม่เปลี่ยน -> ได้ไฟล์เดิมทันที)
+- ไม่มี diskcache/multiprocess/psutil -> background_callback(...) กลายเป็น callback ธรรมดา
+
+    @background_callback(Output(...), Input(...),
+                         progress=Output("x-progress", "children"),
+                         cancel=Input("x-cancel", "n_clicks"),
+                         running=[(Output("btn-x", "disabled"), True, False)],
+                         cache_args_to_ignore=[0],          # n_clicks
+                         prevent_initial_call=True)
+    def export(set_progress, n): ...
+"""
+from __future__ import annotations
+import functools
+import os
+
+from dash import callback
+
+from fleet.cache import stamp
+from fleet.db import PROJECT_DIR, engine
+
+JOBS_DIR = os.getenv("FLEET_JOBS_DIR", str(PROJECT_DIR / "jobs_cache"))
+MAX_JOBS = int(os.getenv("FLEET_JOBS", "2"))
+RESULT_TTL = 3600           # วินาทีที่เก็บผลไว้ตอบซ้ำ
+SLOT_TTL = 600              # slot ของงานที่ถูก kill (ยกเลิก) คืนเองเมื่อคิวว่างนานเท่านี้
+
+# ตารางที่งาน export อ่าน -> เป็นส่วนหนึ่งของ cache key
+JOB_TABLES = ("cars", "users", "usage_logs", "maintenance_orders", "maintenance_items", "maintenance_committee")
+
+
+def _data_stamp() -> str:
+    return repr(stamp(*JOB_TABLES))
+
+def _make_manager():
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+        cache = diskcache.Cache(JOBS_DIR)
+        return DiskcacheManager(cache, cache_by=[_data_stamp], expire=RESULT_TTL)
+    except ImportError:          # DiskcacheManager ต้องใช้ diskcache + multiprocess + psutil
+        return None
+
+MANAGER = _make_manager()
+
+
+def _no_progress(*_):
+    pass
+
+def _run(fn, args, set_progress):
+    """ฝั่ง process ลูก: ไม่ใช้ connection ที่ติดมาจาก fork + จำกัดจำนวนงานพร้อมกัน"""
+    import diskcache
+    engine.dispose(close=False)
+    sem = diskcache.BoundedSemaphore(MANAGER.handle, "fleet:jobs", value=MAX_JOBS, expire=SLOT_TTL)
+    if set_progress is not None:
+        set_progress("⏳ รอคิว…")
+    with sem:
+        return fn(*args)
+
+def background_callback(*deps, progress=None, cancel=None, running=None, cache_args_to_ignore=None, **kwargs):
+    """@callback ที่รันใน background ; progress ที่ให้มา -> fn ได้ set_progress เป็นอาร์กิวเมนต์แรก
+
+    cache_args_to_ignore: ลำดับ input ที่ไม่นับใน cache key (เช่น n_clicks ของปุ่ม ที่เปลี่ยนทุกครั้งที่กด)
+    """
+    def deco(fn):
+        if MANAGER is None:
+            @functools.wraps(fn)
+            def inline(*args):
+                return fn(_no_progress, *args) if progress is not None else fn(*args)
+            return callback(*deps, **kwargs)(inline)
+
+        @functools.wraps(fn)
+        def job(*args):
+            return _run(fn, args, args[0] if progress is not None else None)
+        return callback(*deps, background=True, manager=MANAGER, progress=progress,
+                        cancel=cancel, running=running, cache_args_to_ignore=cache_args_to_ignore,
+                        **kwargs)(job)
+    return deco
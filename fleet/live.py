@@ -0,0 +1,154 @@
+# fleet/live.py
+"""สถานะรถแบบ live สำหรับ Dashboard ที่เปิดค้างไว้ (Server-Sent Events)
+
+เมื่อมีการเขียน usage_logs / cars (cache.bump -> events bus หรือ worker อื่นเขียน -> table_versions)
+hub จะอ่าน DB ครั้งเดียว (donut + KPI) แล้วกระจายผลเดียวกันให้ทุก client ; จำนวนผู้ชมไม่ทำให้จำนวน query เพิ่ม
+
+    GET /live/status   (text/event-stream)
+
+- รันด้วย Flask (python -m fleet.app) -> route ของ Flask (thread ต่อ client)
+- รันด้วย uvicorn fleet.asgi:app       -> endpoint async ใน fleet/api.py (ไม่กิน thread ต่อ client)
+ฝั่งเบราว์เซอร์: fleet/assets/live.js -> dcc.Store("live-status") -> clientside callback ใน dashboard
+"""
+from __future__ import annotations
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+
+from fleet import events
+from fleet.cache import version
+from fleet.fiscal import fiscal_year, fy_bounds, now_local
+from fleet.queries import _rows, dashboard_sql
+
+WATCH_TABLES = {"usage_logs", "cars"}
+DEBOUNCE_S = 0.3          # รวมการเขียนที่มาติด ๆ กันเป็นการอ่านครั้งเดียว
+KEEPALIVE_S = 15
+POLL_S = 2.0              # ตรวจตัวนับใน DB (การเขียนจาก worker อื่นไม่ผ่าน events bus ของ process นี้)
+
+
+def read_status() -> dict:
+    """donut (จำนวนรถตามสถานะ) + KPI การใช้งาน ของปีงบฯ ปัจจุบัน"""
+    now = now_local()                       # เวลาไทย: server อยู่ timezone อื่นก็ได้ปีงบฯ/วันเดียวกับหน้าเว็บ
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    fy = fiscal_year(now)
+    fy_start, fy_end = fy_bounds(fy)
+    m_start = today.replace(day=1)
+    m_end = (m_start + timedelta(days=32)).replace(day=1)
+    parts = dashboard_sql(fy_start, fy_end, today, m_start, m_end)
+    status = {r["status_display"]: int(r["count"]) for r in _rows(*parts["status"])}
+    kpi = (_rows(*parts["kpi"]) or [{}])[0]
+    return {
+        "fy": fy,
+        "status": {k: status.get(k, 0) for k in ("available", "in_use", "maintenance")},
+        "kpi": {k: int(kpi.get(k) or 0) for k in ("today", "month", "fy")},
+        "at": now.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+class StatusHub:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._dirty = threading.Event()
+        self._async: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+        self._thread: threading.Thread | None = None
+        self.seq = 0
+        self.payload: dict | None = None
+
+    # ----- producer -----
+    def start(self) -> "StatusHub":
+        with self._cond:
+            if self._thread is None:
+                events.subscribe(self._on_event)
+                self._thread = threading.Thread(target=self._loop, name="live-status", daemon=True)
+                self._thread.start()
+                self._dirty.set()
+        return self
+
+    def _on_event(self, ev: dict):
+        if ev.get("kind") == "tables.changed" and WATCH_TABLES & set(ev.get("tables", ())):
+            self._dirty.set()
+        elif ev.get("kind", "").startswith("usage."):
+            self._dirty.set()
+
+    def _loop(self):
+        seen = None
+        while True:
+            if not self._dirty.wait(POLL_S):
+                if version(*WATCH_TABLES) == seen:
+                    continue
+            time.sleep(DEBOUNCE_S)
+            seen = version(*WATCH_TABLES)
+            self._dirty.clear()
+            try:
+                payload = read_status()
+            except Exception as e:
+                print("live status error:", e)
+                continue
+            self._broadcast(payload)
+
+    def _broadcast(self, payload: dict):
+        with self._cond:
+            self.seq += 1
+            payload = {**payload, "seq": self.seq}
+            self.payload = payload
+            self._cond.notify_all()
+            listeners = list(self._async)
+        for loop, q in listeners:
+            loop.call_soon_threadsafe(_offer, q, payload)
+
+    # ----- consumers -----
+    def wait(self, after_seq: int, timeout: float = KEEPALIVE_S) -> dict | None:
+        """(thread) รอจนมี payload ใหม่กว่า after_seq ; หมดเวลา -> None"""
+        self.start()
+        with self._cond:
+            self._cond.wait_for(lambda: self.payload is not None and self.seq > after_seq, timeout)
+            return self.payload if self.payload is not None and self.seq > after_seq else None
+
+    def listen_async(self) -> asyncio.Queue:
+        """(asyncio) คิวที่ได้ payload ล่าสุดทุกครั้งที่เปลี่ยน (เก็บแค่ตัวล่าสุด)"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        with self._cond:
+            self._async.add((loop, q))
+            if self.payload is not None:
+                _offer(q, self.payload)
+        return q
+
+    def unlisten_async(self, q: asyncio.Queue):
+        with self._cond:
+            self._async = {(l, x) for l, x in self._async if x is not q}
+
+
+def _offer(q: asyncio.Queue, payload: dict):
+    if q.full():
+        q.get_nowait()
+    q.put_nowait(payload)
+
+def sse(payload: dict) -> str:
+    return f"id: {payload['seq']}\nevent: status\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+HUB = StatusHub()
+
+
+# ---------- endpoints ----------
+def register_flask(server):
+    """GET /live/status บน Flask server ของ Dash"""
+    from flask import Response, stream_with_context
+
+    @server.route("/live/status")
+    def live_status():
+        def gen():
+            seq = 0
+            while True:
+                payload = HUB.wait(seq)
+                if payload is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                seq = payload["seq"]
+                yield sse(payload)
+        return Response(stream_with_context(gen()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,350 @@
+# fleet/loadtest.py
+"""ยิงโหลดจำลองผู้ใช้จริงเข้า Dash callback (/_dash-update-component) ของเซิร์ฟเวอร์ที่รันอยู่
+
+    python -m fleet.loadtest --url http://127.0.0.1:9000 --users 16 --duration 60
+    python -m fleet.loadtest --scenarios dashboard,calendar --json after.json --compare before.json
+
+- ผู้ใช้เสมือน --users คน (thread ละคน, HTTP keep-alive ของตัวเอง) สุ่ม scenario ตามน้ำหนัก SCENARIOS
+  วนจนครบ --duration วินาที (รอบที่เริ่มแล้วทำจนจบ) ; --think = เวลาคิดระหว่างขั้น (วินาที)
+- แต่ละขั้นส่ง payload แบบเดียวกับ dash-renderer : callback หาจาก /_dash-dependencies ด้วย
+  (input ที่กระตุ้น, output) -> ชื่อ id/ค่าใน SCENARIOS ตรงกับหน้าเว็บจริง ไม่ผูกกับ hash ของ allow_duplicate
+- รายงานต่อขั้น (callback): จำนวน, error, req/s, p50/p95/p99/max (ms) ; --json บันทึกผลไว้เทียบรอบถัดไป
+- error = HTTP >= 400 / เชื่อมต่อไม่ได้ / ผลไม่เป็นอย่างที่ขั้นถัดไปต้องใช้ (เช่น ไม่มีรถว่างให้เบิก)
+- scenario checkout เขียนข้อมูลจริง (เบิก + คืนรถ) -> ใช้กับฐานข้อมูลทดสอบเท่านั้น (--scenarios ตัดออกได้)
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+from fleet.fiscal import fiscal_year
+
+
+class StepError(Exception):
+    """ผลของขั้นใช้ต่อไม่ได้ (นับเป็น error ของขั้นนั้นแล้วจบ scenario รอบนี้)"""
+
+
+# ---------- Dash client ----------
+def _strip(prop: str) -> str:
+    return prop.split("@", 1)[0]          # allow_duplicate -> "children@<hash>"
+
+def _outputs(spec: str) -> list[tuple[str, str]]:
+    """"id.prop" หรือ "..a.x...b.y.." -> [(id, prop)]"""
+    parts = spec[2:-2].split("...") if spec.startswith("..") else [spec]
+    return [tuple(p.rsplit(".", 1)) for p in parts]
+
+class Client:
+    """ผู้ใช้เสมือน 1 คน: connection เดียว (keep-alive) + บันทึกเวลาแต่ละขั้นลง stats"""
+
+    def __init__(self, url: str, deps: list[dict], stats: "Stats"):
+        u = urlsplit(url)
+        self.host, self.port, self.prefix = u.hostname, u.port or 80, u.path.rstrip("/")
+        self.deps, self.stats = deps, stats
+        self.conn = None
+
+    def _request(self, method: str, path: str, body: bytes | None = None) -> tuple[int, bytes]:
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            try:
+                self.conn.request(method, self.prefix + path, body=body,
+                                  headers={"Content-Type": "application/json"} if body else {})
+                resp = self.conn.getresponse()
+                return resp.status, resp.read()
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+    def _find(self, trigger: str, output: str) -> dict:
+        for cb in self.deps:
+            ins = {f"{i['id']}.{i['property']}" for i in cb["inputs"]}
+            outs = {f"{i}.{_strip(p)}" for i, p in _outputs(cb["output"])}
+            if trigger in ins and output in outs:
+                return cb
+        raise KeyError(f"ไม่พบ callback {trigger} -> {output}")
+
+    def call(self, step: str, trigger: str, output: str, values: dict | None = None) -> dict:
+        """เรียก callback ที่ trigger เป็น input และเขียน output ; values = {"id.prop": ค่า} ของ input/state
+
+        คืน {"id.prop": ค่าใหม่} (PreventUpdate -> {})
+        """
+        cb = self._find(trigger, output)
+        values = values or {}
+        def dep(d):
+            return {"id": d["id"], "property": d["property"], "value": values.get(f"{d['id']}.{d['property']}")}
+        outs = [{"id": i, "property": _strip(p)} for i, p in _outputs(cb["output"])]
+        body = json.dumps({
+            "output": cb["output"],
+            "outputs": outs if cb["output"].startswith("..") else outs[0],
+            "inputs": [dep(d) for d in cb["inputs"]],
+            "state": [dep(d) for d in cb["state"]],
+            "changedPropIds": [trigger],
+        }).encode()
+
+        t0 = time.perf_counter()
+        try:
+            status, data = self._request("POST", "/_dash-update-component", body)
+        except (http.client.HTTPException, OSError) as e:
+            self.stats.add(step, time.perf_counter() - t0, f"{type(e).__name__}")
+            raise StepError(step) from e
+        elapsed = time.perf_counter() - t0
+        if status >= 400:
+            self.stats.add(step, elapsed, f"HTTP {status}")
+            raise StepError(step)
+        self.stats.add(step, elapsed, None, len(data))
+        if status == 204 or not data:
+            return {}
+        resp = json.loads(data).get("response", {})
+        return {f"{i}.{_strip(p)}": v for i, props in resp.items() for p, v in props.items()}
+
+    def page(self, pathname: str) -> dict:
+        """เปิดหน้า (callback ของ dash.page_container)"""
+        return self.call(f"page {pathname}", "_pages_location.pathname", "_pages_content.children",
+                         {"_pages_location.pathname": pathname, "_pages_location.search": ""})
+
+    def fail(self, step: str, reason: str):
+        self.stats.add(step, 0.0, reason)
+        raise StepError(step)
+
+
+def fetch_dependencies(url: str) -> list[dict]:
+    u = urlsplit(url)
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=30)
+    conn.request("GET", u.path.rstrip("/") + "/_dash-dependencies")
+    resp = conn.getresponse()
+    if resp.status != 200:
+        raise RuntimeError(f"{url}: /_dash-dependencies -> HTTP {resp.status}")
+    return json.loads(resp.read())
+
+
+# ---------- scenarios ----------
+def _pick(options, step: str, c: Client) -> dict:
+    if not options:
+        c.fail(step, "ไม่มีตัวเลือก")
+    return random.choice(options)
+
+def dashboard(c: Client, think):
+    """เปิด Dashboard (ปีงบฯ ปัจจุบัน) แล้วเปลี่ยนไปปีก่อน + เปลี่ยนช่วงเดือน"""
+    fy = fiscal_year(datetime.now())
+    c.page("/")
+    for year, window in ((fy, 3), (fy - 1, 3), (fy - 1, 12)):
+        c.call("dashboard.kpis", "dd-fy.value", "kpi-fy.children", {"dd-fy.value": year})
+        c.call("dashboard.figs", "dd-fy.value", "fig-monthly.figure",
+               {"dd-fy.value": year, "dd-window.value": window})
+        think()
+
+def checkout(c: Client, think):
+    """หน้า Usage: โหลดรถว่าง -> ค้นผู้ใช้ -> เบิก -> ค้นรายการที่ยังไม่คืนด้วยทะเบียน -> คืนรถ"""
+    c.page("/usage")
+    cars = c.call("usage.cars", "btn-reload-cars.n_clicks", "usg-car.options",
+                  {"btn-reload-cars.n_clicks": 1}).get("usg-car.options")
+    car = _pick(cars, "usage.cars", c)
+    users = c.call("usage.users", "usg-user.search_value", "usg-user.options",
+                   {"usg-user.search_value": random.choice("กขคงจชดตนบปผพมยรลวสหอ")}).get("usg-user.options")
+    if not users:
+        users = c.call("usage.users", "usg-user.search_value", "usg-user.options",
+                       {"usg-user.search_value": ""}).get("usg-user.options")
+    user = _pick(users, "usage.users", c)
+    think()
+
+    now = datetime.now()
+    later = now + timedelta(hours=4)
+    out = c.call("usage.create", "btn-create.n_clicks", "usg-msg.children", {
+        "btn-create.n_clicks": 1,
+        "usg-car.value": car["value"], "usg-user.value": user["value"],
+        "usg-start-date.date": now.date().isoformat(), "usg-start-hh.value": f"{now.hour:02d}",
+        "usg-start-mm.value": f"{now.minute:02d}",
+        "usg-end-date.date": later.date().isoformat(), "usg-end-hh.value": f"{later.hour:02d}",
+        "usg-end-mm.value": f"{later.minute:02d}",
+        "usg-purpose.value": "loadtest", "usg-maint.value": [],
+        "status-filter.value": "all", "usg-open-only.value": [],
+    })
+    if str(out.get("usg-msg.children", "")).startswith("❌"):
+        c.fail("usage.create", "app error")
+    think()
+
+    plate = str(car.get("label") or "").split(" (", 1)[0]          # "กข 1234 (Toyota Vios)"
+    opts = c.call("usage.find_open", "ret-usage.search_value", "ret-usage.options",
+                  {"ret-usage.search_value": plate}).get("ret-usage.options") or []
+    opts = [o for o in opts if f"| {plate} |" in str(o.get("label"))]   # "#id | ทะเบียน | ผู้ยืม | เริ่ม ..."
+    if not opts:
+        c.fail("usage.find_open", "ไม่พบรายการที่เพิ่งเบิก")
+    usage_id = max(o["value"] for o in opts)
+    back = datetime.now() + timedelta(minutes=1)
+    out = c.call("usage.return", "btn-return.n_clicks", "usg-msg.children", {
+        "btn-return.n_clicks": 1, "ret-usage.value": usage_id,
+        "ret-date.date": back.date().isoformat(), "ret-hh.value": f"{back.hour:02d}",
+        "ret-mm.value": f"{back.minute:02d}",
+        "status-filter.value": "all", "usg-open-only.value": [],
+    })
+    if str(out.get("usg-msg.children", "")).startswith("❌"):
+        c.fail("usage.return", "app error")
+
+def maintenance(c: Client, think):
+    """หน้า Maintenance: โหลดใบงาน -> ค้นด้วยทะเบียน/ศูนย์ซ่อม (ส่ง orders-store กลับไปเหมือนเบราว์เซอร์)"""
+    c.page("/maintenance")
+    out = c.call("maint.init", "tbl-orders.id", "orders-store.data", {"tbl-orders.id": "tbl-orders"})
+    orders = out.get("orders-store.data") or []
+    for _ in range(2):
+        row = _pick(orders, "maint.search", c)
+        keyword = random.choice([row.get("plate"), row.get("center_name")]) or ""
+        c.call("maint.search", "maint-search.value", "tbl-orders.data",
+               {"maint-search.value": keyword, "orders-store.data": orders})
+        think()
+
+def calendar(c: Client, think):
+    """หน้า Calendar: เดือนนี้ -> เลื่อนไปอีก 2 เดือน (ตาราง + grid ต่อเดือน)"""
+    c.page("/carlendar")
+    first = date.today().replace(day=1)
+    for _ in range(3):
+        out = c.call("calendar.load", "cal-start-date.date", "cal-store.data",
+                     {"cal-start-date.date": first.isoformat()})
+        c.call("calendar.grid", "cal-store.data", "calendar-grid.children",
+               {"cal-start-date.date": first.isoformat(), "cal-store.data": out.get("cal-store.data")})
+        first = (first + timedelta(days=32)).replace(day=1)
+        think()
+
+# ชื่อ -> (ฟังก์ชัน, น้ำหนักการสุ่ม)
+SCENARIOS = {
+    "dashboard":   (dashboard, 4),
+    "checkout":    (checkout, 2),
+    "maintenance": (maintenance, 2),
+    "calendar":    (calendar, 2),
+}
+
+
+# ---------- สถิติ ----------
+def _pct(sorted_ms: list[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return sorted_ms[min(len(sorted_ms) - 1, max(0, int(round(q * len(sorted_ms) + 0.5)) - 1))]
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps: dict[str, dict] = {}
+        self.scenarios: dict[str, dict] = {}
+
+    def add(self, step: str, seconds: float, error: str | None, nbytes: int = 0):
+        with self._lock:
+            s = self.steps.setdefault(step, {"ms": [], "errors": {}, "bytes": 0})
+            if error:
+                s["errors"][error] = s["errors"].get(error, 0) + 1
+            else:
+                s["ms"].append(seconds * 1000)
+                s["bytes"] += nbytes
+
+    def scenario(self, name: str, seconds: float, ok: bool):
+        with self._lock:
+            s = self.scenarios.setdefault(name, {"n": 0, "errors": 0, "ms": []})
+            s["n"] += 1
+            s["errors"] += 0 if ok else 1
+            s["ms"].append(seconds * 1000)
+
+    def report(self, wall: float) -> dict:
+        def summary(ms: list[float], errors: int) -> dict:
+            ms = sorted(ms)
+            n = len(ms) + errors
+            return {"n": n, "errors": errors, "error_rate": round(errors / n, 4) if n else 0.0,
+                    "rps": round(n / wall, 2) if wall else 0.0,
+                    "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+                    "p50_ms": round(_pct(ms, 0.50), 2), "p95_ms": round(_pct(ms, 0.95), 2),
+                    "p99_ms": round(_pct(ms, 0.99), 2), "max_ms": round(ms[-1], 2) if ms else 0.0}
+        with self._lock:
+            steps = {name: {**summary(s["ms"], sum(s["errors"].values())),
+                            "kb_mean": round(s["bytes"] / len(s["ms"]) / 1024, 1) if s["ms"] else 0.0,
+                            "error_kinds": dict(s["errors"])}
+                     for name, s in sorted(self.steps.items())}
+            total = summary([m for s in self.steps.values() for m in s["ms"]],
+                            sum(sum(s["errors"].values()) for s in self.steps.values()))
+            scenarios = {name: summary(s["ms"], s["errors"]) for name, s in sorted(self.scenarios.items())}
+        return {"total": total, "steps": steps, "scenarios": scenarios}
+
+
+# ---------- run ----------
+def run(url: str, users: int = 8, duration: float = 60.0, scenarios: list[str] | None = None,
+        think: float = 0.0, seed: int | None = None) -> dict:
+    """ยิงโหลด ; คืน {"meta", "total", "steps", "scenarios"} (เวลาเป็น ms)"""
+    names = scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"ไม่รู้จัก scenario: {', '.join(unknown)} (มี {', '.join(SCENARIOS)})")
+    weights = [SCENARIOS[n][1] for n in names]
+    deps = fetch_dependencies(url)
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    def user(i: int):
+        rnd = random.Random(None if seed is None else seed + i)
+        c = Client(url, deps, stats)
+        def pause():
+            if think:
+                time.sleep(rnd.uniform(0.5, 1.5) * think)
+        while time.perf_counter() < deadline:
+            name = rnd.choices(names, weights)[0]
+            t0 = time.perf_counter()
+            try:
+                SCENARIOS[name][0](c, pause)
+                ok = True
+            except StepError:
+                ok = False
+            stats.scenario(name, time.perf_counter() - t0, ok)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,), name=f"vu-{i}", daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    return {"meta": {"url": url, "users": users, "duration_s": round(wall, 1), "think_s": think,
+                     "scenarios": names, "started": datetime.now().isoformat(timespec="seconds")},
+            **stats.report(wall)}
+
+
+def _print(res: dict, before: dict | None = None):
+    m = res["meta"]
+    print(f"{m['url']}  users={m['users']}  {m['duration_s']} s  scenarios={','.join(m['scenarios'])}")
+    head = f"{'step':22s} {'n':>6s} {'err':>5s} {'req/s':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'max':>8s} {'KB':>7s}"
+    print(head + ("   p95 เดิม" if before else ""))
+    rows = list(res["steps"].items()) + [("TOTAL", res["total"])]
+    for name, s in rows:
+        line = (f"{name:22s} {s['n']:6d} {s['errors']:5d} {s['rps']:7.2f} {s['p50_ms']:8.1f} "
+                f"{s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['max_ms']:8.1f} "
+                + (f"{s['kb_mean']:7.1f}" if "kb_mean" in s else " " * 7))
+        old = (before or {}).get("steps", {}).get(name) if name != "TOTAL" else (before or {}).get("total")
+        if old and old["p95_ms"]:
+            line += f"   {old['p95_ms']:8.1f} ({(s['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%)"
+        print(line)
+        for kind, n in s.get("error_kinds", {}).items():
+            print(f"{'':24s}! {kind}: {n}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", default="http://127.0.0.1:9000")
+    ap.add_argument("--users", type=int, default=8)
+    ap.add_argument("--duration", type=float, default=60.0)
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS))
+    ap.add_argument("--think", type=float, default=0.0)
+    ap.add_argument("--seed", type=int)
+    ap.add_argument("--json", help="บันทึกผลเป็น JSON")
+    ap.add_argument("--compare", help="JSON ของรอบก่อน (แสดง p95 เทียบ)")
+    a = ap.parse_args()
+    res = run(a.url, a.users, a.duration, [s for s in a.scenarios.split(",") if s], a.think, a.seed)
+    before = None
+    if a.compare:
+        with open(a.compare, encoding="utf-8") as f:
+            before = json.load(f)
+    _print(res, before)
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"บันทึกผล -> {a.json}")
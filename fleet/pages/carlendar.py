@@ -9,20 +9,17 @@ import pandas as pd
 from sqlalchemy import text
 
 from fleet.db import engine as db_engine
+from fleet.cache import bump, versioned
+from fleet.fiscal import today_local
+from fleet.queries import fetch_calendar
+from fleet import typeahead
 
 dash.register_page(__name__, path="/carlendar", name="Carlendar")
 
 # ---------- helpers ----------
 def fetch_users_options():
-    with db_engine.begin() as conn:
-        rows = conn.execute(
-            text("SELECT id, full_name FROM users ORDER BY full_name ASC")
-        ).mappings().all()
-
-    return [
-        {"label": r["full_name"], "value": r["full_name"]}
-        for r in rows
-    ]
+    # value = ชื่อผู้ใช้ ; ส่งแค่ top-N ที่เหลือค้นผ่าน search_value
+    return typeahead.options("user_names")
 
 def month_range_3months(base: date):
     """
@@ -42,38 +39,14 @@ def month_range_3months(base: date):
 
 
 def fetch_car_options():
-    """ดึงรายการรถสำหรับ dropdown"""
-    with db_engine.begin() as conn:
-        rows = conn.execute(
-            text("""
-                SELECT id, plate
-                FROM cars
-                WHERE car_condition != 'สูญหาย'
-                ORDER BY plate ASC
-            """)
-        ).mappings().all()
-    return [{"label": r["plate"], "value": r["id"]} for r in rows]
+    """รายการรถสำหรับ dropdown (top-N, ค้นเพิ่มด้วย search_value)"""
+    return typeahead.options("cars_active")
 
 
+@versioned("car_calendar", "cars", shared=True)
 def fetch_calendar_df(start_date: date, end_date: date):
-    """ดึงรายการจองที่ 'ทับซ้อน' กับช่วงวันที่กำหนด"""
-    with db_engine.begin() as conn:
-        rows = conn.execute(
-            text("""
-                SELECT
-                    cal.id,
-                    cal.start_date,
-                    cal.end_date,
-                    c.plate,
-                    cal.user_name,
-                    cal.note
-                FROM car_calendar cal
-                JOIN cars c ON c.id = cal.car_id
-                WHERE NOT (cal.end_date < :s OR cal.start_date > :e)
-                ORDER BY cal.start_date ASC, c.plate ASC
-            """),
-            {"s": start_date.isoformat(), "e": end_date.isoformat()},
-        ).mappings().all()
+    """ดึงรายการจองที่ 'ทับซ้อน' กับช่วงวันที่กำหนด (cache ต่อช่วงจนกว่าจะมีการจอง/แก้ไข)"""
+    rows = fetch_calendar(start_date, end_date)
 
     if not rows:
         return pd.DataFrame(columns=["id", "start_date", "end_date", "plate", "user_name", "note"])
@@ -243,7 +216,7 @@ layout = html.Div(
                 dcc.DatePickerSingle(
                     id="cal-start-date",
                     display_format="YYYY-MM-DD",
-                    date=date.today().replace(day=1).isoformat(),
+                    date=today_local().date().replace(day=1).isoformat(),
                     style={"marginRight": "12px"},
                 ),
                 html.Span("ระบบจะแสดงข้อมูลจองล่วงหน้า 3 เดือนจากเดือนนี้"),
@@ -346,6 +319,10 @@ def load_users_for_calendar(_):
     return fetch_users_options()
 
 
+typeahead.attach("cal-user", "user_names")
+typeahead.attach("cal-car-id", "cars_active")
+
+
 # ---------- initial: โหลดรายการรถ ----------
 @callback(
     Output("cal-car-id", "options"),
@@ -365,7 +342,7 @@ def load_car_options(_):
     prevent_initial_call=False,
 )
 def load_calendar(start_date_str):
-    base = date.fromisoformat(start_date_str) if start_date_str else date.today().replace(day=1)
+    base = date.fromisoformat(start_date_str) if start_date_str else today_local().date().replace(day=1)
     start, end = month_range_3months(base)
     df = fetch_calendar_df(start, end)
     return df.to_dict("records"), df.to_dict("records"), {
@@ -382,7 +359,7 @@ def load_calendar(start_date_str):
     prevent_initial_call=False,
 )
 def update_calendar_grid(start_date_str, store_data):
-    base = date.fromisoformat(start_date_str) if start_date_str else date.today().replace(day=1)
+    base = date.fromisoformat(start_date_str) if start_date_str else today_local().date().replace(day=1)
     year, month = base.year, base.month
     df = pd.DataFrame(store_data or [])
     return build_calendar_grid(year, month, df)
@@ -439,10 +416,11 @@ def add_booking(n, car_id, start_date_str, end_date_str, user_name, note, range_
                 "n": note or "",
             },
         )
+    bump("car_calendar")
 
     # reload data ตามช่วง 3 เดือนเดิม
     if not range_data:
-        base = date.today().replace(day=1)
+        base = today_local().date().replace(day=1)
         start, end = month_range_3months(base)
     else:
         start = date.fromisoformat(range_data["start"])
@@ -505,10 +483,11 @@ def persist_calendar_changes(new_rows, old_rows, range_data):
                             "id": int(_id),
                         },
                     )
+    bump("car_calendar")
 
     # reload เพื่อ sync กับ Calendar Grid
     if not range_data:
-        base = date.today().replace(day=1)
+        base = today_local().date().replace(day=1)
         start, end = month_range_3months(base)
     else:
         start = date.fromisoformat(range_data["start"])
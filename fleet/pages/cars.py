@@ -1,11 +1,14 @@
 # fleet/pages/cars.py
-import base64, os
 from pathlib import Path
 import dash
 from dash import html, dcc, dash_table, Input, Output, State, callback, no_update
 import pandas as pd
 from sqlalchemy import text
-from fleet.db import engine as db_engine, UPLOAD_DIR  # absolute import (สำคัญ)
+from fleet.db import engine as db_engine  # absolute import (สำคัญ)
+from fleet.queries import fetch_cars, CAR_COLUMNS
+from fleet.cache import bump
+from fleet.jobs import background_callback
+from fleet.attachments import save_upload, latest_attachment, get_attachment, attachment_options
 
 dash.register_page(__name__, path="/cars", name="Cars")
 
@@ -60,29 +63,8 @@ BRAND_OPTIONS = [  # ✅ ยี่ห้อสำหรับฟอร์มล
 ]
 
 def fetch_df():
-    with db_engine.begin() as conn:
-        rows = conn.execute(text("""
-            SELECT
-              c.id, c.plate, c.brand, c.model, c.color, c.year,
-              COALESCE(
-                CASE
-                  WHEN EXISTS (SELECT 1 FROM usage_logs u WHERE u.car_id=c.id AND u.returned_at IS NULL AND u.is_maintenance=1) THEN 'maintenance'
-                  WHEN EXISTS (SELECT 1 FROM usage_logs u WHERE u.car_id=c.id AND u.returned_at IS NULL AND u.is_maintenance=0) THEN 'in_use'
-                  ELSE c.status
-                END, 'available'
-            ) AS status_display,
-            c.asset_number, c.vehicle_type, c.description,
-            c.chassis_number, c.engine_number, c.pdf_path,
-            c.car_condition,                            
-            c.caretaker_org  
-            FROM cars c
-            ORDER BY c.plate ASC
-        """)).mappings().all()
-
-    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=[
-    "id","plate","car_condition","caretaker_org","brand","model","color","year","status_display",
-    "asset_number","vehicle_type","description","chassis_number","engine_number","pdf_path"
-    ])
+    rows = fetch_cars()
+    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=CAR_COLUMNS)
     # ชื่อเต็มประเภทรถสำหรับแสดงผล
     df["vehicle_type_display"] = df["vehicle_type"].map(VEHICLE_TYPE_FULL).fillna(df["vehicle_type"])
     # มีไฟล์หรือไม่
@@ -154,7 +136,9 @@ layout = html.Div(
         html.Div(
             [
                 html.Button("↳ เปิดโหมดลบ", id="btn-del-mode", n_clicks=0, style={"marginRight":"8px"}),
-                html.Button("⬇️ Export CSV", id="btn-export", n_clicks=0, style={"marginRight":"8px"}),
+                html.Button("⬇️ Export CSV", id="cars-btn-export", n_clicks=0, style={"marginRight":"8px"}),
+                html.Button("✖ ยกเลิก", id="cars-btn-export-cancel", style={"display":"none","marginRight":"8px"}),
+                html.Span(id="cars-export-progress", style={"display":"none","marginRight":"8px","color":"#777"}),
                 dcc.Upload(
                     id="upload-pdf",
                     children=html.Div(["📄 ลากไฟล์ PDF มาวาง หรือ ", html.A("เลือกไฟล์")]),
@@ -165,6 +149,8 @@ layout = html.Div(
                         "borderRadius":"8px","marginRight":"8px"
                     }
                 ),
+                dcc.Dropdown(id="car-attachments", options=[], placeholder="ไฟล์แนบ (ล่าสุดก่อน)",
+                             clearable=True, style={"width":"320px","display":"inline-block","marginRight":"8px"}),
                 html.Button("⬇️ ดาวน์โหลด PDF ของแถวที่เลือก", id="btn-download-pdf"),
                 html.Span(id="msg_cars_upload", style={"color":"#2b6","marginLeft":"8px"}),
             ],
@@ -339,6 +325,7 @@ def add_car(n, plate, brand, model, year, color,
                 "care_org": "",        # ส่วนดูแล (เริ่มต้นว่าง ให้แก้ในตาราง)
             },
         )
+    bump("cars")
 
     df = fetch_df()
     return df.to_dict("records"), df.to_dict("records"), "บันทึกสำเร็จ"
@@ -405,19 +392,31 @@ def persist_changes(new_rows, old_rows):
                             id=int(_id),
                         )
                     )
+    bump("cars")
 
     df = fetch_df()
     return df.to_dict("records"), df.to_dict("records")
 
 
-# ---------- Export CSV ----------
-@callback(
+# ---------- Export CSV (background job: fleet/jobs.py) ----------
+@background_callback(
     Output("cars-download","data"),
-    Input("btn-export","n_clicks"),
+    Input("cars-btn-export","n_clicks"),
+    progress=Output("cars-export-progress","children"),
+    cancel=Input("cars-btn-export-cancel","n_clicks"),
+    running=[
+        (Output("cars-btn-export","disabled"), True, False),
+        (Output("cars-btn-export-cancel","style"), {"marginRight":"8px"}, {"display":"none"}),
+        (Output("cars-export-progress","style"),
+         {"marginRight":"8px","color":"#777"}, {"display":"none"}),
+    ],
+    cache_args_to_ignore=[0],      # n_clicks: กดซ้ำโดยข้อมูลไม่เปลี่ยน -> ได้ผลเดิมจาก cache
     prevent_initial_call=True
 )
-def export_csv(n):
+def export_csv(set_progress, n):
+    set_progress("กำลังอ่านข้อมูลรถ…")
     df = fetch_df().drop(columns=["has_pdf"])
+    set_progress(f"กำลังเขียน CSV ({len(df):,} แถว)…")
     # UTF-8 + BOM ให้ Excel เดา encoding ถูก และใช้ CRLF สำหรับ Windows
     return dcc.send_data_frame(
         df.to_csv,
@@ -447,31 +446,43 @@ def upload_pdf(contents, filename, selected_rows, data):
     row_idx = selected_rows[0]
     car_id = data[row_idx]["id"]
 
-    header, b64 = contents.split(",", 1)
-    pdf_bytes = base64.b64decode(b64)
-    path = (UPLOAD_DIR / f"car_{car_id}.pdf").as_posix()
-    with open(path, "wb") as f:
-        f.write(pdf_bytes)
-
-    with db_engine.begin() as conn:
-        conn.execute(text("UPDATE cars SET pdf_path=:p WHERE id=:i"), dict(p=path, i=int(car_id)))
+    # เก็บเป็นไฟล์แนบใหม่ (ไฟล์เดิมยังอยู่ครบ)
+    save_upload("car", int(car_id), contents, filename)
 
     df = fetch_df()
     return df.to_dict("records"), df.to_dict("records"), "อัปโหลดสำเร็จ"
 
+# ---------- รายการไฟล์แนบของแถวที่เลือก ----------
+@callback(
+    Output("car-attachments","options"),
+    Output("car-attachments","value"),
+    Input("tbl-cars","selected_rows"),
+    Input("msg_cars_upload","children"),
+    State("tbl-cars","data"),
+)
+def list_car_attachments(selected, _msg, rows):
+    if not selected or not rows or selected[0] >= len(rows):
+        return [], None
+    return attachment_options("car", int(rows[selected[0]]["id"])), None
+
 # ---------- ดาวน์โหลด PDF ----------
 @callback(
     Output("pdf-download","data"),
+    Output("msg_cars","children", allow_duplicate=True),
     Input("btn-download-pdf","n_clicks"),
     State("tbl-cars","selected_rows"),
     State("tbl-cars","data"),
+    State("car-attachments","value"),
     prevent_initial_call=True
 )
-def download_pdf(n, selected, rows):
+def download_pdf(n, selected, rows, attachment_id):
     if not selected:
-        return no_update
-    ridx = selected[0]
-    pdf_path = rows[ridx].get("pdf_path")
-    if not pdf_path or not os.path.exists(pdf_path):
-        return no_update
-    return dcc.send_file(pdf_path)
+        return no_update, no_update
+    car_id = int(rows[selected[0]]["id"])
+    att = get_attachment(attachment_id) if attachment_id else latest_attachment("car", car_id)
+    if not att or att["entity_type"] != "car" or att["entity_id"] != car_id:
+        return no_update, no_update
+    # แถว attachments อยู่ แต่ไฟล์อาจถูกลบ/ย้ายออกจาก uploads/ ไปแล้ว
+    if not Path(att["path"]).is_file():
+        return no_update, f"ไม่พบไฟล์ {att['filename'] or Path(att['path']).name} บน server"
+    return dcc.send_file(att["path"], filename=att["filename"] or None), ""
@@ -1,21 +1,21 @@
 # fleet/pages/dashboard.py
-import numpy as np
+import functools
+import json
 import pandas as pd
 import dash
-from dash import html, dcc, Input, Output, State, callback
+from dash import html, dcc, Input, Output, State, callback, clientside_callback
 import plotly.express as px
 from sqlalchemy import text
-from zoneinfo import ZoneInfo
 
 from fleet.db import engine as db_engine
+from fleet import parallel, queries, rollups
+from fleet.cache import versioned
+from fleet.fiscal import LOCAL_TZ, MONTHS_TH, fiscal_year, fy_bounds, fy_label, month_index
 
 dash.register_page(__name__, path="/", name="Dashboard")
 
 # ---------- Time helpers ----------
-TZ = ZoneInfo("Asia/Bangkok")
-
-FISCAL_START_MONTH = 10
-MONTHS_TH = ["ต.ค.","พ.ย.","ธ.ค.","ม.ค.","ก.พ.","มี.ค.","เม.ย.","พ.ค.","มิ.ย.","ก.ค.","ส.ค.","ก.ย."]
+TZ = LOCAL_TZ
 
 def today_local() -> pd.Timestamp:
     """เวลาวันนี้แบบ 00:00 และตัด timezone ให้เป็น naive เพื่อเทียบกับคอลัมน์ใน DB ได้ตรงกัน"""
@@ -29,155 +29,99 @@ def _month_bounds(ts: pd.Timestamp | None = None):
     return start, end
 
 def _fiscal_year(ts: pd.Timestamp) -> int:
-    return ts.year if ts.month >= FISCAL_START_MONTH else ts.year - 1
+    return fiscal_year(ts)
 
 def _fy_bounds(fy: int) -> tuple[pd.Timestamp, pd.Timestamp]:
     """รับปีงบประมาณ (เช่น 2025) แล้วคืนช่วงวันที่ [1 ต.ค. ปีนั้น, 1 ต.ค. ปีถัดไป)"""
-    start = pd.Timestamp(fy, FISCAL_START_MONTH, 1)
-    end   = pd.Timestamp(fy + 1, FISCAL_START_MONTH, 1)
-    return start, end
+    start, end = fy_bounds(fy)
+    return pd.Timestamp(start), pd.Timestamp(end)
 
-# ---------- Type guards ----------
-def _ensure_dt_num(df: pd.DataFrame, date_col: str, num_col: str) -> pd.DataFrame:
-    if df.empty:
-        return df
-    df = df.copy()
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df[num_col]  = pd.to_numeric(df[num_col], errors="coerce").fillna(0.0)
-    return df.dropna(subset=[date_col])
-
-def _ensure_usage_types(df: pd.DataFrame) -> pd.DataFrame:
-    """แปลงชนิดคอลัมน์ usage ให้ถูกต้อง/สม่ำเสมอ"""
-    if df.empty:
-        return df
-    df = df.copy()
-
-    # แปลงคอลัมน์เวลาที่ต้องใช้ แล้วตัด timezone ออกให้เป็น naive เสมอ
-    for c in ["start_time", "planned_end_time", "returned_at"]:
-        s = pd.to_datetime(df.get(c), errors="coerce")
-        if pd.api.types.is_datetime64tz_dtype(s):
-            s = s.dt.tz_localize(None)
-        df[c] = s
-
-    # ให้ is_maintenance เป็น 0/1 เสมอ
-    df["is_maintenance"] = (
-        pd.to_numeric(df.get("is_maintenance", 0), errors="coerce")
-          .fillna(0).astype(int)
-    )
-    return df
+def _ym(ts: pd.Timestamp) -> str:
+    """คีย์เดือนของ maint_monthly (YYYY-MM)"""
+    return f"{ts.year:04d}-{ts.month:02d}"
 
-# ---------- Readers ----------
-def read_orders() -> pd.DataFrame:
-    with db_engine.begin() as conn:
-        rs = conn.execute(text("""
-            SELECT accept_date, grand_total, car_id
-            FROM maintenance_orders
-            WHERE accept_date IS NOT NULL
-        """)).mappings().all()
-    df = pd.DataFrame(rs)
-    if df.empty:
-        return df
-    return _ensure_dt_num(df, "accept_date", "grand_total")
-
-def read_usage() -> pd.DataFrame:
-    with db_engine.begin() as conn:
-        rs = conn.execute(text("""
-            SELECT car_id, start_time, returned_at, is_maintenance, planned_end_time
-            FROM usage_logs
-        """)).mappings().all()
-    return _ensure_usage_types(pd.DataFrame(rs))
-
-def read_cars_status_display() -> pd.DataFrame:
-    sql = text("""
-    WITH m AS (
-        SELECT car_id, COUNT(*) cnt
-        FROM usage_logs
-        WHERE returned_at IS NULL AND is_maintenance = 1
-        GROUP BY car_id
-    ),
-    a AS (
-        SELECT car_id, COUNT(*) cnt
-        FROM usage_logs
-        WHERE returned_at IS NULL AND IFNULL(is_maintenance,0) = 0
-        GROUP BY car_id
-    )
-    SELECT c.id, c.plate,
-           COALESCE(
-             CASE
-               WHEN m.cnt > 0 THEN 'maintenance'
-               WHEN a.cnt > 0 THEN 'in_use'
-               ELSE c.status
-             END,
-             c.status, 'available'
-           ) AS status_display,
-           COALESCE(c.car_condition,'ปกติ') AS car_condition
-    FROM cars c
-    LEFT JOIN m ON m.car_id = c.id
-    LEFT JOIN a ON a.car_id = c.id
-    WHERE COALESCE(c.car_condition,'ปกติ') = 'ปกติ'
-    """)
-    with db_engine.begin() as conn:
-        rs = conn.execute(sql).mappings().all()
-    return pd.DataFrame(rs)
+def _ymd(ts: pd.Timestamp) -> str:
+    """คีย์วันของ usage_daily (YYYY-MM-DD)"""
+    return ts.strftime("%Y-%m-%d")
 
+# ---------- Readers ----------
+@versioned("cars", shared=True)
 def cars_lookup() -> dict[int, str]:
     with db_engine.begin() as conn:
-        rs = conn.execute(text("SELECT id, plate FROM cars")).mappings().all()
-    df = pd.DataFrame(rs)
-    return {} if df.empty else dict(zip(df["id"], df["plate"]))
-
-
-def _fiscal_year_list(df_orders: pd.DataFrame) -> list[int]:
-    if df_orders.empty:
-        return [_fiscal_year(today_local())]
-    return sorted(df_orders["accept_date"].map(_fiscal_year).unique())
+        return {r[0]: r[1] for r in conn.execute(text("SELECT id, plate FROM cars")).all()}
+
+def _plate(cmap: dict, car_id) -> str:
+    return cmap.get(car_id, f"ID {car_id}")
+
+
+# ---------- Data context ----------
+# ข้อมูลของปีงบฯ ถูกอ่านครั้งเดียวต่อ (fy, เวอร์ชันตาราง) แล้วแชร์ให้ทุก callback/กราฟ
+# dd-fy เปลี่ยน -> อ่าน maint_monthly 1 ครั้ง + usage_daily 1 ครั้ง (+ cars เมื่อ cars เปลี่ยน)
+@versioned("maintenance_orders", shared=True)
+def maint_rows(fy: int) -> list[dict]:
+    """แถว (car_id, month, orders, spend) ของปีงบฯ fy"""
+    start, end = _fy_bounds(fy)
+    return rollups.maint_car_months(_ym(start), _ym(end))
+
+@versioned("usage_logs", shared=True)
+def trip_rows(fy: int) -> list[dict]:
+    """จำนวนเที่ยวต่อคันของปีงบฯ fy"""
+    start, end = _fy_bounds(fy)
+    return rollups.trips_by_car(_ymd(start), _ymd(end))
+
+@versioned("usage_logs", key=lambda: today_local().date(), shared=True)
+def usage_kpis() -> tuple[int, int]:
+    """(ใช้งานวันนี้, ใช้งานเดือนนี้)"""
+    today = today_local()
+    m_start, m_end = _month_bounds(today)
+    return (rollups.trips_total(_ymd(today), _ymd(today + pd.Timedelta(days=1))),
+            rollups.trips_total(_ymd(m_start), _ymd(m_end)))
+
+def _sum_by_car(rows: list[dict], months: set[str] | None = None) -> list[dict]:
+    out: dict = {}
+    for r in rows:
+        if months is not None and r["month"] not in months:
+            continue
+        acc = out.setdefault(r["car_id"], {"car_id": r["car_id"], "orders": 0, "spend": 0.0})
+        acc["orders"] += int(r["orders"] or 0)
+        acc["spend"]  += float(r["spend"] or 0.0)
+    return list(out.values())
+
+
+def _fiscal_year_list() -> list[int]:
+    """ปีงบฯ ที่มีใบงานซ่อม (อ่านจาก rollup maint_monthly)"""
+    return rollups.maint_fiscal_years() or [_fiscal_year(today_local())]
 
 #กราฟ “ยอดซ่อมรายเดือน” ให้เรียงเดือนเริ่ม ต.ค.
-def _fig_monthly(df_orders: pd.DataFrame, fy: int):
+def _fig_monthly(fy: int):
     months_th = MONTHS_TH  # เริ่ม ต.ค.
 
-    if df_orders.empty:
-        plot_df = pd.DataFrame({"month": months_th, "total": [0.0]*12})
-    else:
-        start = pd.Timestamp(fy, FISCAL_START_MONTH, 1)          # ต.ค. ของปีงบฯ
-        end   = pd.Timestamp(fy + 1, FISCAL_START_MONTH, 1)      # ต.ค. ปีถัดไป
-        df = df_orders[(df_orders["accept_date"] >= start) & (df_orders["accept_date"] < end)].copy()
-        if df.empty:
-            plot_df = pd.DataFrame({"month": months_th, "total": [0.0]*12})
-        else:
-            # map เดือนจริง → index ปีงบฯ (ต.ค.=0 ... ก.ย.=11)
-            df["f_idx"] = (df["accept_date"].dt.month - FISCAL_START_MONTH) % 12
-            grp = df.groupby("f_idx")["grand_total"].sum()
-            totals = [float(grp.get(i, 0.0)) for i in range(12)]
-            plot_df = pd.DataFrame({"month": months_th, "total": totals})
+    # map เดือนจริง → index ปีงบฯ (ต.ค.=0 ... ก.ย.=11)
+    totals = [0.0] * 12
+    for r in maint_rows(fy):
+        f_idx = month_index(int(r["month"][5:7]))
+        totals[f_idx] += float(r["spend"] or 0.0)
+    plot_df = pd.DataFrame({"month": months_th, "total": totals})
 
     fig = px.line(plot_df, x="month", y="total", markers=True,
-                  title=f"ยอดค่าบำรุ่งรักษารวมรายเดือน (ปีงบประมาณ {fy}/{(fy+1)%100:02d})")
+                  title=f"ยอดค่าบำรุ่งรักษารวมรายเดือน (ปีงบประมาณ {fy_label(fy)})")
     fig.update_layout(yaxis_title="บาท", xaxis_title="เดือน (เริ่ม ต.ค.)")
     fig.update_yaxes(tickformat=",")
     return fig
 
-def _fig_by_car(df_orders: pd.DataFrame, fy: int, months_window: int):
+def _fig_by_car(fy: int, months_window: int):
     """กราฟเส้น: ยอดซ่อมรวมรายคัน ในช่วง N เดือนนับจาก ต.ค. ของปีงบประมาณ fy"""
     car_map = cars_lookup()
 
-    # ช่วงเวลาจาก 1 ต.ค. ของปีงบฯ fy ไปอีก N เดือน
-    start = pd.Timestamp(fy, 10, 1)  # ต.ค.
-    end   = start + pd.DateOffset(months=months_window)
-
-    if df_orders.empty:
-        plot_df = pd.DataFrame({"plate": [], "total": []})
-    else:
-        df = df_orders[(df_orders["accept_date"] >= start) &
-                       (df_orders["accept_date"] <  end)].copy()
-        if df.empty:
-            plot_df = pd.DataFrame({"plate": [], "total": []})
-        else:
-            grp = df.groupby("car_id")["grand_total"].sum().sort_values(ascending=False)
-            plot_df = pd.DataFrame({
-                "plate": [car_map.get(i, f"ID {i}") for i in grp.index],
-                "total": grp.values
-            })
+    # ช่วงเวลาจาก 1 ต.ค. ของปีงบฯ fy ไปอีก N เดือน (ไม่เกิน 12 = ข้อมูลใน maint_rows(fy))
+    start, _ = _fy_bounds(fy)  # ต.ค.
+    months = {_ym(start + pd.DateOffset(months=i)) for i in range(min(months_window, 12))}
+
+    rows = sorted(_sum_by_car(maint_rows(fy), months), key=lambda r: r["spend"], reverse=True)
+    plot_df = pd.DataFrame({
+        "plate": [_plate(car_map, r["car_id"]) for r in rows],
+        "total": [r["spend"] for r in rows],
+    })
 
     title = f"ยอดค่าบำรุงรักษารวมรายคัน (นับจาก ต.ค. {fy} ถึง {months_window} เดือน)"
     fig = px.line(plot_df, x="plate", y="total", markers=True, title=title)
@@ -185,16 +129,58 @@ def _fig_by_car(df_orders: pd.DataFrame, fy: int, months_window: int):
     fig.update_yaxes(tickformat=",")
     return fig
 
-def _ensure_types(obj) -> pd.DataFrame:
-    """รองรับโค้ดเดิมที่เรียก _ensure_types; แปลง cache -> DataFrame แล้วบังคับ dtype"""
-    df = pd.DataFrame(obj or [])
-    return _ensure_dt_num(df, "accept_date", "grand_total")
-# ---------- Preload / caches ----------
-_orders_df = read_orders()
-_usage_df  = read_usage()
-_cars_df   = read_cars_status_display()
+def _top5_bar(rows: list[dict], key: str, title: str):
+    """Top 5 จากแถว rollup (car_id + ตัวนับ key)"""
+    top = sorted((r for r in rows if r[key]), key=lambda r: r[key], reverse=True)[:5]
+    if not top:
+        return _empty_bar(title)
+    cmap = cars_lookup()
+    df = pd.DataFrame({"plate": [_plate(cmap, r["car_id"]) for r in top],
+                       "count": [int(r[key]) for r in top]})
+    fig = px.bar(df, x="plate", y="count", title=title)
+    fig.update_yaxes(tickformat=",")
+    return fig
+
+# ---------- Figure cache ----------
+# figure ขึ้นกับ (อินพุต, เวอร์ชันของตารางต้นทาง) เท่านั้น -> เก็บเป็น JSON ที่ serialize แล้ว
+# ผู้ใช้หลายคน/เปิดซ้ำจะไม่ต้องผ่าน pandas + plotly express อีก (rollup ถูก trigger อัปเดตตามตารางต้นทาง)
+def _as_json(fig) -> dict:
+    """Figure -> dict ของ JSON ล้วน (ส่งให้ Dash ได้ตรง ๆ)"""
+    return fig if isinstance(fig, dict) else json.loads(fig.to_json())
+
+@versioned("maintenance_orders", "cars", shared=True)
+def monthly_figure(fy: int) -> dict:
+    return _as_json(_fig_monthly(fy))
+
+@versioned("maintenance_orders", "cars", shared=True)
+def by_car_figure(fy: int, months_window: int) -> dict:
+    return _as_json(_fig_by_car(fy, months_window))
+
+@versioned("usage_logs", "cars", shared=True)
+def top_borrow_figure(fy: int) -> dict:
+    return _as_json(_top5_bar(trip_rows(fy), "trips", "Top 5 รถที่ใช้งานบ่อยสุด (ปีงบฯ)"))
+
+@versioned("maintenance_orders", "cars", shared=True)
+def top_repair_figure(fy: int) -> dict:
+    return _as_json(_top5_bar(_sum_by_car(maint_rows(fy)), "orders",
+                              "Top 5 รถที่เข้าซ่อมมากสุด (ปีงบฯ)"))
+
+@versioned("usage_logs", "cars", shared=True)
+def donut_figure() -> dict:
+    counts = queries.fetch_car_status_counts()       # query เดียวกับ /live/status และ API
+    if not counts:
+        return _empty_donut()
+    label_map = {"available":"พร้อมใช้งาน","in_use":"ใช้งานอยู่","maintenance":"เข้าซ่อม"}
+    donut_df = pd.DataFrame({"status_display": list(label_map),
+                             "count": [counts.get(k, 0) for k in label_map]})
+    donut_df["label_th"] = donut_df["status_display"].map(label_map)
+    return _as_json(px.pie(donut_df, values="count", names="label_th", hole=0.5,
+                           title=f"สถานะรถ (รวม {int(donut_df['count'].sum())} คัน)"))
+
 
-_fy_list    = _fiscal_year_list(_orders_df)
+# ---------- Preload / caches ----------
+# กราฟ/KPI อ่านจาก rollup (usage_daily, maint_monthly) ตอน callback จึงไม่ต้องโหลดประวัติทั้งหมดไว้ล่วงหน้า
+_fy_list    = _fiscal_year_list()
 _default_fy = _fy_list[-1] if _fy_list else _fiscal_year(today_local())
 
 # ---------- Layout ----------
@@ -207,7 +193,7 @@ layout = html.Div([
             html.Label("ปีงบประมาณ (เริ่ม ต.ค.)"),
             dcc.Dropdown(
                 id="dd-fy",
-                options=[{"label": f"{y}/{(y+1)%100:02d}", "value": y} for y in _fy_list],
+                options=[{"label": fy_label(y), "value": y} for y in _fy_list],
                 value=_default_fy, clearable=False, style={"width": "220px"},
             ),
         ], style={"display": "inline-block", "marginRight": "20px"}),
@@ -243,27 +229,36 @@ layout = html.Div([
     dcc.Graph(id="fig-monthly"),
     dcc.Graph(id="fig-bycar"),
 
-    # caches (id ต้องไม่ซ้ำ)
-    dcc.Store(id="orders-cache", data=_orders_df.to_dict("records")),
-    dcc.Store(id="usage-cache",  data=_usage_df.to_dict("records")),
-    dcc.Store(id="cars-cache",   data=_cars_df.to_dict("records")),
+    # สถานะ live จาก /live/status (assets/live.js เขียนเข้ามา)
+    dcc.Store(id="live-status"),
 ])
 
 #เวลาตาม Time zone
 def current_fiscal_year():
     return _fiscal_year(today_local())
 
-#ป้องกันส่งข้อมูลว่างเปล่ามาพอต
-def _empty_bar(title, x_col="plate", y_col="count"):
+#ป้องกันส่งข้อมูลว่างเปล่ามาพอต (ค่าคงที่ต่อ title -> สร้างครั้งเดียว)
+@functools.lru_cache(maxsize=None)
+def _empty_bar(title, x_col="plate", y_col="count") -> dict:
     df = pd.DataFrame({x_col: [], y_col: []})
     fig = px.bar(df, x=x_col, y=y_col, title=title)
     fig.update_yaxes(tickformat=",")
-    return fig
+    return _as_json(fig)
 
-def _empty_donut():
+@functools.lru_cache(maxsize=None)
+def _empty_donut() -> dict:
     df = pd.DataFrame({"label_th":["พร้อมใช้งาน","ใช้งานอยู่","เข้าซ่อม"], "count":[0,0,0]})
-    return px.pie(df, values="count", names="label_th", hole=0.5,
-                  title="สถานะรถ (รวม 0 คัน)")
+    return _as_json(px.pie(df, values="count", names="label_th", hole=0.5,
+                           title="สถานะรถ (รวม 0 คัน)"))
+
+def _timed(res: parallel.Results) -> parallel.Results:
+    """เวลาแยกต่อ query -> header Server-Timing (ดูใน DevTools/Dash dev tools)"""
+    try:
+        for name, ms in res.timings.items():
+            dash.callback_context.record_timing(name, ms / 1000)
+    except Exception:
+        pass
+    return res
 
 def _fallback_outputs():
     fig_donut = _empty_donut()
@@ -280,16 +275,14 @@ def _fallback_outputs():
     Output("fig-bycar","figure"),
     Input("dd-fy","value"),
     Input("dd-window","value"),
-    State("orders-cache","data"),
 )
-def update_figs(fy, months_window, cache):
-    df_orders = read_orders()     # ← ใช้ alias ที่เพิ่งเพิ่ม
+def update_figs(fy, months_window):
     fy = int(fy) if fy is not None else current_fiscal_year()
     months_window = int(months_window or 3)
 
-    fig1 = _fig_monthly(df_orders, fy)
-    fig2 = _fig_by_car(df_orders, fy, months_window)  # อย่าลืมส่ง fy เข้าไปด้วย
-    return fig1, fig2
+    res = _timed(parallel.gather(monthly=(monthly_figure, fy),
+                                 by_car=(by_car_figure, fy, months_window)))
+    return res["monthly"], res["by_car"]
 
 @callback(
     Output("fig-donut","figure"),
@@ -303,72 +296,27 @@ def update_figs(fy, months_window, cache):
 def update_dashboard(fy):
     try:
         fy = int(fy) if fy is not None else _fiscal_year(today_local())
-        fy_start, fy_end = _fy_bounds(fy)
-        today = today_local()
-        m_start, m_end = _month_bounds(today)
-
-        # -------- อ่านข้อมูลสด --------
-        cars   = read_cars_status_display()
-        usage  = read_usage()
-        orders = read_orders()
-
-        # ----- Donut -----
-        categories = pd.Index(["available","in_use","maintenance"], name="status_display")
-        if cars.empty:
-            fig_donut = _empty_donut()
-        else:
-            donut_df = (cars.groupby("status_display")["id"]
-                           .count().reindex(categories, fill_value=0)
-                           .reset_index(name="count"))
-            label_map = {"available":"พร้อมใช้งาน","in_use":"ใช้งานอยู่","maintenance":"เข้าซ่อม"}
-            donut_df["label_th"] = donut_df["status_display"].map(label_map)
-            fig_donut = px.pie(donut_df, values="count", names="label_th", hole=0.5,
-                               title=f"สถานะรถ (รวม {int(donut_df['count'].sum())} คัน)")
-
-        # ----- KPIs -----
-        usage = _ensure_usage_types(usage)
-        if usage.empty:
-            k_today = k_month = k_fy = 0
-            u_fy = pd.DataFrame()
-        else:
-            u = usage[usage["is_maintenance"] == 0]
-            u_today = u[u["start_time"].dt.date == today.date()]
-            u_month = u[(u["start_time"] >= m_start) & (u["start_time"] < m_end)]
-            u_fy    = u[(u["start_time"] >= fy_start) & (u["start_time"] < fy_end)]
-            k_today = len(u_today); k_month = len(u_month); k_fy = len(u_fy)
+
+        # อ่านพร้อมกัน (ไม่ขึ้นต่อกัน) ; แต่ละตัว cache จนกว่าตารางที่ผูกไว้จะถูกเขียน
+        res = _timed(parallel.gather(
+            donut=donut_figure,                     # สถานะรถ (usage_logs + cars)
+            kpis=usage_kpis,                        # usage_daily วันนี้/เดือนนี้
+            trips=(trip_rows, fy),                  # usage_daily ทั้งปีงบฯ
+            top_borrow=(top_borrow_figure, fy),
+            top_repair=(top_repair_figure, fy),
+        ))
+        fig_donut = res["donut"]
+
+        # ----- KPIs (usage_daily) -----
+        k_today, k_month = res["kpis"]
+        k_fy    = sum(int(r["trips"] or 0) for r in res["trips"])
         kpi_today = html.H3(f"ใช้งานวันนี้: {k_today:,} ครั้ง")
         kpi_month = html.H3(f"ใช้งานเดือนนี้: {k_month:,} ครั้ง")
-        kpi_fy    = html.H3(f"ใช้งานปีงบฯ {fy}/{(fy+1)%100:02d}: {k_fy:,} ครั้ง")
-
-        # ----- Top 5 ใช้งานบ่อย -----
-        if u_fy.empty:
-            fig_top_borrow = _empty_bar("Top 5 รถที่ใช้งานบ่อยสุด (ปีงบฯ)")
-        else:
-            top_b = (u_fy.groupby("car_id")["start_time"]
-                       .count().sort_values(ascending=False).head(5))
-            cmap = cars_lookup()
-            df_b = pd.DataFrame({"plate":[cmap.get(i, f"ID {i}") for i in top_b.index],
-                                 "count":top_b.values})
-            fig_top_borrow = px.bar(df_b, x="plate", y="count",
-                                    title="Top 5 รถที่ใช้งานบ่อยสุด (ปีงบฯ)")
-            fig_top_borrow.update_yaxes(tickformat=",")
-
-        # ----- Top 5 ซ่อมบ่อย -----
-        if orders.empty:
-            fig_top_repair = _empty_bar("Top 5 รถที่เข้าซ่อมมากสุด (ปีงบฯ)")
-        else:
-            o_fy = orders[(orders["accept_date"] >= fy_start) & (orders["accept_date"] < fy_end)]
-            if o_fy.empty:
-                fig_top_repair = _empty_bar("Top 5 รถที่เข้าซ่อมมากสุด (ปีงบฯ)")
-            else:
-                top_r = (o_fy.groupby("car_id")["accept_date"]
-                           .count().sort_values(ascending=False).head(5))
-                cmap = cars_lookup()
-                df_r = pd.DataFrame({"plate":[cmap.get(i, f"ID {i}") for i in top_r.index],
-                                     "count":top_r.values})
-                fig_top_repair = px.bar(df_r, x="plate", y="count",
-                                        title="Top 5 รถที่เข้าซ่อมมากสุด (ปีงบฯ)")
-                fig_top_repair.update_yaxes(tickformat=",")
+        kpi_fy    = html.H3(f"ใช้งานปีงบฯ {fy_label(fy)}: {k_fy:,} ครั้ง")
+
+        # ----- Top 5 ใช้งานบ่อย / ซ่อมบ่อย -----
+        fig_top_borrow = res["top_borrow"]
+        fig_top_repair = res["top_repair"]
 
         return fig_donut, kpi_today, kpi_month, kpi_fy, fig_top_borrow, fig_top_repair
 
@@ -376,3 +324,44 @@ def update_dashboard(fy):
         # log error แล้วคืน fallback เพื่อไม่ให้ Dash เจอ None
         print("update_dashboard error:", e)
         return _fallback_outputs()
+
+
+# ---------- Live status (SSE) ----------
+# อัปเดตเฉพาะ donut + KPI ในเบราว์เซอร์ ; server อ่าน DB ครั้งเดียวต่อการเปลี่ยนแปลง (fleet/live.py)
+clientside_callback(
+    """
+    function (live, fy) {
+        var nu = window.dash_clientside.no_update;
+        if (!live) { return [nu, nu, nu, nu]; }
+        var names = {available: "พร้อมใช้งาน", in_use: "ใช้งานอยู่", maintenance: "เข้าซ่อม"};
+        var keys = ["available", "in_use", "maintenance"];
+        var values = keys.map(function (k) { return live.status[k] || 0; });
+        var total = values.reduce(function (a, b) { return a + b; }, 0);
+        var donut = {
+            data: [{type: "pie", labels: keys.map(function (k) { return names[k]; }),
+                    values: values, hole: 0.5}],
+            layout: {title: {text: "สถานะรถ (รวม " + total + " คัน)"}}
+        };
+        function h3(text) {
+            return {namespace: "dash_html_components", type: "H3", props: {children: text}};
+        }
+        var fmt = function (n) { return Number(n).toLocaleString("en-US"); };
+        var kfy = nu;
+        if (fy === null || fy === undefined || Number(fy) === live.fy) {
+            var label = live.fy + "/" + String((live.fy + 1) % 100).padStart(2, "0");
+            kfy = h3("ใช้งานปีงบฯ " + label + ": " + fmt(live.kpi.fy) + " ครั้ง");
+        }
+        return [donut,
+                h3("ใช้งานวันนี้: " + fmt(live.kpi.today) + " ครั้ง"),
+                h3("ใช้งานเดือนนี้: " + fmt(live.kpi.month) + " ครั้ง"),
+                kfy];
+    }
+    """,
+    Output("fig-donut","figure", allow_duplicate=True),
+    Output("kpi-today","children", allow_duplicate=True),
+    Output("kpi-month","children", allow_duplicate=True),
+    Output("kpi-fy","children", allow_duplicate=True),
+    Input("live-status","data"),
+    State("dd-fy","value"),
+    prevent_initial_call=True,
+)
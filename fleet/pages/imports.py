@@ -0,0 +1,173 @@
+# fleet/pages/imports.py
+import base64
+import io
+import re
+import time
+import uuid
+from pathlib import Path
+
+import dash
+from dash import html, dcc, dash_table, Input, Output, State, callback, no_update
+import pandas as pd
+
+from fleet import importer
+from fleet.jobs import JOBS_DIR, background_callback
+
+dash.register_page(__name__, path="/imports", name="Imports")
+
+KIND_OPTIONS = [
+    {"label": "รถ (cars)",                 "value": "cars"},
+    {"label": "ผู้ใช้งาน (users)",          "value": "users"},
+    {"label": "ประวัติการใช้รถ (usage)",    "value": "usage"},
+]
+SHOW_ERRORS = 200       # แสดงในตาราง ; รายงานเต็มดาวน์โหลดเป็น CSV
+# รายงานเต็มเก็บเป็นไฟล์ฝั่ง server (อาจเป็นแสนแถว) ; dcc.Store "imp-errors" มีแค่ handle
+REPORT_DIR = Path(JOBS_DIR) / "import_errors"
+REPORT_TTL = 86400      # วินาที ; ไฟล์ที่เก่ากว่านี้ถูกลบตอนบันทึกรายงานใหม่
+
+layout = html.Div(
+    [
+        html.H1("Imports"),
+        dcc.Store(id="imp-errors"),
+
+        html.Div(
+            [
+                html.Label("ชนิดข้อมูล", className="mr-2"),
+                dcc.Dropdown(id="imp-kind", options=KIND_OPTIONS, value="cars", clearable=False,
+                             style={"width":"240px","display":"inline-block","marginLeft":"8px","marginRight":"8px"}),
+                html.Button("⬇️ แม่แบบ CSV", id="imp-btn-template", n_clicks=0, style={"marginRight":"8px"}),
+                dcc.Download(id="imp-template"),
+            ],
+            style={"marginBottom":"10px"},
+        ),
+        html.Div(
+            [
+                dcc.Upload(
+                    id="imp-upload",
+                    children=html.Div(["📄 ลากไฟล์ CSV / Excel มาวาง หรือ ", html.A("เลือกไฟล์")]),
+                    accept=".csv,.xlsx,.xls",
+                    multiple=False,
+                    style={
+                        "display":"inline-block","padding":"6px 12px","border":"1px dashed #aaa",
+                        "borderRadius":"8px","marginRight":"8px"
+                    }
+                ),
+                html.Span(id="imp-filename", style={"marginRight":"8px","color":"#555"}),
+                dcc.Checklist(id="imp-dry", options=[{"label":"ตรวจอย่างเดียว (ไม่บันทึก)","value":"on"}],
+                              value=["on"], style={"display":"inline-block","marginRight":"8px"}),
+                html.Button("⬆️ นำเข้า", id="imp-btn-run", n_clicks=0, style={"marginRight":"8px"}),
+                html.Button("✖ ยกเลิก", id="imp-btn-cancel", style={"display":"none","marginRight":"8px"}),
+                html.Span(id="imp-progress", style={"display":"none","marginRight":"8px","color":"#777"}),
+            ],
+            style={"marginBottom":"10px"},
+        ),
+        html.Div(id="imp-summary", style={"marginBottom":"6px"}),
+        html.Button("⬇️ รายงานข้อผิดพลาด (CSV)", id="imp-btn-errors", n_clicks=0, style={"display":"none"}),
+        dcc.Download(id="imp-errors-download"),
+        dash_table.DataTable(
+            id="imp-tbl-errors",
+            columns=[{"name": c, "id": c} for c in ("row", "column", "value", "message")],
+            data=[],
+            page_size=20,
+            style_table={"overflowX":"auto","marginTop":"8px"},
+            style_cell={"fontFamily":"Sarabun, sans-serif","fontSize":"14px","textAlign":"left"},
+        ),
+    ]
+)
+
+
+# ---------- แม่แบบ ----------
+@callback(
+    Output("imp-template","data"),
+    Input("imp-btn-template","n_clicks"),
+    State("imp-kind","value"),
+    prevent_initial_call=True
+)
+def download_template(n, kind):
+    return dcc.send_string(importer.template(kind), f"{kind}_template.csv")
+
+@callback(
+    Output("imp-filename","children"),
+    Input("imp-upload","filename"),
+)
+def show_filename(filename):
+    return filename or ""
+
+
+# ---------- รายงานข้อผิดพลาด (ไฟล์ฝั่ง server) ----------
+def _save_report(errors: list[dict]) -> str:
+    """เขียนรายงานเป็น CSV แล้วคืน handle (ชื่อไฟล์แบบสุ่ม)"""
+    REPORT_DIR.mkdir(parents=True, exist_ok=True)
+    cutoff = time.time() - REPORT_TTL
+    for old in REPORT_DIR.glob("*.csv"):
+        if old.stat().st_mtime < cutoff:
+            old.unlink(missing_ok=True)
+    handle = uuid.uuid4().hex
+    tmp = REPORT_DIR / f"{handle}.part"
+    pd.DataFrame(errors).to_csv(tmp, index=False, encoding="utf-8-sig", lineterminator="\r\n")
+    tmp.replace(REPORT_DIR / f"{handle}.csv")
+    return handle
+
+def _report_path(handle) -> Path | None:
+    """handle จาก Store -> ไฟล์รายงาน ; รูปแบบไม่ถูก (กัน path traversal) / หมดอายุแล้ว -> None"""
+    if not isinstance(handle, str) or not re.fullmatch(r"[0-9a-f]{32}", handle):
+        return None
+    path = REPORT_DIR / f"{handle}.csv"
+    return path if path.is_file() else None
+
+
+# ---------- นำเข้า (background: ไฟล์ใหญ่ไม่บล็อก worker) ----------
+@background_callback(
+    Output("imp-summary","children"),
+    Output("imp-tbl-errors","data"),
+    Output("imp-errors","data"),
+    Output("imp-btn-errors","style"),
+    Input("imp-btn-run","n_clicks"),
+    State("imp-kind","value"),
+    State("imp-upload","contents"),
+    State("imp-upload","filename"),
+    State("imp-dry","value"),
+    progress=Output("imp-progress","children"),
+    cancel=Input("imp-btn-cancel","n_clicks"),
+    running=[
+        (Output("imp-btn-run","disabled"), True, False),
+        (Output("imp-btn-cancel","style"), {"marginRight":"8px"}, {"display":"none"}),
+        (Output("imp-progress","style"), {"marginRight":"8px","color":"#777"}, {"display":"none"}),
+    ],
+    prevent_initial_call=True
+)
+def run_import(set_progress, n, kind, contents, filename, dry):
+    # n_clicks อยู่ใน cache key: กดแต่ละครั้งนำเข้าใหม่เสมอ (ข้อมูลใน DB เปลี่ยนหลังนำเข้า)
+    if not contents:
+        return "⚠️ กรุณาเลือกไฟล์ก่อน", [], None, {"display":"none"}
+    _, b64 = contents.split(",", 1)
+    dry_run = "on" in (dry or [])
+    set_progress("กำลังอ่านไฟล์…")
+    try:
+        res = importer.run(kind, io.BytesIO(base64.b64decode(b64)), filename=filename, dry_run=dry_run,
+                           progress=lambda rows: set_progress(f"ตรวจแล้ว {rows:,} แถว…"))
+    except (importer.ImportFileError, ValueError, UnicodeDecodeError) as e:
+        return f"❌ {filename}: {e}", [], None, {"display":"none"}
+
+    errors = res["errors"]
+    verb = "ผ่านการตรวจ" if dry_run else "นำเข้าแล้ว"
+    summary = (f"{'🔎 (ตรวจอย่างเดียว) ' if dry_run else '✅ '}{filename}: {res['rows']:,} แถว, "
+               f"{verb} {res['inserted']:,}, ผิดพลาด {len(errors):,}")
+    if len(errors) > SHOW_ERRORS:
+        summary += f" (แสดง {SHOW_ERRORS} รายการแรก)"
+    style = {"marginRight":"8px"} if errors else {"display":"none"}
+    return summary, errors[:SHOW_ERRORS], _save_report(errors) if errors else None, style
+
+@callback(
+    Output("imp-errors-download","data"),
+    Input("imp-btn-errors","n_clicks"),
+    State("imp-errors","data"),
+    State("imp-upload","filename"),
+    prevent_initial_call=True
+)
+def download_errors(n, handle, filename):
+    path = _report_path(handle)
+    if path is None:
+        return no_update
+    name = (filename or "import").rsplit(".", 1)[0] + "_errors.csv"
+    return dcc.send_file(str(path), filename=name)
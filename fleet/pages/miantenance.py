@@ -1,16 +1,20 @@
-import base64, os
+from pathlib import Path
 import dash
 from dash import html, dcc, dash_table, Input, Output, State, callback, no_update
+import numpy as np
 import pandas as pd
 from sqlalchemy import text
-from fleet.db import engine as db_engine, UPLOAD_DIR
+from fleet.db import engine as db_engine
+from fleet import fiscal, typeahead
+from fleet.cache import bump
+from fleet.columnar import ORDERS
+from fleet.jobs import background_callback
+from fleet.queries import (fetch_orders, fetch_order_items, fetch_committee_ids, get_order, order_plate,
+                           ORDER_COLUMNS)
+from fleet.attachments import save_upload, latest_attachment, get_attachment, attachment_options
 
 dash.register_page(__name__, path="/maintenance", name="Maintenance")
 
-# เก็บไฟล์แนบของใบงาน
-MAINT_UPLOAD_DIR = (UPLOAD_DIR.parent / "maintenance")
-MAINT_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
 # ---------- helpers ----------
 def _upsert_committee(conn, order_id: int, user_ids: list[int]):
     """แทนที่กรรมการของใบงานด้วย user_id ที่ส่งมา (ทำในทรานแซกชันเดียว)"""
@@ -22,58 +26,24 @@ def _upsert_committee(conn, order_id: int, user_ids: list[int]):
             [{"oid": int(order_id), "uid": int(uid)} for uid in user_ids]
         )
 
-def q(sql, params=None):
-    with db_engine.begin() as conn:
-        return conn.execute(text(sql), params or {})
-
 def cars_options():
-    rows = q("SELECT id, plate FROM cars ORDER BY plate").mappings().all()
-    return [{"label": r["plate"], "value": r["id"]} for r in rows]
+    # top-N ; ที่เหลือค้นผ่าน search_value (typeahead.attach ด้านล่าง)
+    return typeahead.options("cars")
 
 def users_options():
-    rows = q("SELECT id, full_name FROM users ORDER BY full_name").mappings().all()
-    return [{"label": r["full_name"], "value": r["id"]} for r in rows]   # เก็บเป็นชื่อ
+    return typeahead.options("users")
 
 def fetch_orders_df():
-    rows = q("""
-        SELECT  o.id,
-                c.plate,
-                o.repair_date,
-                o.accept_date,
-                o.center_name,
-                COALESCE((
-                    SELECT GROUP_CONCAT(u.full_name, ', ')
-                    FROM maintenance_committee mc
-                    JOIN users u ON u.id = mc.user_id
-                    WHERE mc.order_id = o.id
-                ), '') AS committee,        -- << แสดงชื่อจากตารางเชื่อม
-                o.total_qty, o.subtotal, o.vat, o.grand_total, o.pdf_path
-        FROM maintenance_orders o
-        LEFT JOIN cars c ON c.id = o.car_id
-        ORDER BY COALESCE(o.accept_date, o.repair_date) DESC, o.id DESC
-    """).mappings().all()
-    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=[
-        "id","plate","repair_date","accept_date","center_name","committee",
-        "total_qty","subtotal","vat","grand_total","pdf_path"
-    ])
+    rows = fetch_orders()
+    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=ORDER_COLUMNS)
     df["has_pdf"] = df["pdf_path"].apply(lambda p: "✓" if p else "")
     return df
 
 def fetch_items_df(order_id:int):
-    rows = q("""
-        SELECT id, item_no, description, qty, unit_price, amount
-        FROM maintenance_items
-        WHERE order_id=:oid
-        ORDER BY COALESCE(item_no, id)
-    """, {"oid": order_id}).mappings().all()
+    rows = fetch_order_items(order_id)
     return pd.DataFrame(rows) if rows else pd.DataFrame(columns=[
         "id","item_no","description","qty","unit_price","amount"
     ])
-def _fetch_committee_ids(order_id: int) -> list[int]:
-    rows = q("SELECT user_id FROM maintenance_committee WHERE order_id=:i",
-             {"i": int(order_id)}).all()
-    return [r[0] for r in rows]
-
 def _upsert_committee(conn, order_id:int, user_ids:list[int]):
     conn.execute(text("DELETE FROM maintenance_committee WHERE order_id=:oid"), {"oid": int(order_id)})
     if user_ids:
@@ -153,6 +123,10 @@ def layout():
                         html.Button("🆕 ใบงานใหม่", id="btn-new"),
                         html.Button("💾 บันทึกใบงาน", id="btn-save"),
                         html.Button("⬇️ Export ประวัติรถ(xlsx)", id="btn-export"),
+                        html.Button("✖ ยกเลิก", id="btn-export-cancel", style={"display":"none"}),
+                        html.Span(id="maint-export-progress", style={"display":"none","color":"#777"}),
+                        dcc.Dropdown(id="maint-attachments", options=[], placeholder="ไฟล์แนบ (ล่าสุดก่อน)",
+                                     clearable=True, style={"width":"300px"}),
                         html.Button("⬇️ ดาวน์โหลด PDF", id="btn-download-pdf"),
                         html.Span(id="msg_maint", style={"marginLeft":"10px","color":"crimson"}),
                     ],
@@ -205,6 +179,8 @@ def layout():
             [
                 html.Button("➕ เพิ่มรายการ", id="btn-add-item", style={"marginRight":"6px"}),
                 html.Button("Export รายการ ซ่อม/อะไหล่", id="btn-export-items", style={"marginRight":"10px"}),
+                html.Button("✖ ยกเลิก", id="btn-export-items-cancel", style={"display":"none"}),
+                html.Span(id="maint-items-export-progress", style={"display":"none","color":"#777"}),
                 html.Div(id="totals-box", style={"display":"inline-block","marginLeft":"12px","fontWeight":"600"}),
                 html.Span(id="msg_items", style={"marginLeft":"10px","color":"#2b6"}),
             ],
@@ -254,6 +230,8 @@ def layout():
 )
 
 # ---------- callbacks ----------
+typeahead.attach("sel-car", "cars")
+typeahead.attach("sel-committee", "users")
 
 # โหลดเริ่มต้น
 @callback(
@@ -329,38 +307,65 @@ def recalc(rows):
 )
 def upload_pdf(contents, filename, order_id):
     if not contents or not order_id:
-        return no_update, "กรุณาเลือกใบงานก่อนแนบไฟล์"
-    header, b64 = contents.split(",", 1)
-    pdf_bytes = base64.b64decode(b64)
-    path = (MAINT_UPLOAD_DIR / f"maint_{order_id}.pdf").as_posix()
-    with open(path, "wb") as f:
-        f.write(pdf_bytes)
-    q("UPDATE maintenance_orders SET pdf_path=:p WHERE id=:i", {"p": path, "i": int(order_id)})
+        return no_update, "กรุณาเลือกใบงานก่อนแนบไฟล์", no_update
+    # เก็บเป็นไฟล์แนบใหม่ของใบงาน (ไม่ทับไฟล์เดิม)
+    save_upload("maintenance", int(order_id), contents, filename)
     orders = fetch_orders_df()
-    return orders.to_dict("records"), orders.to_dict("records"), "อัปโหลด PDF สำเร็จ"  # ✅
+    return orders.to_dict("records"), "อัปโหลด PDF สำเร็จ", orders.to_dict("records")  # ✅
+
+# รายการไฟล์แนบของใบงานที่เลือก
+@callback(
+    Output("maint-attachments","options"),
+    Output("maint-attachments","value"),
+    Input("maint-current-order-id","data"),
+    Input("tbl-orders","data"),
+)
+def list_order_attachments(order_id, _rows):
+    if not order_id:
+        return [], None
+    return attachment_options("maintenance", int(order_id)), None
 
 @callback(
     Output("maint-pdf-download","data"),
+    Output("msg_maint","children", allow_duplicate=True),
     Input("btn-download-pdf","n_clicks"),
     State("maint-current-order-id","data"),
+    State("maint-attachments","value"),
     prevent_initial_call=True
 )
-def download_pdf(n, order_id):
+def download_pdf(n, order_id, attachment_id):
     if not order_id:
-        return no_update
-    row = q("SELECT pdf_path FROM maintenance_orders WHERE id=:i", {"i": int(order_id)}).first()
-    if not row or not row[0] or not os.path.exists(row[0]):
-        return no_update
-    return dcc.send_file(row[0])
+        return no_update, no_update
+    att = get_attachment(attachment_id) if attachment_id else latest_attachment("maintenance", int(order_id))
+    if not att or att["entity_type"] != "maintenance" or att["entity_id"] != int(order_id):
+        return no_update, no_update
+    # แถว attachments อยู่ แต่ไฟล์อาจถูกลบ/ย้ายออกจาก uploads/ ไปแล้ว
+    if not Path(att["path"]).is_file():
+        return no_update, f"ไม่พบไฟล์ {att['filename'] or Path(att['path']).name} บน server"
+    return dcc.send_file(att["path"], filename=att["filename"] or None), ""
 
-# Export
-@callback(
+# Export (background job: fleet/jobs.py)
+@background_callback(
     Output("maint-export","data"),
     Input("btn-export","n_clicks"),
+    progress=Output("maint-export-progress","children"),
+    cancel=Input("btn-export-cancel","n_clicks"),
+    running=[
+        (Output("btn-export","disabled"), True, False),
+        (Output("btn-export-cancel","style"), {}, {"display":"none"}),
+        (Output("maint-export-progress","style"), {"color":"#777"}, {"display":"none"}),
+    ],
+    cache_args_to_ignore=[0],      # n_clicks: กดซ้ำโดยข้อมูลไม่เปลี่ยน -> ได้ผลเดิมจาก cache
     prevent_initial_call=True
 )
-def export_orders(n):
+def export_orders(set_progress, n):
+    set_progress("กำลังอ่านใบงาน…")
     df = fetch_orders_df().drop(columns=["has_pdf"])
+    # ปีงบฯ/ไตรมาสตามวันตรวจรับ (ใช้ปฏิทินเดียวกับ Dashboard)
+    fb = fiscal.bucket(df["accept_date"])
+    df["fiscal_year_th"] = fb["label_th"]
+    df["fiscal_quarter"] = np.where(fb["quarter"] > 0, fb["quarter"], None)
+    set_progress(f"กำลังเขียน Excel ({len(df):,} แถว)…")
     # ส่งออกเป็น Excel แทน CSV
     return dcc.send_data_frame(
         df.to_excel,
@@ -430,14 +435,22 @@ def clear_search(n, orders_full):
     return "", (orders_full or [])
     
 
-@callback(
+@background_callback(
     Output("maint-items-export", "data"),
     Input("btn-export-items", "n_clicks"),
     State("maint-items-store", "data"),
     State("maint-current-order-id", "data"),
+    progress=Output("maint-items-export-progress", "children"),
+    cancel=Input("btn-export-items-cancel", "n_clicks"),
+    running=[
+        (Output("btn-export-items", "disabled"), True, False),
+        (Output("btn-export-items-cancel", "style"), {}, {"display": "none"}),
+        (Output("maint-items-export-progress", "style"), {"color": "#777"}, {"display": "none"}),
+    ],
+    cache_args_to_ignore=[0],      # n_clicks
     prevent_initial_call=True
 )
-def export_items_excel(n, rows, order_id):
+def export_items_excel(set_progress, n, rows, order_id):
     if not n or rows is None:
         return dash.no_update
 
@@ -452,16 +465,10 @@ def export_items_excel(n, rows, order_id):
     sheet_name = "Items"
 
     if order_id:
-        with db_engine.begin() as conn:
-            row = conn.execute(text("""
-                SELECT c.plate
-                FROM maintenance_orders o
-                JOIN cars c ON c.id = o.car_id
-                WHERE o.id = :i
-            """), {"i": int(order_id)}).first()
-        plate = (row[0] if row else "").replace(" ", "_")
+        plate = (order_plate(order_id) or "").replace(" ", "_")
         filename = f"maint_{plate or 'order'}_{order_id}_items.xlsx"
 
+    set_progress(f"กำลังเขียน Excel ({len(df):,} รายการ)…")
     return dcc.send_data_frame(
         df.to_excel,
         filename,
@@ -487,9 +494,9 @@ def load_order(sel_rows, vdata):
     if not sel_rows: return no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update, no_update
     idx = sel_rows[0]
     order = vdata[idx]
-    header = q("SELECT * FROM maintenance_orders WHERE id=:i", {"i": order["id"]}).mappings().first()
+    header = get_order(order["id"])
     items_df = fetch_items_df(order["id"])
-    committee_ids = _fetch_committee_ids(order["id"])        # <<=== ใช้ id
+    committee_ids = fetch_committee_ids(order["id"])         # <<=== ใช้ id
     return (header["car_id"], header["repair_date"], header["accept_date"], header["center_name"],
             committee_ids, header["note"] or "",
             items_df.to_dict("records"), items_df.to_dict("records"), order["id"])
@@ -590,6 +597,9 @@ def save_order(n, order_id, car_id, repair_date, accept_date,
 
             _upsert_committee(conn, new_id,
                               [int(x) for x in (committee_ids or [])])
+    if order_id:
+        ORDERS.touch(int(order_id))          # แก้ใบงานเดิม -> snapshot อ่านแถวนี้ซ้ำ
+    bump("maintenance_orders", "maintenance_items")
 
     orders = fetch_orders_df()
     return orders.to_dict("records"), orders.to_dict("records"), "บันทึกเรียบร้อย"
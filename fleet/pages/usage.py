@@ -4,29 +4,28 @@ from dash import html, dcc, dash_table, Input, Output, State, callback, ctx, no_
 import pandas as pd
 from datetime import datetime, timedelta
 from sqlalchemy import text
-from fleet.db import SessionLocal, engine
-from fleet.models import UsageLog, Car, User
-from fleet.db import engine as db_engine 
+from fleet.db import engine as db_engine
+from fleet.queries import fetch_usage, USAGE_COLUMNS, OPEN_STATUSES
+from fleet.cache import bump, versioned
+from fleet.fiscal import now_local
+from fleet import typeahead
+from fleet.usage_service import (
+    UsageError, AlreadyReturned, checkout, return_usage,
+    delete_usage as _delete_usage, ensure_car_available,
+)
 
 
 dash.register_page(__name__, path="/usage", name="Usage")
 
 # ---------- helpers ----------
 def _car_options_only_normal():
-    sql = text("""
-        SELECT id, plate
-        FROM cars
-        WHERE COALESCE(car_condition,'ปกติ') = 'ปกติ'
-        ORDER BY plate
-    """)
-    with db_engine.begin() as conn:
-        rows = conn.execute(sql).fetchall()
-    return [{"label": r[1], "value": r[0]} for r in rows]
+    # top-N เท่านั้น ; ที่เหลือค้นผ่าน search_value (fleet/typeahead.py)
+    return typeahead.options("cars_normal")
 
 
 # ---------- schema guard: add returned_at if missing ----------
 def ensure_returned_at_column():
-    with engine.connect() as conn:
+    with db_engine.connect() as conn:
         cols = [row[1] for row in conn.execute(text("PRAGMA table_info(usage_logs)")).fetchall()]
         if "returned_at" not in cols:
             conn.execute(text("ALTER TABLE usage_logs ADD COLUMN returned_at DATETIME"))
@@ -35,14 +34,14 @@ def ensure_returned_at_column():
 
 #เพิ่มคอลัมน์ is_maintenance
 def ensure_is_maintenance_column():
-    with engine.connect() as conn:
+    with db_engine.connect() as conn:
         cols = [r[1] for r in conn.execute(text("PRAGMA table_info(usage_logs)")).fetchall()]
         if "is_maintenance" not in cols:
             conn.execute(text("ALTER TABLE usage_logs ADD COLUMN is_maintenance INTEGER DEFAULT 0"))
             conn.commit()
             
 def ensure_planned_end_column():
-    with engine.connect() as conn:
+    with db_engine.connect() as conn:
         cols = [r[1] for r in conn.execute(text("PRAGMA table_info(usage_logs)")).fetchall()]
         if "planned_end_time" not in cols:
             conn.execute(text("ALTER TABLE usage_logs ADD COLUMN planned_end_time DATETIME"))
@@ -60,30 +59,16 @@ def reconcile_all_cars():
               ELSE 'available'
             END
         """))
-    
+    bump("cars")
+
 def open_usage_options():
-    df = load_usage_df()
-    if df.empty:
-        return []
-    df = df[df["status"].isin(["in_use", "overdue","maintenance"])]
-    opts = []
-    for _, r in df.iterrows():
-        label = f'#{r["id"]} | {r["plate"]} | {r["borrower"]} | เริ่ม {r["start_time"]}'
-        opts.append({"label": label, "value": int(r["id"])})
-    return opts
+    return typeahead.options("usage_open")
 
 def load_car_options(only_available=True):
-    with SessionLocal() as s:
-        q = s.query(Car)
-        if only_available:
-            q = q.filter(Car.status == "available")
-        cars = q.order_by(Car.plate.asc()).all()
-        return [{"label": f"{c.plate} ({(c.brand or '')} {(c.model or '')})".strip(), "value": c.id} for c in cars]
+    return typeahead.options("cars_available" if only_available else "cars")
 
 def load_user_options():
-    with SessionLocal() as s:
-        users = s.query(User).order_by(User.full_name.asc()).all()
-        return [{"label": u.full_name, "value": u.id} for u in users]
+    return typeahead.options("users")
 
 def to_iso_from_date_hh_mm(date_str: str | None, hh: str | None, mm: str | None) -> str | None:
     if not date_str or hh is None or mm is None:
@@ -96,10 +81,14 @@ def _hh_options():
 def _mm_options(step=5):
     return [{"label": f"{m:02d}", "value": f"{m:02d}"} for m in range(0, 60, step)]
 
-def _filter_status(df: pd.DataFrame, status_value: str) -> pd.DataFrame:
-    if df.empty or status_value == "all":
-        return df
-    return df[df["status"] == status_value].reset_index(drop=True)
+def _table_rows(status_value, open_only_values, range_start=None, range_end=None) -> list[dict]:
+    """แถวของตาราง: ไม่มีตัวกรอง -> snapshot ที่ cache ไว้ ; มีตัวกรอง -> กรองใน SQL (ใช้ index)"""
+    open_only = "open" in (open_only_values or [])
+    status = status_value if status_value and status_value != "all" else None
+    start, end = _range_bounds(range_start, range_end)
+    if not (open_only or status or start or end):
+        return usage_snapshot()["df"].to_dict("records")
+    return load_usage_df(open_only=open_only, status=status, start=start, end=end).to_dict("records")
 
 def create_usage(
     car_id: int,
@@ -125,32 +114,11 @@ def create_usage(
             return "❌ รูปแบบวันเวลากำหนดคืนไม่ถูกต้อง"
         if planned_end_dt < start_dt:
             return "❌ กำหนดวันคืนต้องไม่ก่อนเวลาเริ่ม"
-    with SessionLocal() as s:
-        car = s.get(Car, car_id)
-        user = s.get(User, borrower_id)
-        if not car or not user:
-            return "❌ ไม่พบรถหรือผู้ใช้"
-        # กันทับซ้อน
-        if car.status in ("in_use", "maintenance"):
-            return f"❌ รถ {car.plate} อยู่ในสถานะ {car.status} อยู่แล้ว"
-        # สร้าง usage
-        usg = UsageLog(
-            car_id=car.id,
-            borrower_id=user.id,
-            start_time=start_dt,
-            planned_end_time=planned_end_dt,     # <— ถ้ามีคอลัมน์นี้
-            purpose=(purpose or "").strip() or None,
-            is_maintenance=bool(is_maint),       # <— ถ้ามีคอลัมน์นี้
-        )
-        s.add(usg)
-        # อัปเดตสถานะรถ
-        car.status = "maintenance" if is_maint else "in_use"
-        try:
-            s.commit()
-        except IntegrityError as e:
-            s.rollback()
-            return f"❌ บันทึกไม่สำเร็จ: {e.orig}"
-        return f"✅ บันทึกการเบิก #{usg.id} สำเร็จ ({'maintenance' if is_maint else 'in_use'})"
+    try:
+        usage_id = checkout(car_id, borrower_id, start_dt, planned_end_dt, purpose, is_maint)
+    except UsageError as e:
+        return f"❌ {e}"
+    return f"✅ บันทึกการเบิก #{usage_id} สำเร็จ ({'maintenance' if is_maint else 'in_use'})"
 
 
 #คืนรถ
@@ -160,34 +128,20 @@ def return_car_at(usage_id: int, end_iso: str | None) -> str:
     """
     # ถ้าไม่ระบุเวลา ให้ใช้เวลาปัจจุบัน
     if not end_iso:
-        end_dt = datetime.now()
+        end_dt = now_local()
     else:
         try:
             end_dt = datetime.fromisoformat(end_iso)
         except Exception:
             return "❌ รูปแบบวันเวลา 'คืนรถ' ไม่ถูกต้อง"
 
-    with SessionLocal() as s:  # type: Session
-        usg = s.get(UsageLog, usage_id)
-        if not usg:
-            return f"❌ ไม่พบรายการการใช้ #{usage_id}"
-
-        if usg.returned_at:
-            return f"ℹ️ รายการ #{usage_id} คืนรถแล้วก่อนหน้า"
-
-        # ป้องกันกรณีคืนก่อนเวลาเริ่ม
-        if end_dt < usg.start_time:
-            return "❌ เวลาคืนรถต้องไม่ก่อนเวลาเริ่มใช้"
-
-        # ตั้งเวลาคืนจริง และสถานะรถกลับเป็น available
-        usg.returned_at = end_dt
-
-        car = s.get(Car, usg.car_id)
-        if car:
-            car.status = "available"
-
-        s.commit()
-        return f"✅ คืนรถเรียบร้อย (#{usage_id})"
+    try:
+        return_usage(usage_id, end_dt)
+    except AlreadyReturned as e:
+        return f"ℹ️ {e}"
+    except UsageError as e:
+        return f"❌ {e}"
+    return f"✅ คืนรถเรียบร้อย (#{usage_id})"
 
 def _compose_iso(date_str, hh, mm):
     if not date_str:
@@ -196,49 +150,14 @@ def _compose_iso(date_str, hh, mm):
     mm = mm or "00"
     return f"{date_str}T{hh}:{mm}:00"
 
-def load_usage_df() -> pd.DataFrame:
+def load_usage_df(**filters) -> pd.DataFrame:
+    """filters ส่งต่อให้ fetch_usage (open_only, status, start, end)"""
     ensure_returned_at_column()
     ensure_is_maintenance_column()
     ensure_planned_end_column()
-    with SessionLocal() as s:
-        q = (
-            s.query(
-                UsageLog.id.label("id"),
-                Car.plate.label("plate"),
-                User.full_name.label("borrower"),
-                UsageLog.start_time,
-                #UsageLog.end_time,
-                UsageLog.planned_end_time,
-                UsageLog.returned_at,
-                UsageLog.is_maintenance,
-                UsageLog.purpose,
-            )
-            .join(Car, Car.id == UsageLog.car_id)
-            .join(User, User.id == UsageLog.borrower_id)
-            .order_by(UsageLog.id.desc())
-        )
-        df = pd.read_sql(q.statement, s.bind)
-    df = df.rename(columns={"planned_end_time": "planned_return"})
-
-
-    # สถานะ
-    now = pd.Timestamp.now()
-    def _status(r):
-        if pd.notna(r["returned_at"]) and r["returned_at"] != "":
-            return "returned"
-        if r.get("is_maintenance"):
-            return "maintenance"
-        if pd.notna(r.get("planned_return")) and pd.Timestamp(r["planned_return"]) < now:
-            return "overdue"
-        return "in_use"
-    df["status"] = df.apply(_status, axis=1)
- 
-# format datetime
-    # for col in ["start_time", "planned_return", "returned_at"]:
-    #     if col in df.columns:
-    #         df[col] = pd.to_datetime(df[col]).dt.strftime("%Y-%m-%d %H:%M").fillna("")
-     
-    # return df
+    rows = fetch_usage(**filters)
+    df = pd.DataFrame(rows) if rows else pd.DataFrame(columns=USAGE_COLUMNS)
+    # สถานะ (returned / maintenance / overdue / in_use) คำนวณใน SQL แล้ว -> ใช้ร่วมกับ API
 
     for col in ["start_time", "planned_return", "returned_at"]:
         if col in df.columns:
@@ -246,67 +165,66 @@ def load_usage_df() -> pd.DataFrame:
             df[col] = s.dt.strftime("%Y-%m-%d %H:%M").fillna("")
     return df
     
-#ฟังก์ชั่นลบ  
-def all_usage_options():
-    df = load_usage_df()
+def _options(df: pd.DataFrame, with_status: bool) -> list[dict]:
+    """สร้าง label ของ dropdown ทั้งคอลัมน์ทีเดียว (ไม่วน iterrows)"""
     if df.empty:
         return []
-    opts = []
-    for _, r in df.iterrows():
-        label = f'#{r["id"]} | {r["plate"]} | {r["borrower"]} | {r["status"]} | เริ่ม {r["start_time"]}'
-        opts.append({"label": label, "value": int(r["id"])})
-    return opts
+    label = ("#" + df["id"].astype(str)
+             + " | " + df["plate"].fillna("").astype(str)
+             + " | " + df["borrower"].fillna("").astype(str))
+    if with_status:
+        label = label + " | " + df["status"].astype(str)
+    label = label + " | เริ่ม " + df["start_time"].astype(str)
+    return [{"label": l, "value": v} for l, v in zip(label.tolist(), df["id"].astype(int).tolist())]
+
+def _minute():
+    # สถานะ overdue ขึ้นกับเวลาปัจจุบัน -> snapshot มีอายุไม่เกิน 1 นาที
+    return now_local().strftime("%Y-%m-%d %H:%M")
+
+@versioned("usage_logs", "cars", "users", key=_minute, shared=True)
+def usage_snapshot() -> dict:
+    """อ่าน usage ครั้งเดียวแล้วใช้ร่วมกัน: ตาราง, dropdown คืนรถ, dropdown ลบ
+
+    คำนวณใหม่เมื่อมีการเขียน usage_logs/cars/users (cache.bump) หรือขึ้นนาทีใหม่
+    """
+    df = load_usage_df()
+    return {
+        "df": df,
+        "open_options": _options(df[df["status"].isin(OPEN_STATUSES)], with_status=False),
+        "all_options": _options(df, with_status=True),
+    }
+
+def _snapshot_pairs(key: str):
+    return lambda: ((o["value"], o["label"]) for o in usage_snapshot()[key])
+
+_USAGE_TABLES = ("usage_logs", "cars", "users")
+typeahead.register("usage_open", typeahead.Provider(_snapshot_pairs("open_options"), _USAGE_TABLES, key=_minute))
+typeahead.register("usage_all", typeahead.Provider(_snapshot_pairs("all_options"), _USAGE_TABLES, key=_minute))
+
+#ฟังก์ชั่นลบ  
+def all_usage_options():
+    return typeahead.options("usage_all")
 def delete_usage(usage_id: int) -> str:
-    with SessionLocal() as s:
-        u = s.query(UsageLog).get(usage_id)
-        if not u:
-            return "❌ ไม่พบรายการที่จะลบ"
-        # ถ้ายังไม่คืน ให้ปล่อยรถกลับ available
-        if u.returned_at is None and u.car:
-            u.car.status = "available"
-        s.delete(u)
-        s.commit()
+    try:
+        _delete_usage(usage_id)
+    except UsageError as e:
+        return f"❌ {e}"
     return "🗑️ ลบรายการแล้ว"
 
 
 #ฟังก์ชันช่วยกรองช่วงวัน
-def _as_dt(date_str: str | None, end_of_day=False):
-    if not date_str:
-        return None
-    dt = datetime.fromisoformat(date_str)
-    return dt.replace(hour=23, minute=59, second=59) if end_of_day else dt.replace(hour=0, minute=0, second=0)
-
-def filter_by_range(df, range_start: str | None, range_end: str | None):
-    """เก็บรายการที่ช่วง [start_time, planned_return] ซ้อนทับช่วงที่เลือก
-       ถ้า planned_return ว่าง → ใช้ start_time เป็นปลายช่วงเดียวกัน"""
-    if df.empty or (not range_start and not range_end):
-        return df
-    rs = _as_dt(range_start) or datetime.min
-    re = _as_dt(range_end, end_of_day=True) or datetime.max
-
-    st = pd.to_datetime(df["start_time"])
-    pe = pd.to_datetime(df["planned_return"]).fillna(st)
-    mask = (pe >= rs) & (st <= re)
-    return df[mask].reset_index(drop=True)
-
-def ensure_car_available(conn, car_id: int):
-    row = conn.execute(text("""
-        SELECT 1
-        FROM usage_logs
-        WHERE car_id = :cid AND returned_at IS NULL
-        LIMIT 1
-    """), {"cid": int(car_id)}).first()
-    if row:
-        # ถ้าคันนี้ยังมีรายการค้างอยู่ ให้ยกเลิกการบันทึก
-        raise ValueError("รถคันนี้ยังไม่ถูกคืนจากรายการเดิม")
-
+def _range_bounds(range_start: str | None, range_end: str | None):
+    """วันที่จาก DatePickerRange -> (start, end) แบบ datetime ; end = 00:00 ของวันถัดไป (ไม่รวม)"""
+    start = datetime.fromisoformat(range_start[:10]) if range_start else None
+    end = datetime.fromisoformat(range_end[:10]) + timedelta(days=1) if range_end else None
+    return start, end
 
 # ---------- layout ----------
 def layout():
     ensure_returned_at_column()
     ensure_is_maintenance_column()
     ensure_planned_end_column()
-    full_df = load_usage_df()
+    full_df = usage_snapshot()["df"]
 
     return html.Div([
         html.H2("Usage Logs"),
@@ -397,7 +315,7 @@ def layout():
     
             html.Span(" | ", style={"margin": "0 8px"}),
 
-            dcc.Dropdown(id="del-usage", options=[], placeholder="เลือกรายการเพื่อ 'ลบ'",
+            dcc.Dropdown(id="del-usage", options=all_usage_options(), placeholder="เลือกรายการเพื่อ 'ลบ' (พิมพ์ค้นหา)",
                  style={"width": 420, "display": "inline-block"}),
 
             dcc.Dropdown(id="ret-usage", options=open_usage_options(),
@@ -454,6 +372,10 @@ def layout():
     ])
 
 #---------- callbacks ----------
+typeahead.attach("usg-car", "cars_normal")
+typeahead.attach("usg-user", "users")
+typeahead.attach("ret-usage", "usage_open")
+typeahead.attach("del-usage", "usage_all")
 
 
 @callback(
@@ -484,16 +406,9 @@ def on_delete(n, usage_id, status_value, open_only_values, range_start, range_en
 
     msg = delete_usage(usage_id)
 
-    # รีโหลดตาราง + options ที่เกี่ยวข้อง
-    df_full = load_usage_df()
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue", "maintenance"])]
-    if status_value and status_value != "all":
-        df_full = df_full[df_full["status"] == status_value]
-    df_full = filter_by_range(df_full, range_start, range_end)
-
+    # รีโหลดตาราง + options ที่เกี่ยวข้อง (อ่าน usage ครั้งเดียวผ่าน snapshot)
     return (msg,
-            df_full.to_dict("records"),
+            _table_rows(status_value, open_only_values, range_start, range_end),
             load_car_options(True),
             open_usage_options(),
             all_usage_options(),
@@ -561,7 +476,7 @@ def on_create_usage(n_clicks,
     try:
         with db_engine.begin() as conn:
             ensure_car_available(conn, int(car_id))
-    except ValueError as e:
+    except UsageError as e:
         # รถยังไม่ถูกคืนจากรายการเดิม
         return (str(e), no_update, _car_options_only_normal(),
                 open_usage_options(), all_usage_options(), None)
@@ -569,17 +484,10 @@ def on_create_usage(n_clicks,
     # === สร้าง usage ===
     msg = create_usage(car_id, user_id, start_iso, end_iso, purpose, is_maint)
 
-    # === Reload ตาราง + dropdowns หลังบันทึก ===
-    df_full = load_usage_df()
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue", "maintenance"])]
-    if status_value and status_value != "all":
-        df_full = df_full[df_full["status"] == status_value]
-    df_full = filter_by_range(df_full, range_start, range_end)
-
+    # === Reload ตาราง + dropdowns หลังบันทึก (snapshot เดียว) ===
     return (
         msg,
-        df_full.to_dict("records"),
+        _table_rows(status_value, open_only_values, range_start, range_end),
         _car_options_only_normal(),
         open_usage_options(),
         all_usage_options(),
@@ -603,11 +511,7 @@ def reload_available_cars(_):
     prevent_initial_call=True
 )
 def on_filter(status_value, open_only_values):
-    df_full = load_usage_df()
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue","maintenance"])]
-    df = _filter_status(df_full, status_value)
-    return df.to_dict("records")
+    return _table_rows(status_value, open_only_values)
 
 # ตั้งค่า default วันเวลาคืน เมื่อเลือก usage ที่ยังไม่คืน
 @callback(
@@ -620,7 +524,7 @@ def on_filter(status_value, open_only_values):
 def on_pick_usage_for_return(usage_id):
     if not usage_id:
         raise dash.exceptions.PreventUpdate
-    now = datetime.now()
+    now = now_local()
     return now.strftime("%Y-%m-%d"), f"{now.hour:02d}", f"{(now.minute // 5) * 5:02d}"
 
 # คืนรถ (ตั้ง returned_at; ไม่แตะ end_time)
@@ -652,15 +556,11 @@ def on_return(n, usage_id, date_str, hh, mm, status_value, open_only_values):
     end_iso = to_iso_from_date_hh_mm(date_str, hh, mm)
     msg = return_car_at(usage_id, end_iso)
 
-    df_full = load_usage_df()
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue","maintenance"])]
-    df = _filter_status(df_full, status_value)
     car_opts = load_car_options(True)
-    ret_opts = open_usage_options()
 
     # เคลียร์คอนโทรลคืนรถ
-    return (msg, df.to_dict("records"), car_opts, ret_opts, None, None, None, None)
+    return (msg, _table_rows(status_value, open_only_values), car_opts,
+            open_usage_options(), None, None, None, None)
 
 #Callback “ค้นหา”
 @callback(
@@ -680,19 +580,8 @@ def on_search(n, status_value, open_only_values, start_date, end_date):
     if start_date and not end_date:
         end_date = start_date
 
-    df_full = load_usage_df()
-
-    # open only → เหลือ in_use + overdue
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue","maintenance"])]
-
-    # status filter
-    if status_value and status_value != "all":
-        df_full = df_full[df_full["status"] == status_value]
-
-    # date-range filter
-    df_full = filter_by_range(df_full, start_date, end_date)
-    return df_full.to_dict("records")
+    # open only / status / date-range
+    return _table_rows(status_value, open_only_values, start_date, end_date)
 
 
 #“รีเซ็ตช่วงวัน” (ให้ล้างค่า + แสดงทั้งตาราง)  
@@ -708,10 +597,5 @@ def on_search(n, status_value, open_only_values, start_date, end_date):
 def reset_range(n, status_value, open_only_values):
     if not n:
         raise dash.exceptions.PreventUpdate
-    df_full = load_usage_df()
-    if "open" in (open_only_values or []):
-        df_full = df_full[df_full["status"].isin(["in_use", "overdue","maintenance"])]
-    if status_value and status_value != "all":
-        df_full = df_full[df_full["status"] == status_value]
-    return None, None, df_full.to_dict("records")
+    return None, None, _table_rows(status_value, open_only_values)
 
@@ -4,6 +4,8 @@ import dash
 import pandas as pd
 from sqlalchemy import text
 from fleet.db import engine, SessionLocal, init_users_table
+from fleet.queries import fetch_users, USER_COLUMNS
+from fleet.cache import bump
 
 
 dash.register_page(__name__, path="/users", name="Users")
@@ -22,9 +24,8 @@ ORG_OPTIONS = [
 ]
 
 def fetch_users_df():
-    with engine.begin() as conn:
-        rows = conn.execute(text("SELECT id, full_name, position, org FROM users ORDER BY id ASC")).mappings().all()
-        return pd.DataFrame(rows) if rows else pd.DataFrame(columns=["id","full_name","position","org"])
+    rows = fetch_users()
+    return pd.DataFrame(rows) if rows else pd.DataFrame(columns=USER_COLUMNS)
 
 layout = html.Div(
     [
@@ -126,6 +127,7 @@ def add_user(n, full_name, position, org):
             text("INSERT INTO users (full_name, position, org) VALUES (:fn, :pos, :org)"),
             {"fn": full_name.strip(), "pos": (position or "").strip(), "org": org or ""}
         )
+    bump("users")
 
     df = fetch_users_df()
     return df.to_dict("records"), df.to_dict("records"), ""
@@ -171,6 +173,7 @@ def persist_changes(new_rows, old_rows):
                          "org": n.get("org") or "",
                          "id": int(_id)}
                     )
+    bump("users")
 
     # รีโหลดจาก DB ให้แน่ใจว่า data ตรง
     df = fetch_users_df()
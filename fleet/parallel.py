@@ -0,0 +1,79 @@
+# fleet/parallel.py
+"""รัน query ที่ไม่ขึ้นต่อกันพร้อมกัน แล้วรวมผล + เวลาแยกต่อ query
+
+    res = gather(donut=donut_figure, kpis=usage_kpis, borrow=(top_borrow_figure, fy))
+    res["donut"], res.timings, res.wall        # timings/wall หน่วย ms
+
+- thread pool ขนาด FLEET_QUERY_THREADS (ค่าเริ่มต้น 4) ; แต่ละงานยืม connection ของตัวเองจาก engine pool
+- SQLite โหมด WAL (db.enable_wal): ผู้อ่านไม่บล็อกกันเอง -> เวลารวม ≈ query ที่ช้าที่สุด แทนผลบวก
+- รอทุกงานเสร็จก่อนเสมอ ; มีงาน error -> raise ตัวแรก (ตามลำดับที่ส่งมา)
+- เรียก gather จากในงานของ pool เอง -> รันเรียงในเธรดนั้น (กัน pool ตัน)
+"""
+from __future__ import annotations
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+THREADS = int(os.getenv("FLEET_QUERY_THREADS", "4"))
+HISTORY = 200                   # เวลาล่าสุดที่เก็บไว้ต่อชื่อ query (stats())
+
+_pool = ThreadPoolExecutor(max_workers=THREADS, thread_name_prefix="fleet-q")
+_local = threading.local()
+_lock = threading.Lock()
+_history: dict[str, deque] = {}
+
+
+class Results(dict):
+    """ผลต่อชื่องาน + timings {ชื่อ: ms} + wall (ms ทั้งชุด)"""
+    timings: dict[str, float]
+    wall: float
+
+
+def _timed(fn, args):
+    _local.inside = True
+    t0 = time.perf_counter()
+    try:
+        return fn(*args), (time.perf_counter() - t0) * 1000
+    finally:
+        _local.inside = False
+
+def _inline(fn, args):
+    t0 = time.perf_counter()
+    return fn(*args), (time.perf_counter() - t0) * 1000
+
+def _record(timings: dict[str, float]):
+    with _lock:
+        for name, ms in timings.items():
+            _history.setdefault(name, deque(maxlen=HISTORY)).append(ms)
+
+
+def gather(**tasks) -> Results:
+    """tasks: ชื่อ=callable หรือ ชื่อ=(callable, *args)"""
+    calls = {name: (t[0], t[1:]) if isinstance(t, tuple) else (t, ()) for name, t in tasks.items()}
+    t0 = time.perf_counter()
+    if getattr(_local, "inside", False) or len(calls) < 2:
+        done = {}
+        for name, (fn, args) in calls.items():
+            done[name] = _inline(fn, args)
+    else:
+        futures = {name: _pool.submit(_timed, fn, args) for name, (fn, args) in calls.items()}
+        errors = [f.exception() for f in futures.values()]            # รอครบทุกงาน
+        first = next((e for e in errors if e is not None), None)
+        if first is not None:
+            raise first
+        done = {name: f.result() for name, f in futures.items()}
+
+    out = Results({name: value for name, (value, _) in done.items()})
+    out.timings = {name: round(ms, 2) for name, (_, ms) in done.items()}
+    out.wall = round((time.perf_counter() - t0) * 1000, 2)
+    _record(out.timings)
+    return out
+
+def stats() -> dict[str, dict]:
+    """สรุปเวลาของแต่ละ query จากครั้งล่าสุด HISTORY ครั้ง (ms)"""
+    with _lock:
+        snap = {name: (sorted(h), h[-1]) for name, h in _history.items() if h}
+    return {name: {"n": len(v), "p50": v[len(v) // 2], "max": v[-1], "last": last}
+            for name, (v, last) in snap.items()}
@@ -0,0 +1,279 @@
+# fleet/plancheck.py
+"""ตรวจแผน query (EXPLAIN QUERY PLAN) ของตัวอ่านที่หน้าเว็บ/API ใช้บ่อย บนฐานข้อมูลจำลองขนาดใหญ่
+
+    python -m fleet.plancheck                     # สร้าง DB จำลอง (ครั้งแรก) -> ตรวจ -> exit 1 ถ้าไม่ผ่าน
+    python -m fleet.plancheck --rebuild           # สร้าง DB จำลองใหม่
+    python -m fleet.plancheck --json plans.json   # บันทึกแผน + เวลา ไว้เทียบรอบถัดไป
+    python -m fleet.plancheck cars.list usage.open   # ตรวจเฉพาะบาง case
+
+- รันตัวอ่านจริงใน fleet.queries (ชุดเดียวกับที่ fleet/pages และ fleet/api เรียก ; ตัวอ่านใหม่ของหน้าเว็บ
+  ควรย้ายมาไว้ใน queries แล้วเพิ่ม case ที่นี่ ไม่อย่างนั้นจะไม่ถูกตรวจ) แล้วเก็บทุก SQL
+  ที่ตัวอ่านส่งไปยัง DB (event before_cursor_execute) -> EXPLAIN QUERY PLAN ด้วย parameter เดิม
+- ไม่ผ่านเมื่อแผนมี SCAN (อ่านทั้งตาราง/ทั้ง index) หรือ AUTOMATIC INDEX บนตารางใน HOT_TABLES
+  ยกเว้นที่ระบุไว้ใน allow ของ case นั้น (เช่น รายการทั้งหมดที่หน้าเว็บต้องอ่านทุกแถวอยู่แล้ว)
+- schema มาจาก db.init_db ตัวจริง -> index ที่หายไป/query ที่เลิกใช้ index ทำให้ตรวจไม่ผ่าน
+- DB จำลองอยู่ที่ FLEET_PLANCHECK_DB (ค่าเริ่มต้น <tmp>/fleet-plancheck.db) ไม่แตะฐานข้อมูลจริง ;
+  FLEET_PLANCHECK_SCALE ย่อขนาดข้อมูล (tests/test_query_plans.py ใช้ 0.01)
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+if "fleet.db" in sys.modules:
+    raise RuntimeError("fleet.plancheck ต้องรันเป็น process แยก (python -m fleet.plancheck)")
+DB_FILE = Path(os.getenv("FLEET_PLANCHECK_DB", Path(tempfile.gettempdir()) / "fleet-plancheck.db"))
+os.environ["FLEET_DB_URL"] = f"sqlite:///{DB_FILE.as_posix()}"
+
+from sqlalchemy import event, text  # noqa: E402
+
+from fleet import queries  # noqa: E402
+from fleet.db import engine, init_db  # noqa: E402
+from fleet.fiscal import fiscal_year, fy_bounds  # noqa: E402
+
+engine.echo = False
+
+# ตารางที่โตตามเวลา -> ห้าม SCAN
+HOT_TABLES = ("usage_logs", "maintenance_orders", "maintenance_items", "maintenance_committee",
+              "car_calendar", "usage_daily", "maint_monthly", "attachments")
+
+# ขนาดข้อมูลจำลอง (ประมาณหน่วยงานใหญ่ที่ใช้งานหลายปี)
+SCALE = {"cars": 2_000, "users": 5_000, "usage_logs": 300_000, "open_usage": 1_500,
+         "maintenance_orders": 50_000, "items_per_order": 3, "committee_per_order": 2,
+         "car_calendar": 40_000}
+# FLEET_PLANCHECK_SCALE=0.01 -> ย่อข้อมูลจำลอง (tests) ; ไม่ได้ ANALYZE แผนจึงไม่ขึ้นกับจำนวนแถว
+_FACTOR = float(os.getenv("FLEET_PLANCHECK_SCALE", "1"))
+SCALE = {k: v if k.endswith("_per_order") else max(10, int(v * _FACTOR)) for k, v in SCALE.items()}
+DAYS = 365 * 6
+
+
+# ---------- ข้อมูลจำลอง ----------
+def _generate():
+    n = SCALE
+    now = datetime.now()
+    base = (now - timedelta(days=DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    p = {**n, "base": base, "days": DAYS, "now": queries.sql_now(now)}
+    with engine.begin() as conn:
+        def run(sql):
+            conn.execute(text(sql), p)
+        run("""
+            INSERT INTO cars (plate, status, brand, model, car_condition)
+            WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :cars)
+            SELECT 'PC ' || i, 'available', 'Toyota', 'Hilux', 'ปกติ' FROM s
+        """)
+        run("""
+            INSERT INTO users (full_name, position, org)
+            WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :users)
+            SELECT 'ผู้ใช้ ' || i, 'พนักงาน', 'สสป ที่ ' || (1 + i % 4) FROM s
+        """)
+        # ประวัติที่คืนแล้ว เรียงตามเวลา + รายการที่ยังไม่คืนช่วงท้าย
+        run("""
+            INSERT INTO usage_logs (car_id, borrower_id, start_time, end_time, planned_end_time,
+                                    returned_at, purpose, is_maintenance)
+            WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :usage_logs),
+            t AS (SELECT i, datetime(:base, '+' || (i * :days * 1440 / :usage_logs) || ' minutes') AS st FROM s)
+            SELECT 1 + i % :cars, 1 + (i * 7) % :users, st,
+                   datetime(st, '+4 hours'), datetime(st, '+4 hours'),
+                   CASE WHEN i > :usage_logs - :open_usage THEN NULL ELSE datetime(st, '+3 hours') END,
+                   'ราชการ', CASE WHEN i % 50 = 0 THEN 1 ELSE 0 END
+            FROM t
+        """)
+        run("""
+            INSERT INTO maintenance_orders (car_id, repair_date, accept_date, center_name,
+                                            total_qty, subtotal, vat, grand_total)
+            WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :maintenance_orders)
+            SELECT 1 + i % :cars,
+                   date(:base, '+' || (i * :days / :maintenance_orders) || ' days'),
+                   CASE WHEN i % 20 = 0 THEN NULL
+                        ELSE date(:base, '+' || (i * :days / :maintenance_orders + 3) || ' days') END,
+                   'ศูนย์ ' || (i % 30), 3, 3000, 210, 3210
+            FROM s
+        """)
+        run("""
+            INSERT INTO maintenance_items (order_id, item_no, description, qty, unit_price, amount)
+            WITH RECURSIVE k(j) AS (SELECT 1 UNION ALL SELECT j + 1 FROM k WHERE j < :items_per_order)
+            SELECT o.id, k.j, 'รายการ ' || k.j, 1, 1000, 1000 FROM maintenance_orders o, k
+        """)
+        run("""
+            INSERT OR IGNORE INTO maintenance_committee (order_id, user_id)
+            WITH RECURSIVE k(j) AS (SELECT 1 UNION ALL SELECT j + 1 FROM k WHERE j < :committee_per_order)
+            SELECT o.id, 1 + (o.id * 13 + k.j * 101) % :users FROM maintenance_orders o, k
+        """)
+        run("""
+            INSERT INTO car_calendar (car_id, start_date, end_date, user_name)
+            WITH RECURSIVE s(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM s WHERE i < :car_calendar),
+            t AS (SELECT i, date(:base, '+' || (i * (:days + 180) / :car_calendar) || ' days') AS d FROM s)
+            SELECT 1 + i % :cars, d, date(d, '+' || (i % 4) || ' days'), 'ผู้ใช้ ' || (1 + i % :users) FROM t
+        """)
+
+
+def _prepare(rebuild: bool):
+    if rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{DB_FILE}{suffix}").unlink(missing_ok=True)
+    fresh = not DB_FILE.exists()
+    init_db()                                   # schema/index ตามโค้ดปัจจุบันเสมอ (idempotent)
+    if fresh:
+        t0 = time.perf_counter()
+        _generate()
+        print(f"สร้าง DB จำลอง {DB_FILE} ({time.perf_counter() - t0:.1f} s)")
+
+
+# ---------- ตัวอ่านที่ตรวจ ----------
+def cases() -> dict[str, dict]:
+    """ชื่อ -> {"call": callable, "allow": ตารางที่ยอมให้ SCAN (พร้อมเหตุผลในคอมเมนต์)}
+
+    allow เป็น tuple -> ทุก statement ของ case ; dict {ตาราง: regex} -> เฉพาะ statement ที่ตรง regex
+    """
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    m_start = today.replace(day=1)
+    m_end = (m_start + timedelta(days=32)).replace(day=1)
+    fy_start, fy_end = fy_bounds(fiscal_year(now))
+    cal_start = date.today().replace(day=1)
+    mid_usage = SCALE["usage_logs"] // 2
+    mid_order = SCALE["maintenance_orders"] // 2
+    return {
+        "cars.list":        {"call": lambda: queries.fetch_cars()},
+        "cars.page":        {"call": lambda: queries.fetch_cars(after_id=1000, limit=50)},
+        "cars.get":         {"call": lambda: queries.get_car(42)},
+        "users.page":       {"call": lambda: queries.fetch_users(after_id=1000, limit=50)},
+        # keyset ตาม rowid จากท้ายตาราง หยุดที่ LIMIT (ไม่ได้อ่านทั้งตาราง) ; orders.page ก็เช่นกัน
+        # ยอมเฉพาะ statement หน้าแรก (ORDER BY u.id DESC LIMIT) ; หน้าถัดไปต้อง SEARCH rowid<? ไม่ต้อง allow
+        "usage.page":       {"call": lambda: queries.fetch_usage(limit=200),
+                             "allow": {"usage_logs": r"ORDER BY u\.id DESC\s+LIMIT \?"}},
+        "usage.page.before": {"call": lambda: queries.fetch_usage(before_id=mid_usage, limit=200)},
+        "usage.open":       {"call": lambda: queries.fetch_usage(open_only=True)},
+        "usage.overdue":    {"call": lambda: queries.fetch_usage(status="overdue", now=now)},
+        "usage.range":      {"call": lambda: queries.fetch_usage(start=m_start, end=m_end)},
+        "usage.get":        {"call": lambda: queries.get_usage(mid_usage)},
+        "calendar.range":   {"call": lambda: queries.fetch_calendar(cal_start, cal_start + timedelta(days=92))},
+        "calendar.page":    {"call": lambda: queries.fetch_calendar(cal_start, cal_start + timedelta(days=92),
+                                                                     limit=50)},
+        # หน้า Maintenance แสดงทุกใบงาน -> อ่านทั้งตารางใบงานเป็นเรื่องปกติ (แต่กรรมการต้องค้นด้วย index)
+        "orders.list":      {"call": lambda: queries.fetch_orders(), "allow": ("maintenance_orders",)},
+        "orders.page":      {"call": lambda: queries.fetch_orders(limit=50), "allow": ("maintenance_orders",)},
+        "orders.items":     {"call": lambda: queries.fetch_order_items(mid_order)},
+        "orders.get":       {"call": lambda: queries.get_order(mid_order)},
+        "orders.committee": {"call": lambda: queries.fetch_committee_ids(mid_order)},
+        "orders.plate":     {"call": lambda: queries.order_plate(mid_order)},
+        "dashboard":        {"call": lambda: queries.fetch_dashboard(fy_start, fy_end, today, m_start, m_end)},
+        # donut ของหน้า Dashboard (query เดียวกับ dashboard["status"]) ; รถมีไม่มาก อ่านทั้งตารางได้
+        "dashboard.status": {"call": lambda: queries.fetch_car_status_counts()},
+    }
+
+
+# ---------- EXPLAIN ----------
+_SQL_WORDS = {"where", "join", "left", "inner", "cross", "on", "order", "group", "limit", "union",
+              "using", "natural", "outer", "having", "window", "as"}
+_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_NODE = re.compile(r"^(SCAN|SEARCH)\s+(?:TABLE\s+)?(\w+)(?:\s+AS\s+(\w+))?")
+
+def _aliases(sql: str) -> dict[str, set[str]]:
+    """alias/ชื่อตาราง -> ชื่อตาราง (SQLite รุ่นใหม่แสดงเฉพาะ alias ในแผน ; alias ซ้ำ -> นับทุกตาราง)"""
+    out: dict[str, set[str]] = {}
+    for table, alias in _REF.findall(sql):
+        out.setdefault(table, set()).add(table)
+        if alias and alias.lower() not in _SQL_WORDS:
+            out.setdefault(alias, set()).add(table)
+    return out
+
+def _partial_indexes() -> set[str]:
+    """index แบบมี WHERE: SCAN ผ่าน index นี้อ่านเฉพาะแถวที่ตรงเงื่อนไข (เช่น รายการที่ยังไม่คืน)"""
+    with engine.connect() as conn:
+        return {r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql LIKE '% WHERE %'")).all()}
+
+def _violations(plan: list[tuple], aliases: dict[str, set[str]], allow, partial: set[str]) -> list[str]:
+    """plan = [(id, parent, detail)] ; SCAN ผ่าน partial index ไม่นับ ยกเว้นอยู่ใน correlated subquery
+    (ทำซ้ำทุกแถวของ query นอก เช่น สถานะรถทุกคันเมื่อ ix_usage_active หายไป)"""
+    parent = {i: p for i, p, _ in plan}
+    detail = {i: d for i, _, d in plan}
+    def correlated(i):
+        while i in parent:
+            i = parent[i]
+            if detail.get(i, "").startswith("CORRELATED"):
+                return True
+        return False
+
+    bad = []
+    for i, _, line in plan:
+        m = _NODE.match(line)
+        if not m:
+            continue
+        kind, name, alias = m.groups()
+        tables = aliases.get(alias or name, {name})
+        index = re.search(r"USING (?:COVERING )?INDEX (\w+)", line)
+        if index and index.group(1) in partial and not correlated(i):
+            continue
+        for table in sorted(tables):
+            if table in HOT_TABLES and table not in allow and (kind == "SCAN" or "AUTOMATIC" in line):
+                bad.append(f"{table}: {line}")
+    return bad
+
+def _allowed(allow, statement: str) -> tuple[str, ...]:
+    if isinstance(allow, dict):
+        return tuple(t for t, pattern in allow.items() if re.search(pattern, statement))
+    return tuple(allow)
+
+def _explain(statement: str, parameters) -> list[tuple]:
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [(r[0], r[1], r[3]) for r in rows]
+
+def check(names: list[str] | None = None) -> list[dict]:
+    """รันแต่ละ case 1 ครั้งเพื่อเก็บ SQL + เวลา แล้ว EXPLAIN ทุก statement ; คืนผลต่อ case"""
+    captured: list[tuple[str, object]] = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    results, partial = [], _partial_indexes()
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        for name, case in cases().items():
+            if names and name not in names:
+                continue
+            captured.clear()
+            case["call"]()                                  # อุ่น cache ของ SQLite ก่อนจับเวลา
+            statements = list(captured)
+            t0 = time.perf_counter()
+            case["call"]()
+            ms = round((time.perf_counter() - t0) * 1000, 2)
+            plans, bad = [], []
+            for statement, parameters in statements:
+                plan = _explain(statement, parameters)
+                plans.append([d for _, _, d in plan])
+                allow = _allowed(case.get("allow", ()), statement)
+                bad += _violations(plan, _aliases(statement), allow, partial)
+            results.append({"name": name, "ms": ms, "statements": len(statements),
+                            "plans": plans, "violations": bad})
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    return results
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    _prepare(rebuild="--rebuild" in args)
+    only = [a for i, a in enumerate(args) if not a.startswith("--") and (i == 0 or args[i - 1] != "--json")]
+    results = check(only or None)
+    failed = [r for r in results if r["violations"]]
+    for r in results:
+        mark = "❌" if r["violations"] else "✅"
+        print(f"{mark} {r['name']:20s} {r['ms']:9.2f} ms  ({r['statements']} statement)")
+        for v in r["violations"]:
+            print(f"     SCAN บนตารางร้อน -> {v}")
+    if "--json" in args:
+        out = Path(args[args.index("--json") + 1])
+        out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"บันทึกผล -> {out}")
+    if failed:
+        print(f"ไม่ผ่าน {len(failed)} จาก {len(results)} ตัวอ่าน")
+    sys.exit(1 if failed else 0)
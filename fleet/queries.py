@@ -0,0 +1,344 @@
+# fleet/queries.py
+"""คำสั่งอ่านข้อมูลที่ใช้ร่วมกันระหว่างหน้า Dash (fleet/pages) และ JSON API (fleet/api.py)
+
+ทุกฟังก์ชันคืน list[dict] ที่ serialize เป็น JSON ได้ทันที
+ถ้าส่ง limit -> แบ่งหน้าแบบ keyset ด้วย id (ใช้กับ API), ไม่ส่ง -> คืนทั้งหมดตามลำดับที่หน้าเว็บใช้
+ตัวที่ถูกเรียกบ่อยแยกส่วนสร้าง SQL (*_sql) ออกมา เพื่อให้ fleet/aqueries.py ใช้ SQL ชุดเดียวกัน
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from fleet.db import engine
+from fleet.fiscal import now_local
+
+# ---------- usage status (ใช้ร่วมกันทุกที่ที่ต้องการ "สถานะ" ของรายการเบิก) ----------
+USAGE_STATUS_SQL = """
+    CASE
+      WHEN u.returned_at IS NOT NULL AND u.returned_at <> '' THEN 'returned'
+      WHEN IFNULL(u.is_maintenance, 0) <> 0                  THEN 'maintenance'
+      WHEN u.planned_end_time IS NOT NULL AND u.planned_end_time < :now THEN 'overdue'
+      ELSE 'in_use'
+    END
+"""
+OPEN_STATUSES = ("in_use", "overdue", "maintenance")
+
+def sql_now(ts: datetime | None = None) -> str:
+    """เวลาในรูปแบบเดียวกับที่ SQLAlchemy เก็บ DATETIME ใน SQLite (เทียบแบบ string ได้)
+
+    ไม่ส่ง ts -> เวลาไทยปัจจุบัน (DB เก็บเวลาไทยแบบ naive ; server อยู่ UTC ก็ต้องได้ overdue ตรงกัน)
+    """
+    return (ts or now_local()).strftime("%Y-%m-%d %H:%M:%S")
+
+def _rows(sql: str, params: dict | None = None) -> list[dict]:
+    with engine.begin() as conn:
+        return [dict(r) for r in conn.execute(text(sql), params or {}).mappings().all()]
+
+
+# ---------- cars ----------
+CAR_STATUS_SQL = """
+    COALESCE(
+      CASE
+        WHEN EXISTS (SELECT 1 FROM usage_logs u WHERE u.car_id=c.id AND u.returned_at IS NULL AND u.is_maintenance=1) THEN 'maintenance'
+        WHEN EXISTS (SELECT 1 FROM usage_logs u WHERE u.car_id=c.id AND u.returned_at IS NULL AND u.is_maintenance=0) THEN 'in_use'
+        ELSE c.status
+      END, 'available'
+    )
+"""
+CARS_SELECT = f"""
+    SELECT
+      c.id, c.plate, c.brand, c.model, c.color, c.year,
+      {CAR_STATUS_SQL} AS status_display,
+      c.asset_number, c.vehicle_type, c.description,
+      c.chassis_number, c.engine_number, c.pdf_path,
+      c.car_condition,
+      c.caretaker_org
+    FROM cars c
+"""
+CAR_COLUMNS = [
+    "id", "plate", "brand", "model", "color", "year", "status_display",
+    "asset_number", "vehicle_type", "description", "chassis_number", "engine_number",
+    "pdf_path", "car_condition", "caretaker_org",
+]
+
+def cars_sql(after_id: int | None = None, limit: int | None = None) -> tuple[str, dict]:
+    where, params = "", {}
+    if limit is None:
+        order = "ORDER BY c.plate ASC"
+    else:
+        order = "ORDER BY c.id ASC LIMIT :lim"
+        params["lim"] = int(limit)
+        if after_id:
+            where = "WHERE c.id > :after"
+            params["after"] = int(after_id)
+    return f"""
+        {CARS_SELECT}
+        {where}
+        {order}
+    """, params
+
+def fetch_cars(after_id: int | None = None, limit: int | None = None) -> list[dict]:
+    """รถทุกคันพร้อม status_display (คำนวณจาก usage_logs ที่ยังไม่คืน)"""
+    return _rows(*cars_sql(after_id, limit))
+
+def get_car(car_id: int) -> dict | None:
+    rows = _rows(f"""
+        {CARS_SELECT}
+        WHERE c.id = :id
+    """, {"id": int(car_id)})
+    return rows[0] if rows else None
+
+
+# ---------- users ----------
+USER_COLUMNS = ["id", "full_name", "position", "org"]
+
+def fetch_users(after_id: int | None = None, limit: int | None = None) -> list[dict]:
+    where, lim, params = "", "", {}
+    if after_id:
+        where = "WHERE id > :after"
+        params["after"] = int(after_id)
+    if limit is not None:
+        lim = "LIMIT :lim"
+        params["lim"] = int(limit)
+    return _rows(f"SELECT id, full_name, position, org FROM users {where} ORDER BY id ASC {lim}", params)
+
+
+# ---------- usage logs ----------
+USAGE_SELECT = f"""
+    SELECT u.id, u.car_id, c.plate, u.borrower_id, us.full_name AS borrower,
+           u.start_time, u.planned_end_time AS planned_return, u.returned_at,
+           IFNULL(u.is_maintenance, 0) AS is_maintenance, u.purpose,
+           {USAGE_STATUS_SQL} AS status
+    FROM usage_logs u
+    JOIN cars  c  ON c.id  = u.car_id
+    JOIN users us ON us.id = u.borrower_id
+"""
+USAGE_COLUMNS = [
+    "id", "car_id", "plate", "borrower_id", "borrower", "start_time", "planned_return",
+    "returned_at", "is_maintenance", "purpose", "status",
+]
+
+def usage_where(open_only: bool = False, status: str | None = None,
+                start: datetime | None = None, end: datetime | None = None) -> tuple[list[str], dict]:
+    """เงื่อนไขกรองรายการเบิกฝั่ง SQL
+
+    start/end (end ไม่รวม) = ช่วงที่ [start_time, planned_end_time] ต้องซ้อนทับ
+    แยกเป็น 2 กิ่งเพื่อให้ SQLite ใช้ index ได้ทั้งคู่ (ix_usage_time / ix_usage_planned_end):
+      - เริ่มในช่วง
+      - เริ่มก่อนช่วงแต่กำหนดคืนตกในช่วงหรือหลังจากนั้น
+    """
+    where, params = [], {}
+    if open_only or status in OPEN_STATUSES:
+        where.append("u.returned_at IS NULL")          # ใช้ partial index ix_usage_open
+    if status:
+        where.append(f"({USAGE_STATUS_SQL}) = :status")
+        params["status"] = status
+    if start or end:
+        params["rs"] = sql_now(start) if start else "0000-01-01 00:00:00"
+        params["re"] = sql_now(end) if end else "9999-12-31 23:59:59"
+        where.append("""(
+            (u.start_time >= :rs AND u.start_time < :re)
+            OR (u.start_time < :rs AND u.planned_end_time >= :rs)
+        )""")
+    return where, params
+
+def usage_sql(before_id: int | None = None, limit: int | None = None,
+              open_only: bool = False, now: datetime | None = None,
+              status: str | None = None, start: datetime | None = None,
+              end: datetime | None = None) -> tuple[str, dict]:
+    where, params = usage_where(open_only, status, start, end)
+    params["now"] = sql_now(now)
+    # มีตัวกรอง -> ให้ planner ใช้ index ของตัวกรองแล้วค่อย sort (+u.id กันไม่ให้เลือก scan ตาม rowid)
+    order = "ORDER BY +u.id DESC" if where else "ORDER BY u.id DESC"
+    lim = ""
+    if before_id:
+        where.append("u.id < :before")
+        params["before"] = int(before_id)
+    if limit is not None:
+        lim = "LIMIT :lim"
+        params["lim"] = int(limit)
+    return f"""
+        {USAGE_SELECT}
+        {('WHERE ' + ' AND '.join(where)) if where else ''}
+        {order}
+        {lim}
+    """, params
+
+def fetch_usage(before_id: int | None = None, limit: int | None = None,
+                open_only: bool = False, now: datetime | None = None,
+                status: str | None = None, start: datetime | None = None,
+                end: datetime | None = None) -> list[dict]:
+    """รายการเบิกรถ (ใหม่ -> เก่า) พร้อมสถานะ returned / maintenance / overdue / in_use"""
+    return _rows(*usage_sql(before_id, limit, open_only, now, status, start, end))
+
+def get_usage(usage_id: int, now: datetime | None = None) -> dict | None:
+    rows = _rows(f"""
+        {USAGE_SELECT}
+        WHERE u.id = :id
+    """, {"id": int(usage_id), "now": sql_now(now)})
+    return rows[0] if rows else None
+
+
+# ---------- calendar ----------
+CALENDAR_COLUMNS = ["id", "car_id", "start_date", "end_date", "plate", "user_name", "note"]
+
+def calendar_sql(start_date: date, end_date: date,
+                 after_id: int | None = None, limit: int | None = None) -> tuple[str, dict]:
+    params = {"s": start_date.isoformat(), "e": end_date.isoformat()}
+    extra, order = "", "ORDER BY cal.start_date ASC, c.plate ASC"
+    if limit is not None:
+        # +cal.id: ใช้ index ของช่วงวันที่แล้วค่อย sort (ไม่ไล่ rowid ทั้งตารางหาแถวที่ตรงช่วง)
+        order = "ORDER BY +cal.id ASC LIMIT :lim"
+        params["lim"] = int(limit)
+        if after_id:
+            extra = "AND cal.id > :after"
+            params["after"] = int(after_id)
+    return f"""
+        SELECT cal.id, cal.car_id, cal.start_date, cal.end_date,
+               c.plate, cal.user_name, cal.note
+        FROM car_calendar cal
+        JOIN cars c ON c.id = cal.car_id
+        WHERE cal.end_date >= :s AND cal.start_date <= :e {extra}
+        {order}
+    """, params
+
+def fetch_calendar(start_date: date, end_date: date,
+                   after_id: int | None = None, limit: int | None = None) -> list[dict]:
+    """รายการจองที่ 'ทับซ้อน' กับช่วงวันที่กำหนด"""
+    return _rows(*calendar_sql(start_date, end_date, after_id, limit))
+
+
+# ---------- maintenance ----------
+ORDER_COLUMNS = [
+    "id", "car_id", "plate", "repair_date", "accept_date", "center_name", "committee",
+    "total_qty", "subtotal", "vat", "grand_total", "pdf_path",
+]
+
+def orders_sql(before_id: int | None = None, limit: int | None = None) -> tuple[str, dict]:
+    """รายชื่อกรรมการรวมด้วย GROUP BY ครั้งเดียวเฉพาะใบงานในหน้านั้น (ไม่ใช่ subquery ต่อแถว)"""
+    where, lim, params = "", "", {}
+    if limit is None:
+        order = "ORDER BY COALESCE(o.accept_date, o.repair_date) DESC, o.id DESC"
+    else:
+        order, lim = "ORDER BY o.id DESC", "LIMIT :lim"
+        params["lim"] = int(limit)
+        if before_id:
+            where = "WHERE o.id < :before"
+            params["before"] = int(before_id)
+    return f"""
+        WITH page AS (
+            SELECT o.* FROM maintenance_orders o
+            {where}
+            {order} {lim}
+        ),
+        names AS (
+            SELECT mc.order_id, GROUP_CONCAT(u.full_name, ', ') AS committee
+            FROM maintenance_committee mc
+            JOIN users u ON u.id = mc.user_id
+            WHERE mc.order_id IN (SELECT id FROM page)
+            GROUP BY mc.order_id
+        )
+        SELECT  o.id,
+                o.car_id,
+                c.plate,
+                o.repair_date,
+                o.accept_date,
+                o.center_name,
+                COALESCE(n.committee, '') AS committee,        -- << แสดงชื่อจากตารางเชื่อม
+                o.total_qty, o.subtotal, o.vat, o.grand_total, o.pdf_path
+        FROM page o
+        LEFT JOIN cars c ON c.id = o.car_id
+        LEFT JOIN names n ON n.order_id = o.id
+        {order}
+    """, params
+
+def fetch_orders(before_id: int | None = None, limit: int | None = None) -> list[dict]:
+    """ใบงานซ่อมพร้อมรายชื่อกรรมการ"""
+    return _rows(*orders_sql(before_id, limit))
+
+def get_order(order_id: int) -> dict | None:
+    rows = _rows("SELECT * FROM maintenance_orders WHERE id = :i", {"i": int(order_id)})
+    return rows[0] if rows else None
+
+def fetch_committee_ids(order_id: int) -> list[int]:
+    """user_id ของกรรมการในใบงาน (ใช้ PK (order_id, user_id))"""
+    rows = _rows("SELECT user_id FROM maintenance_committee WHERE order_id = :i", {"i": int(order_id)})
+    return [r["user_id"] for r in rows]
+
+def order_plate(order_id: int) -> str | None:
+    rows = _rows("""
+        SELECT c.plate
+        FROM maintenance_orders o
+        JOIN cars c ON c.id = o.car_id
+        WHERE o.id = :i
+    """, {"i": int(order_id)})
+    return rows[0]["plate"] if rows else None
+
+def fetch_order_items(order_id: int) -> list[dict]:
+    return _rows("""
+        SELECT id, item_no, description, qty, unit_price, amount
+        FROM maintenance_items
+        WHERE order_id=:oid
+        ORDER BY COALESCE(item_no, id)
+    """, {"oid": int(order_id)})
+
+
+# ---------- dashboard aggregates (ให้ DB รวมยอดแทน pandas) ----------
+def _day(d) -> str:
+    return d.strftime("%Y-%m-%d")
+
+# จำนวนรถ (สภาพปกติ) ต่อสถานะ -> donut ของ Dashboard และ /live/status
+CAR_STATUS_COUNTS_SQL = """
+    SELECT status_display, COUNT(*) AS count FROM (
+        SELECT """ + CAR_STATUS_SQL + """ AS status_display
+        FROM cars c
+        WHERE COALESCE(c.car_condition,'ปกติ') = 'ปกติ'
+    ) GROUP BY status_display
+"""
+
+def fetch_car_status_counts() -> dict[str, int]:
+    return {r["status_display"]: int(r["count"]) for r in _rows(CAR_STATUS_COUNTS_SQL)}
+
+def dashboard_sql(fy_start: datetime, fy_end: datetime, today: datetime,
+                  m_start: datetime, m_end: datetime) -> dict[str, tuple[str, dict]]:
+    """SQL ของตัวเลขบน Dashboard ทั้งชุด (แต่ละตัวเป็น query อิสระ รันขนานกันได้)
+
+    ตัวเลขการใช้งาน/ยอดซ่อมอ่านจาก rollup (usage_daily, maint_monthly ใน fleet/rollups.py)
+    """
+    days = {"fsd": _day(fy_start), "fed": _day(fy_end)}
+    months = {"fsm": fy_start.strftime("%Y-%m"), "fem": fy_end.strftime("%Y-%m")}
+    return {
+        "status": (CAR_STATUS_COUNTS_SQL, {}),
+        "kpi": ("""
+            SELECT
+              SUM(CASE WHEN day >= :td AND day < :tn THEN trips END) AS today,
+              SUM(CASE WHEN day >= :ms AND day < :me THEN trips END) AS month,
+              SUM(CASE WHEN day >= :fsd AND day < :fed THEN trips END) AS fy
+            FROM usage_daily
+            WHERE day >= :lo AND day < :hi
+        """, {**days, "td": _day(today), "tn": _day(today + timedelta(days=1)),
+              "ms": _day(m_start), "me": _day(m_end),
+              "lo": min(_day(m_start), days["fsd"]), "hi": max(_day(m_end), days["fed"])}),
+        "top_borrow": ("""
+            SELECT r.car_id, COALESCE(c.plate, 'ID ' || r.car_id) AS plate, SUM(r.trips) AS count
+            FROM usage_daily r LEFT JOIN cars c ON c.id = r.car_id
+            WHERE r.day >= :fsd AND r.day < :fed
+            GROUP BY r.car_id ORDER BY count DESC LIMIT 5
+        """, days),
+        "top_repair": ("""
+            SELECT r.car_id, COALESCE(c.plate, 'ID ' || r.car_id) AS plate, SUM(r.orders) AS count
+            FROM maint_monthly r LEFT JOIN cars c ON c.id = r.car_id
+            WHERE r.month >= :fsm AND r.month < :fem
+            GROUP BY r.car_id ORDER BY count DESC LIMIT 5
+        """, months),
+        "monthly": ("""
+            SELECT month, SUM(spend) AS total
+            FROM maint_monthly
+            WHERE month >= :fsm AND month < :fem
+            GROUP BY month ORDER BY month
+        """, months),
+    }
+
+def fetch_dashboard(fy_start: datetime, fy_end: datetime, today: datetime,
+                    m_start: datetime, m_end: datetime) -> dict[str, list[dict]]:
+    return {k: _rows(sql, p) for k, (sql, p) in
+            dashboard_sql(fy_start, fy_end, today, m_start, m_end).items()}
@@ -1,25 +1,22 @@
 # fleet/reset_db.py
 from __future__ import annotations
 import sys
-import shutil
-from datetime import datetime
 from pathlib import Path
 from sqlalchemy import text
+from fleet import backup
 from fleet.db import engine, Base, init_db
 from fleet.db import install_usage_triggers, reconcile_cars_once
 
 def _backup_sqlite():
-    """สำรองไฟล์ SQLite เดิมก่อนลบทิ้ง (ถ้า backend เป็น sqlite)"""
+    """สำรองไฟล์ SQLite เดิมก่อนลบทิ้ง (ถ้า backend เป็น sqlite) ผ่าน online backup (fleet/backup.py)"""
     if engine.url.get_backend_name() != "sqlite":
         return None
     db_path = Path(engine.url.database).resolve()
     if not db_path.exists():
         return None
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    bak_path = db_path.with_suffix(f".bak-{ts}.db")
-    shutil.copy2(db_path, bak_path)
-    print(f"🧰 Backup created -> {bak_path}")
-    return bak_path
+    info = backup.take(label="pre-reset")
+    print(f"🧰 Backup created -> {info['path']}")
+    return Path(info["path"])
 
 def _drop_all():
     """ลบทุกตาราง โดยปิด FK check ชั่วคราว (สำหรับ SQLite)"""
@@ -0,0 +1,189 @@
+# fleet/rollups.py
+"""ตารางสรุปยอดล่วงหน้า (rollup) สำหรับ Dashboard
+
+usage_daily(car_id, day, trips, hours)       -- จำนวนเที่ยว/ชั่วโมงใช้งานต่อคันต่อวัน (ไม่รวมรายการซ่อม)
+maint_monthly(car_id, month, orders, spend)  -- จำนวนใบงาน/ยอดซ่อมต่อคันต่อเดือน (นับตาม accept_date)
+
+อัปเดตทีละแถวด้วย trigger บน usage_logs / maintenance_orders ; ถ้าข้อมูลเพี้ยนสั่งสร้างใหม่ได้
+(rebuild อ่านจาก view *_all จึงรวมประวัติที่ย้ายไป archive แล้วด้วย, fleet/archive.py):
+
+    python -m fleet.rollups --rebuild
+"""
+from __future__ import annotations
+import sys
+from sqlalchemy import text
+from fleet.db import engine
+from fleet.fiscal import sql_fiscal_year
+
+# ชั่วโมงใช้งานของแถว (นับเฉพาะที่คืนแล้ว)
+def _hours(r: str) -> str:
+    return (f"CASE WHEN {r}.returned_at IS NOT NULL "
+            f"THEN (julianday({r}.returned_at) - julianday({r}.start_time)) * 24.0 ELSE 0 END")
+
+def _usage_counts(r: str) -> str:
+    return f"IFNULL({r}.is_maintenance,0) = 0 AND {r}.start_time IS NOT NULL AND {r}.car_id IS NOT NULL"
+
+def _maint_counts(r: str) -> str:
+    return f"{r}.accept_date IS NOT NULL AND {r}.accept_date <> '' AND {r}.car_id IS NOT NULL"
+
+_USAGE_ADD = """
+    INSERT INTO usage_daily (car_id, day, trips, hours)
+    SELECT NEW.car_id, date(NEW.start_time), 1, {hours}
+    WHERE {cond}
+    ON CONFLICT(car_id, day) DO UPDATE SET
+        trips = trips + 1,
+        hours = hours + excluded.hours;
+""".format(hours=_hours("NEW"), cond=_usage_counts("NEW"))
+
+_USAGE_SUB = """
+    UPDATE usage_daily SET trips = trips - 1, hours = hours - ({hours})
+    WHERE car_id = OLD.car_id AND day = date(OLD.start_time) AND {cond};
+    DELETE FROM usage_daily
+    WHERE car_id = OLD.car_id AND day = date(OLD.start_time) AND trips <= 0;
+""".format(hours=_hours("OLD"), cond=_usage_counts("OLD"))
+
+_MAINT_ADD = """
+    INSERT INTO maint_monthly (car_id, month, orders, spend)
+    SELECT NEW.car_id, substr(NEW.accept_date, 1, 7), 1, IFNULL(NEW.grand_total, 0)
+    WHERE {cond}
+    ON CONFLICT(car_id, month) DO UPDATE SET
+        orders = orders + 1,
+        spend  = spend + excluded.spend;
+""".format(cond=_maint_counts("NEW"))
+
+_MAINT_SUB = """
+    UPDATE maint_monthly SET orders = orders - 1, spend = spend - IFNULL(OLD.grand_total, 0)
+    WHERE car_id = OLD.car_id AND month = substr(OLD.accept_date, 1, 7) AND {cond};
+    DELETE FROM maint_monthly
+    WHERE car_id = OLD.car_id AND month = substr(OLD.accept_date, 1, 7) AND orders <= 0;
+""".format(cond=_maint_counts("OLD"))
+
+TRIGGERS = {
+    "rollup_usage_ins": f"AFTER INSERT ON usage_logs BEGIN {_USAGE_ADD} END;",
+    "rollup_usage_del": f"AFTER DELETE ON usage_logs BEGIN {_USAGE_SUB} END;",
+    "rollup_usage_upd": ("AFTER UPDATE OF car_id, start_time, returned_at, is_maintenance ON usage_logs "
+                         f"BEGIN {_USAGE_SUB} {_USAGE_ADD} END;"),
+    "rollup_maint_ins": f"AFTER INSERT ON maintenance_orders BEGIN {_MAINT_ADD} END;",
+    "rollup_maint_del": f"AFTER DELETE ON maintenance_orders BEGIN {_MAINT_SUB} END;",
+    "rollup_maint_upd": ("AFTER UPDATE OF car_id, accept_date, grand_total ON maintenance_orders "
+                         f"BEGIN {_MAINT_SUB} {_MAINT_ADD} END;"),
+}
+
+
+def init_rollups():
+    """สร้างตาราง + trigger (idempotent) ; ถ้าเพิ่งสร้างตารางครั้งแรกจะคำนวณย้อนหลังให้เลย"""
+    with engine.begin() as conn:
+        existing = {r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('usage_daily','maint_monthly')"
+        )).all()}
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS usage_daily (
+                car_id  INTEGER NOT NULL,
+                day     TEXT    NOT NULL,      -- YYYY-MM-DD ของ start_time
+                trips   INTEGER NOT NULL DEFAULT 0,
+                hours   REAL    NOT NULL DEFAULT 0.0,
+                PRIMARY KEY (car_id, day)
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_usage_daily_day ON usage_daily (day)"))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS maint_monthly (
+                car_id  INTEGER NOT NULL,
+                month   TEXT    NOT NULL,      -- YYYY-MM ของ accept_date
+                orders  INTEGER NOT NULL DEFAULT 0,
+                spend   REAL    NOT NULL DEFAULT 0.0,
+                PRIMARY KEY (car_id, month)
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_maint_monthly_month ON maint_monthly (month)"))
+        for name, body in TRIGGERS.items():
+            conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS {name} {body}"))
+    if existing != {"usage_daily", "maint_monthly"}:
+        rebuild_rollups()
+
+def rebuild_rollups():
+    """คำนวณ rollup ใหม่ทั้งหมดจากตารางต้นทาง (ใช้ตอนติดตั้งครั้งแรก/กู้ข้อมูล)"""
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM usage_daily"))
+        conn.execute(text(f"""
+            INSERT INTO usage_daily (car_id, day, trips, hours)
+            SELECT u.car_id, date(u.start_time), COUNT(*), SUM({_hours('u')})
+            FROM usage_logs_all u
+            WHERE {_usage_counts('u')}
+            GROUP BY u.car_id, date(u.start_time)
+        """))
+        conn.execute(text("DELETE FROM maint_monthly"))
+        conn.execute(text(f"""
+            INSERT INTO maint_monthly (car_id, month, orders, spend)
+            SELECT o.car_id, substr(o.accept_date, 1, 7), COUNT(*), SUM(IFNULL(o.grand_total, 0))
+            FROM maintenance_orders_all o
+            WHERE {_maint_counts('o')}
+            GROUP BY o.car_id, substr(o.accept_date, 1, 7)
+        """))
+    print("✅ Rebuilt rollups (usage_daily, maint_monthly)")
+
+
+# ---------- readers (ขนาดข้อมูล = จำนวนรถ × จำนวนวัน/เดือน ไม่ขึ้นกับประวัติทั้งหมด) ----------
+def _rows(sql: str, params: dict) -> list[dict]:
+    with engine.begin() as conn:
+        return [dict(r) for r in conn.execute(text(sql), params).mappings().all()]
+
+def maint_months() -> list[str]:
+    with engine.begin() as conn:
+        return [r[0] for r in conn.execute(text(
+            "SELECT DISTINCT month FROM maint_monthly ORDER BY month")).all()]
+
+def maint_fiscal_years() -> list[int]:
+    with engine.begin() as conn:
+        return [int(r[0]) for r in conn.execute(text(
+            f"SELECT DISTINCT {sql_fiscal_year('month')} AS fy FROM maint_monthly ORDER BY fy")).all()]
+
+def maint_by_month(start_month: str, end_month: str) -> list[dict]:
+    """ยอดซ่อมรายเดือน month ∈ [start_month, end_month) รูปแบบ YYYY-MM"""
+    return _rows("""
+        SELECT month, SUM(orders) AS orders, SUM(spend) AS spend
+        FROM maint_monthly
+        WHERE month >= :s AND month < :e
+        GROUP BY month ORDER BY month
+    """, {"s": start_month, "e": end_month})
+
+def maint_car_months(start_month: str, end_month: str) -> list[dict]:
+    """แถว rollup ดิบ (car_id, month, orders, spend) สำหรับรวมหลายแบบใน Python จากการอ่านครั้งเดียว"""
+    return _rows("""
+        SELECT car_id, month, orders, spend
+        FROM maint_monthly
+        WHERE month >= :s AND month < :e
+    """, {"s": start_month, "e": end_month})
+
+def maint_by_car(start_month: str, end_month: str) -> list[dict]:
+    return _rows("""
+        SELECT car_id, SUM(orders) AS orders, SUM(spend) AS spend
+        FROM maint_monthly
+        WHERE month >= :s AND month < :e
+        GROUP BY car_id
+    """, {"s": start_month, "e": end_month})
+
+def trips_by_car(start_day: str, end_day: str) -> list[dict]:
+    """จำนวนเที่ยว/ชั่วโมงต่อคัน day ∈ [start_day, end_day) รูปแบบ YYYY-MM-DD"""
+    return _rows("""
+        SELECT car_id, SUM(trips) AS trips, SUM(hours) AS hours
+        FROM usage_daily
+        WHERE day >= :s AND day < :e
+        GROUP BY car_id
+    """, {"s": start_day, "e": end_day})
+
+def trips_total(start_day: str, end_day: str) -> int:
+    with engine.begin() as conn:
+        v = conn.execute(text("""
+            SELECT SUM(trips) FROM usage_daily WHERE day >= :s AND day < :e
+        """), {"s": start_day, "e": end_day}).scalar()
+    return int(v or 0)
+
+
+if __name__ == "__main__":
+    from fleet.db import init_db
+    init_db()
+    if "--rebuild" in sys.argv:
+        rebuild_rollups()
+    else:
+        print("Usage: python -m fleet.rollups --rebuild")
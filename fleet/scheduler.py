@@ -0,0 +1,193 @@
+# fleet/scheduler.py
+"""งานเบื้องหลังตามรอบเวลา (thread เดียว ใน process เดียวของทั้ง deployment)
+
+- detect_overdue(): query เดียว (partial index ix_usage_overdue) หารายการที่ยังไม่คืนและเลยกำหนดคืน
+  แล้วบันทึก event "usage.overdue" ครั้งเดียวต่อ (รายการ, กำหนดคืน)
+- snapshot.scheduled(): Parquet snapshot แบบเขียนเฉพาะ partition ที่เปลี่ยน (fleet/snapshot.py)
+- backup.scheduled(): สำรอง SQLite แบบ online + ตรวจ integrity + หมุนเวียน (fleet/backup.py)
+
+ทุก worker เรียก start_scheduler() แต่จะรันงานได้เฉพาะ process ที่ถือ lease ในตาราง scheduler_lease
+(ต่ออายุทุก LEASE_TTL/3 วินาที ; process นั้นตาย/หยุด -> lease หมดอายุ แล้ว worker อื่นรับต่อ)
+
+    python -m fleet.scheduler --once      # ตรวจรอบเดียวแล้วจบ
+
+env:
+    FLEET_SCHEDULER=0               ปิด scheduler
+    FLEET_OVERDUE_INTERVAL=60       รอบตรวจ overdue (วินาที)
+    FLEET_SNAPSHOT_INTERVAL=86400   รอบ Parquet snapshot (วินาที, 0 = ปิด)
+    FLEET_BACKUP_INTERVAL=21600     รอบสำรองฐานข้อมูล (วินาที, 0 = ปิด)
+    FLEET_SCHEDULER_LEASE=120       อายุ lease ของผู้รัน scheduler (วินาที)
+"""
+from __future__ import annotations
+import atexit
+import os
+import socket
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import text
+
+from fleet.db import engine
+from fleet.events import install_notifiers, record
+from fleet.queries import sql_now
+
+OVERDUE_INTERVAL = int(os.getenv("FLEET_OVERDUE_INTERVAL", "60"))
+LEASE_TTL = max(3, int(os.getenv("FLEET_SCHEDULER_LEASE", "120")))
+
+OVERDUE_SQL = """
+    SELECT u.id, u.car_id, c.plate, us.full_name AS borrower,
+           u.start_time, u.planned_end_time
+    FROM usage_logs u
+    LEFT JOIN cars  c  ON c.id  = u.car_id
+    LEFT JOIN users us ON us.id = u.borrower_id
+    WHERE u.returned_at IS NULL
+      AND u.planned_end_time IS NOT NULL
+      AND u.planned_end_time < :now
+      AND IFNULL(u.is_maintenance, 0) = 0
+      AND NOT EXISTS (
+        SELECT 1 FROM events e
+        WHERE e.dedup_key = 'usage.overdue:' || u.id || ':' || u.planned_end_time
+      )
+"""
+
+def detect_overdue(now: datetime | None = None) -> list[dict]:
+    """บันทึก event ให้รายการที่เพิ่งเลยกำหนดคืน -> คืนรายการ event ใหม่"""
+    with engine.begin() as conn:
+        rows = conn.execute(text(OVERDUE_SQL), {"now": sql_now(now)}).mappings().all()
+    out = []
+    for r in rows:
+        ev = record("usage.overdue", "usage", r["id"], {
+            "car_id": r["car_id"],
+            "plate": r["plate"],
+            "borrower": r["borrower"],
+            "start_time": r["start_time"],
+            "planned_end_time": r["planned_end_time"],
+        }, dedup_key=f"usage.overdue:{r['id']}:{r['planned_end_time']}")
+        if ev:
+            out.append(ev)
+    return out
+
+
+# ---------- lease ----------
+def acquire_lease(owner: str, ttl: int = LEASE_TTL, name: str = "scheduler") -> bool:
+    """ได้/ต่ออายุ lease ถ้าว่าง หมดอายุ หรือเป็นของ owner อยู่แล้ว ; คืน True ถ้า owner ถือ lease"""
+    now = time.time()
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO scheduler_lease (name, owner, expires_at) VALUES (:n, :o, :exp)
+            ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE scheduler_lease.owner = excluded.owner OR scheduler_lease.expires_at < :now
+        """), {"n": name, "o": owner, "exp": now + ttl, "now": now})
+        held = conn.execute(text("SELECT owner FROM scheduler_lease WHERE name = :n"), {"n": name}).scalar()
+    return held == owner
+
+def release_lease(owner: str, name: str = "scheduler"):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM scheduler_lease WHERE name = :n AND owner = :o"), {"n": name, "o": owner})
+
+
+class Scheduler:
+    """รันงานแต่ละตัวทุก ๆ N วินาทีบน daemon thread เดียว (เฉพาะตอนที่ process นี้ถือ lease)"""
+
+    def __init__(self):
+        self.jobs: list[list] = []           # [interval, fn, next_run]
+        self._stop = threading.Event()
+        self._owner = threading.Event()      # process นี้ถือ lease อยู่
+        self._thread: threading.Thread | None = None
+        self._lease_thread: threading.Thread | None = None
+        self.owner_id = ""
+
+    def every(self, seconds: int, fn: Callable[[], object], delay: float | None = None) -> "Scheduler":
+        """รอบแรกรันหลัง delay วินาที (ค่าเริ่มต้น = หนึ่งรอบ: import แอปเฉย ๆ ไม่เริ่มงานหนักทันที)"""
+        interval = max(1, int(seconds))
+        first = interval if delay is None else max(0.0, delay)
+        self.jobs.append([interval, fn, time.monotonic() + first])
+        return self
+
+    def _keep_lease(self):
+        # thread แยก: งานยาว (เช่น backup ไฟล์ใหญ่) ไม่ทำให้ lease หมดอายุระหว่างรัน
+        while not self._stop.is_set():
+            try:
+                held = acquire_lease(self.owner_id)
+            except Exception as e:
+                print("scheduler lease error:", e)
+                held = False
+            if held:
+                self._owner.set()
+            else:
+                self._owner.clear()
+            self._stop.wait(LEASE_TTL / 3)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self._owner.wait(LEASE_TTL / 3):
+                continue                     # worker อื่นถือ lease -> รอรับต่อเมื่อหมดอายุ
+            now = time.monotonic()
+            for job in self.jobs:
+                interval, fn, next_run = job
+                if now >= next_run:
+                    job[2] = now + interval
+                    try:
+                        fn()
+                    except Exception as e:
+                        print(f"scheduler job {getattr(fn, '__name__', fn)} error:", e)
+            wait = min(j[2] for j in self.jobs) - time.monotonic() if self.jobs else 1.0
+            self._stop.wait(max(0.5, wait))
+
+    def start(self) -> "Scheduler":
+        if self._thread is None:
+            # ตั้งตอนเริ่ม (ไม่ใช่ตอน import): process ที่ fork มามี pid ของตัวเอง
+            self.owner_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._lease_thread = threading.Thread(target=self._keep_lease, name="fleet-scheduler-lease",
+                                                  daemon=True)
+            self._thread = threading.Thread(target=self._loop, name="fleet-scheduler", daemon=True)
+            self._lease_thread.start()
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._owner.clear()
+        if self.owner_id:
+            try:
+                release_lease(self.owner_id)     # worker อื่นรับต่อได้ทันที ไม่ต้องรอหมดอายุ
+            except Exception as e:
+                print("scheduler lease error:", e)
+
+
+_scheduler: Scheduler | None = None
+
+def start_scheduler() -> Scheduler | None:
+    """เริ่ม scheduler (ครั้งเดียวต่อ process) ; FLEET_SCHEDULER=0 -> ไม่เริ่ม
+
+    หลาย process เรียกได้: รันงานจริงเฉพาะผู้ถือ lease (ช่วงส่งต่อ lease event ก็ไม่ซ้ำเพราะ dedup_key เป็น UNIQUE)
+    """
+    global _scheduler
+    if os.getenv("FLEET_SCHEDULER", "1") == "0":
+        return None
+    if _scheduler is None:
+        install_notifiers()
+        from fleet import backup, snapshot
+        _scheduler = Scheduler().every(OVERDUE_INTERVAL, detect_overdue, delay=0)     # query เบา ๆ รันทันทีได้
+        # งานหนัก: ตรวจทุก 10 นาทีว่าถึงรอบหรือยัง (ดูเวลาของ snapshot/ไฟล์สำรองล่าสุด -> รีสตาร์ทไม่ทำซ้ำ
+        # และไม่ทำตั้งแต่วินาทีแรกที่ import)
+        if snapshot.SNAPSHOT_INTERVAL > 0:
+            _scheduler.every(min(snapshot.SNAPSHOT_INTERVAL, 600), snapshot.scheduled)
+        if backup.BACKUP_INTERVAL > 0:
+            _scheduler.every(min(backup.BACKUP_INTERVAL, 600), backup.scheduled)
+        _scheduler.start()
+        atexit.register(_scheduler.stop)
+    return _scheduler
+
+
+if __name__ == "__main__":
+    from fleet.db import init_db
+    init_db()
+    if "--once" in sys.argv:
+        install_notifiers()
+        events = detect_overdue()
+        print(f"✅ overdue ใหม่ {len(events)} รายการ")
+    else:
+        print("Usage: python -m fleet.scheduler --once")
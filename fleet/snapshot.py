@@ -0,0 +1,259 @@
+# fleet/snapshot.py
+"""ส่งออกทุกตารางเป็น Parquet (แบ่งไฟล์ตามปีงบประมาณ) + โหลดกลับเป็นฐานข้อมูลใหม่
+
+    python -m fleet.snapshot                      # เขียนเฉพาะ partition ที่เปลี่ยน
+    python -m fleet.snapshot --full               # เขียนใหม่ทุก partition
+    python -m fleet.snapshot --restore new.db     # สร้าง DB ใหม่จาก snapshot
+
+โครงไฟล์ (FLEET_SNAPSHOT_DIR, ค่าเริ่มต้น fleet/snapshots):
+    manifest.json                     schema (sqlite_master) + hash/จำนวนแถวของทุก partition
+    usage_logs/fy=2025.parquet        ตารางที่มีวันที่ -> หนึ่งไฟล์ต่อปีงบฯ (ไม่มีวันที่ -> fy=none)
+    cars/fy=all.parquet               ตารางอ้างอิง -> ไฟล์เดียว
+
+- อ่านทุกตารางใน read transaction เดียว (ภาพ ณ จุดเวลาเดียว ; WAL ไม่บล็อกผู้เขียน) แล้วเขียนไฟล์หลังจบ transaction
+- partition ที่ hash ของข้อมูลเท่าเดิมจะไม่ถูกเขียนซ้ำ ; ปีเก่าที่ไม่มีการแก้จึงเขียนครั้งเดียว
+- ต้องมี pyarrow (pandas.to_parquet) ; scheduler ข้ามงานนี้ถ้าไม่มี
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from fleet.db import PROJECT_DIR, engine
+from fleet.fiscal import sql_fiscal_year
+
+SNAPSHOT_DIR = Path(os.getenv("FLEET_SNAPSHOT_DIR", PROJECT_DIR / "snapshots"))
+SNAPSHOT_INTERVAL = int(os.getenv("FLEET_SNAPSHOT_INTERVAL", "86400"))   # 0 = ไม่ตั้งเวลา
+COMPRESSION = "zstd"
+MANIFEST = "manifest.json"
+
+_take_lock = threading.Lock()      # scheduler กับการสั่งเองใน process เดียวกันไม่เขียน manifest ทับกัน
+
+
+def _fy(col: str) -> str:
+    """ปีงบฯ ของคอลัมน์วันที่ ; ค่าว่าง/ไม่ใช่วันที่ -> NULL (partition 'none')"""
+    return f"CASE WHEN {col} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN {sql_fiscal_year(col)} END"
+
+def _order_fy(order_id: str) -> str:
+    # ใบงานอาจอยู่ใน archive แล้ว (fleet/archive.py) -> หาใน view *_all
+    return f"(SELECT {_fy('o.accept_date')} FROM maintenance_orders_all o WHERE o.id = {order_id})"
+
+# ตาราง -> นิพจน์ partition (alias t) ; ตารางที่ไม่อยู่ในนี้เป็นไฟล์เดียว (fy=all)
+PARTITIONS = {
+    "usage_logs":            _fy("t.start_time"),
+    "maintenance_orders":    _fy("t.accept_date"),
+    "maintenance_items":     _order_fy("t.order_id"),
+    "maintenance_committee": _order_fy("t.order_id"),
+    "car_calendar":          _fy("t.start_date"),
+    "events":                _fy("t.created_at"),
+    "usage_daily":           _fy("t.day"),
+    "maint_monthly":         _fy("t.month"),
+}
+PARTITIONS.update({f"{t}_archive": PARTITIONS[t] for t in
+                   ("usage_logs", "maintenance_orders", "maintenance_items", "maintenance_committee")})
+
+
+def _require_parquet():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("ต้องติดตั้ง pyarrow เพื่อเขียน/อ่าน Parquet (pip install pyarrow)")
+
+def _part_name(value) -> str:
+    return "none" if value is None else str(int(value))
+
+def _digest(df: pd.DataFrame) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x1f".join(df.columns).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """คอลัมน์ที่ SQLite เก็บชนิดปนกัน (เช่น ตัวเลขกับข้อความ) -> ข้อความ ให้ pyarrow เขียนได้"""
+    for c in df.columns:
+        kinds = {type(v) for v in df[c] if v is not None}
+        if len(kinds) > 1 and not kinds <= {int, float}:
+            df[c] = df[c].map(lambda v: None if v is None else str(v))
+    return df
+
+def _temp_path(final: Path) -> Path:
+    """ไฟล์ชั่วคราวชื่อไม่ซ้ำในโฟลเดอร์เดียวกับไฟล์จริง (หลาย process เขียนพร้อมกันไม่ชนกัน ; os.replace ได้)"""
+    with tempfile.NamedTemporaryFile(dir=final.parent, prefix=f".{final.name}.", suffix=".tmp",
+                                     delete=False) as f:
+        return Path(f.name)
+
+def _write(df: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(path)
+    try:
+        df.to_parquet(tmp, compression=COMPRESSION, index=False)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def load_manifest(out_dir: Path = SNAPSHOT_DIR) -> dict:
+    p = Path(out_dir) / MANIFEST
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {"tables": {}}
+
+
+# ---------- export ----------
+def take(out_dir: Path = SNAPSHOT_DIR, full: bool = False) -> dict:
+    """เขียน snapshot ; คืนสรุป {table: {"written": [...], "skipped": n, "removed": [...]}}"""
+    _require_parquet()
+    with _take_lock:
+        return _take(Path(out_dir), full)
+
+@contextmanager
+def _read_transaction():
+    """connection ที่อ่านทุกตารางจาก read transaction เดียว (ภาพ ณ จุดเวลาเดียว)
+
+    pysqlite ไม่ BEGIN ให้คำสั่ง SELECT -> BEGIN เอง ; โหมด WAL ผู้เขียนไม่ต้องรอ
+    (archive.run ที่ commit ระหว่างอ่านจะไม่ทำให้แถวเดียวกันอยู่ทั้งตารางร้อนและ archive)
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql("BEGIN")
+        try:
+            conn.exec_driver_sql("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            yield conn
+        finally:
+            conn.rollback()
+
+def _take(out_dir: Path, full: bool) -> dict:
+    manifest = load_manifest(out_dir)
+    pending: list[tuple[pd.DataFrame, Path]] = []
+    summary, removed_files = {}, []
+    # อ่าน + hash ทุกตารางใน transaction เดียว ; เขียนไฟล์หลังจบ transaction (ไม่ค้าง snapshot ระหว่าง I/O)
+    with _read_transaction() as conn:
+        schema = [dict(r) for r in conn.execute(text("""
+            SELECT type, name, tbl_name, sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 WHEN 'view' THEN 2 ELSE 3 END, rowid
+        """)).mappings().all()]
+        tables = [s["name"] for s in schema if s["type"] == "table"]
+
+        for table in tables:
+            expr = PARTITIONS.get(table, "'all'")
+            rs = conn.execute(text(f"SELECT {expr} AS __part, t.* FROM {table} t ORDER BY t.rowid"))
+            cols = list(rs.keys())
+            df = pd.DataFrame(rs.all(), columns=cols, dtype=object)
+
+            entry = manifest["tables"].get(table, {})
+            old_parts = entry.get("partitions", {})
+            parts, written = {}, []
+            groups = df.groupby("__part", dropna=False, sort=True) if len(df) else []
+            for key, g in groups:
+                name = "all" if table not in PARTITIONS else _part_name(None if pd.isna(key) else key)
+                g = _arrow_safe(g.drop(columns="__part").reset_index(drop=True))
+                digest = _digest(g)
+                path = out_dir / table / f"fy={name}.parquet"
+                prev = old_parts.get(name)
+                if full or not prev or prev["hash"] != digest or not path.exists():
+                    pending.append((g, path))
+                    written.append(name)
+                    prev = {"file": f"{table}/{path.name}", "rows": len(g), "hash": digest,
+                            "written_at": datetime.now().isoformat(timespec="seconds")}
+                parts[name] = prev
+
+            removed = [n for n in old_parts if n not in parts]
+            removed_files += [old_parts[n]["file"] for n in removed]
+            manifest["tables"][table] = {"columns": cols[1:], "partitions": parts}
+            summary[table] = {"written": written, "skipped": len(parts) - len(written), "removed": removed}
+
+    for g, path in pending:
+        _write(g, path)
+    for f in removed_files:
+        (out_dir / f).unlink(missing_ok=True)
+
+    for table in [t for t in manifest["tables"] if t not in tables]:      # ตารางที่ถูกลบไปแล้ว
+        for p in manifest["tables"].pop(table)["partitions"].values():
+            (out_dir / p["file"]).unlink(missing_ok=True)
+
+    manifest["schema"] = schema
+    manifest["taken_at"] = datetime.now().isoformat(timespec="seconds")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(out_dir / MANIFEST)
+    try:
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, out_dir / MANIFEST)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return summary
+
+def scheduled():
+    """งานตามรอบของ scheduler: ไม่มี pyarrow หรือ snapshot ล่าสุดใหม่กว่ารอบ -> ข้าม"""
+    try:
+        _require_parquet()
+    except RuntimeError:
+        return None
+    taken_at = load_manifest().get("taken_at")
+    if taken_at and (datetime.now() - datetime.fromisoformat(taken_at)).total_seconds() < SNAPSHOT_INTERVAL:
+        return None
+    summary = take()
+    n = sum(len(s["written"]) for s in summary.values())
+    if n:
+        print(f"📦 snapshot: เขียน {n} partition -> {SNAPSHOT_DIR}")
+    return summary
+
+
+# ---------- restore ----------
+def restore(target: Path, src_dir: Path = SNAPSHOT_DIR) -> dict[str, int]:
+    """สร้างไฟล์ SQLite ใหม่จาก snapshot (ไม่เขียนทับไฟล์ที่มีอยู่) ; คืนจำนวนแถวต่อตาราง
+
+    ลำดับ: สร้างตาราง -> ใส่ข้อมูล -> index -> view/trigger (trigger ไม่ทำงานตอนโหลด rollup จึงตรงกับต้นทาง)
+    """
+    _require_parquet()
+    target, src_dir = Path(target), Path(src_dir)
+    if target.exists():
+        raise FileExistsError(f"{target} มีอยู่แล้ว")
+    manifest = load_manifest(src_dir)
+    if not manifest.get("schema"):
+        raise FileNotFoundError(f"ไม่พบ {MANIFEST} ใน {src_dir}")
+
+    dst = create_engine(f"sqlite:///{target.resolve().as_posix()}", future=True)
+    counts = {}
+    try:
+        with dst.begin() as conn:
+            for s in manifest["schema"]:
+                if s["type"] == "table":
+                    conn.exec_driver_sql(s["sql"])
+            for table, entry in manifest["tables"].items():
+                files = [src_dir / p["file"] for p in entry["partitions"].values()]
+                frames = [pd.read_parquet(f) for f in files]
+                df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=entry["columns"])
+                df = df.astype(object).where(df.notna(), None)
+                if len(df):
+                    marks = ", ".join(f":c{i}" for i in range(len(df.columns)))
+                    names = ", ".join(f'"{c}"' for c in df.columns)
+                    conn.execute(text(f'INSERT INTO "{table}" ({names}) VALUES ({marks})'),
+                                 [{f"c{i}": v for i, v in enumerate(r)}
+                                  for r in df.itertuples(index=False, name=None)])
+                counts[table] = len(df)
+            for s in manifest["schema"]:
+                if s["type"] != "table":
+                    conn.exec_driver_sql(s["sql"])
+    finally:
+        dst.dispose()
+    return counts
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    src = Path(args[args.index("--dir") + 1]) if "--dir" in args else SNAPSHOT_DIR
+    if "--restore" in args:
+        target = Path(args[args.index("--restore") + 1])
+        counts = restore(target, src)
+        print(f"✅ Restored {sum(counts.values())} rows ({len(counts)} tables) -> {target}")
+    else:
+        summary = take(src, full="--full" in args)
+        for table, s in summary.items():
+            print(f"{table:24s} เขียน {len(s['written']):3d}  ข้าม {s['skipped']:3d}  ลบ {len(s['removed'])}")
+        print(f"✅ Snapshot -> {src}")
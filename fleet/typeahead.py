@@ -0,0 +1,206 @@
+# fleet/typeahead.py
+"""Dropdown แบบพิมพ์ค้นหา (server-side) สำหรับรายการที่โตได้เรื่อย ๆ (รถ, ผู้ใช้, รายการเบิก)
+
+- Provider เก็บ index ในหน่วยความจำ: prefix ของแต่ละคำ (bisect) + trigram (ค้นกลางคำ)
+  index สร้างใหม่เมื่อ cache.bump(ตารางที่ผูกไว้) เท่านั้น
+- attach("sel-car", "cars") ผูก callback กับ search_value ของ dropdown:
+  ส่งกลับแค่ top-N ที่ตรงคำค้น + label ของค่าที่เลือกอยู่ (payload เล็กเสมอ)
+- ผลค้นหาล่าสุดถูก cache (LRU) ต่อ provider
+"""
+from __future__ import annotations
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Iterable
+
+from dash import Input, Output, callback
+from sqlalchemy import text
+
+from fleet.cache import version
+from fleet.db import engine
+
+DEFAULT_LIMIT = 20
+_LRU_SIZE = 256
+
+
+def normalize(s) -> str:
+    return " ".join(str(s or "").casefold().split())
+
+def _tokens(norm: str) -> set[str]:
+    return {t for t in norm.replace("|", " ").replace("(", " ").replace(")", " ").split() if t}
+
+def _trigrams(norm: str) -> set[str]:
+    return {norm[i:i + 3] for i in range(len(norm) - 2)}
+
+
+class _Index:
+    """รายการ (value, label) ตามลำดับ default + posting list (ตำแหน่งเรียงจากน้อยไปมาก)"""
+
+    def __init__(self, pairs: Iterable[tuple]):
+        self.values: list = []
+        self.labels: list[str] = []
+        self.norm: list[str] = []
+        self.by_value: dict = {}
+        token_post: dict[str, array] = {}
+        tri_post: dict[str, array] = {}
+        for pos, (value, label) in enumerate(pairs):
+            label = str(label if label is not None else value)
+            n = normalize(label)
+            self.values.append(value)
+            self.labels.append(label)
+            self.norm.append(n)
+            self.by_value[value] = label
+            for t in _tokens(n):
+                token_post.setdefault(t, array("i")).append(pos)
+            for g in _trigrams(n):
+                tri_post.setdefault(g, array("i")).append(pos)
+        self.tokens = sorted(token_post)
+        self.token_post = token_post
+        self.tri_post = tri_post
+
+    def _prefix(self, q: str) -> Iterable[int]:
+        """ตำแหน่งของรายการที่มีคำขึ้นต้นด้วย q (เรียงตามลำดับ default, ไม่ซ้ำ)"""
+        i = bisect_left(self.tokens, q)
+        lists = []
+        while i < len(self.tokens) and self.tokens[i].startswith(q):
+            lists.append(self.token_post[self.tokens[i]])
+            i += 1
+        last = -1
+        for pos in heapq.merge(*lists):
+            if pos != last:
+                last = pos
+                yield pos
+
+    def _substring(self, q: str) -> Iterable[int]:
+        """ใช้ posting ของ trigram ที่หายากที่สุด แล้วตรวจ substring จริง"""
+        grams = _trigrams(q)
+        if any(g not in self.tri_post for g in grams):
+            return
+        rarest = min(grams, key=lambda g: len(self.tri_post[g]))
+        for pos in self.tri_post[rarest]:
+            if q in self.norm[pos]:
+                yield pos
+
+    def search(self, query: str, limit: int) -> list[int]:
+        q = normalize(query)
+        if not q:
+            return list(range(min(limit, len(self.values))))
+        hits = self._prefix(q) if len(q) < 3 else self._substring(q)
+        return list(islice(hits, limit))
+
+
+class Provider:
+    """แหล่ง options ของ dropdown
+
+    loader() -> iterable ของ (value, label) ตามลำดับที่อยากให้แสดงเมื่อยังไม่พิมพ์อะไร
+    tables   -> ตารางที่ถ้าถูก bump แล้วต้องสร้าง index ใหม่
+    key      -> ค่าเสริมสำหรับหมดอายุ (เช่น นาทีปัจจุบัน ถ้า label มีสถานะที่ขึ้นกับเวลา)
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[tuple]], tables: tuple[str, ...],
+                 key: Callable[[], object] | None = None):
+        self.loader = loader
+        self.tables = tables
+        self.key = key
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._index: _Index | None = None
+        self._lru: OrderedDict = OrderedDict()
+
+    def _current(self) -> tuple[_Index, tuple]:
+        stamp = (version(*self.tables), self.key() if self.key else None)
+        with self._lock:
+            if self._index is None or self._stamp != stamp:
+                self._index = _Index(self.loader())
+                self._stamp = stamp
+                self._lru.clear()
+            return self._index, stamp
+
+    def options(self, search: str | None = None, selected=None,
+                limit: int = DEFAULT_LIMIT) -> list[dict]:
+        """top-N ที่ตรง search + ค่าที่เลือกอยู่ (ให้ dropdown แสดง label ได้)"""
+        idx, stamp = self._current()
+        k = (stamp, normalize(search), limit)
+        with self._lock:
+            hit = self._lru.get(k)
+            if hit is not None:
+                self._lru.move_to_end(k)
+        if hit is None:
+            hit = idx.search(search or "", limit)
+            with self._lock:
+                self._lru[k] = hit
+                if len(self._lru) > _LRU_SIZE:
+                    self._lru.popitem(last=False)
+
+        opts = [{"label": idx.labels[p], "value": idx.values[p]} for p in hit]
+        shown = {o["value"] for o in opts}
+        chosen = selected if isinstance(selected, list) else ([] if selected is None else [selected])
+        for v in chosen:
+            if v not in shown:
+                opts.insert(0, {"label": idx.by_value.get(v, str(v)), "value": v})
+        return opts
+
+    def label(self, value) -> str | None:
+        return self._current()[0].by_value.get(value)
+
+
+def sql_loader(sql: str) -> Callable[[], list[tuple]]:
+    """loader จาก SQL ที่คืนคอลัมน์ value, label"""
+    def load():
+        with engine.begin() as conn:
+            return [(r[0], r[1]) for r in conn.execute(text(sql)).all()]
+    return load
+
+
+PROVIDERS: dict[str, Provider] = {
+    "cars": Provider(sql_loader("SELECT id, plate FROM cars ORDER BY plate"), ("cars",)),
+    # รถสภาพปกติ (หน้าเบิก)
+    "cars_normal": Provider(sql_loader("""
+        SELECT id, plate FROM cars
+        WHERE COALESCE(car_condition,'ปกติ') = 'ปกติ'
+        ORDER BY plate
+    """), ("cars",)),
+    # รถที่ยังไม่สูญหาย (หน้าจองรถ)
+    "cars_active": Provider(sql_loader("""
+        SELECT id, plate FROM cars
+        WHERE car_condition != 'สูญหาย'
+        ORDER BY plate
+    """), ("cars",)),
+    # รถว่าง + ยี่ห้อ/รุ่น
+    "cars_available": Provider(sql_loader("""
+        SELECT id, trim(plate || ' (' || COALESCE(brand,'') || ' ' || COALESCE(model,'') || ')')
+        FROM cars WHERE status = 'available'
+        ORDER BY plate
+    """), ("cars",)),
+    "users": Provider(sql_loader("SELECT id, full_name FROM users ORDER BY full_name"), ("users",)),
+    # value = ชื่อ (car_calendar เก็บชื่อผู้ใช้เป็นข้อความ)
+    "user_names": Provider(sql_loader("SELECT full_name, full_name FROM users ORDER BY full_name"), ("users",)),
+}
+
+def register(name: str, provider: Provider) -> Provider:
+    PROVIDERS[name] = provider
+    return provider
+
+def options(name: str, search: str | None = None, selected=None, limit: int = DEFAULT_LIMIT) -> list[dict]:
+    return PROVIDERS[name].options(search, selected, limit)
+
+
+def attach(dropdown_id: str, name: str, limit: int = DEFAULT_LIMIT):
+    """ผูก search_value/value ของ dropdown เข้ากับ provider
+
+    ใช้ allow_duplicate เพราะหลายหน้ามี callback อื่นที่เขียน options ของ dropdown เดียวกัน
+    (options ตั้งต้นให้ใส่ใน layout ด้วย options(name))
+    """
+    @callback(
+        Output(dropdown_id, "options", allow_duplicate=True),
+        Input(dropdown_id, "search_value"),
+        Input(dropdown_id, "value"),
+        prevent_initial_call=True,
+    )
+    def _search(search_value, value):
+        return options(name, search_value, value, limit)
+
+    return _search
@@ -0,0 +1,108 @@
+# fleet/usage_service.py
+"""งานเขียนของการเบิก/คืนรถ ใช้ร่วมกันระหว่างหน้า Usage และ JSON API"""
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.exc import IntegrityError
+from fleet.db import SessionLocal
+from fleet.archive import NEXT_USAGE_ID
+from fleet.cache import bump
+from fleet.fiscal import now_local
+from fleet.models import UsageLog, Car, User
+
+
+class UsageError(ValueError):
+    """ข้อผิดพลาดที่แสดงให้ผู้ใช้เห็นได้ตรง ๆ"""
+
+class AlreadyReturned(UsageError):
+    pass
+
+
+# id ใส่เองด้วย NEXT_USAGE_ID (ไม่ซ้ำกับ id ที่ย้ายไป usage_logs_archive แล้ว) ; เวลาเก็บรูปแบบเดียวกับ ORM
+_CHECKOUT_SQL = text(f"""
+    INSERT INTO usage_logs (id, car_id, borrower_id, start_time, planned_end_time, purpose, is_maintenance)
+    VALUES ({NEXT_USAGE_ID}, :car_id, :borrower_id, :start_time, :planned_end_time, :purpose, :is_maintenance)
+""").bindparams(bindparam("start_time", type_=DateTime), bindparam("planned_end_time", type_=DateTime))
+
+
+def ensure_car_available(conn, car_id: int):
+    row = conn.execute(text("""
+        SELECT 1
+        FROM usage_logs
+        WHERE car_id = :cid AND returned_at IS NULL
+        LIMIT 1
+    """), {"cid": int(car_id)}).first()
+    if row:
+        # ถ้าคันนี้ยังมีรายการค้างอยู่ ให้ยกเลิกการบันทึก
+        raise UsageError("รถคันนี้ยังไม่ถูกคืนจากรายการเดิม")
+
+
+def checkout(car_id: int, borrower_id: int, start_dt: datetime,
+             planned_end_dt: datetime | None = None, purpose: str | None = None,
+             is_maint: bool = False) -> int:
+    """เบิกรถ -> คืน id ของ usage_logs ที่สร้าง"""
+    if not car_id or not borrower_id or not start_dt:
+        raise UsageError("โปรดเลือกทะเบียนรถ/ผู้เบิก และวันเวลาเริ่ม")
+    if planned_end_dt and planned_end_dt < start_dt:
+        raise UsageError("กำหนดวันคืนต้องไม่ก่อนเวลาเริ่ม")
+    with SessionLocal() as s:
+        car = s.get(Car, car_id)
+        user = s.get(User, borrower_id)
+        if not car or not user:
+            raise UsageError("ไม่พบรถหรือผู้ใช้")
+        # กันทับซ้อน
+        if car.status in ("in_use", "maintenance"):
+            raise UsageError(f"รถ {car.plate} อยู่ในสถานะ {car.status} อยู่แล้ว")
+        try:
+            usage_id = s.execute(_CHECKOUT_SQL, {
+                "car_id": car.id,
+                "borrower_id": user.id,
+                "start_time": start_dt,
+                "planned_end_time": planned_end_dt,
+                "purpose": (purpose or "").strip() or None,
+                "is_maintenance": int(bool(is_maint)),
+            }).lastrowid
+            # อัปเดตสถานะรถ
+            car.status = "maintenance" if is_maint else "in_use"
+            s.commit()
+        except IntegrityError as e:
+            s.rollback()
+            raise UsageError(f"บันทึกไม่สำเร็จ: {e.orig}") from e
+        bump("usage_logs", "cars")
+        return int(usage_id)
+
+
+def return_usage(usage_id: int, end_dt: datetime | None = None) -> int:
+    """ปิดรายการการใช้งาน (ตั้ง returned_at) และคืนสถานะรถเป็น available -> คืน car_id"""
+    end_dt = end_dt or now_local()
+    with SessionLocal() as s:
+        usg = s.get(UsageLog, usage_id)
+        if not usg:
+            raise UsageError(f"ไม่พบรายการการใช้ #{usage_id}")
+        if usg.returned_at:
+            raise AlreadyReturned(f"รายการ #{usage_id} คืนรถแล้วก่อนหน้า")
+        # ป้องกันกรณีคืนก่อนเวลาเริ่ม
+        if end_dt < usg.start_time:
+            raise UsageError("เวลาคืนรถต้องไม่ก่อนเวลาเริ่มใช้")
+
+        usg.returned_at = end_dt
+        car = s.get(Car, usg.car_id)
+        if car:
+            car.status = "available"
+        car_id = int(usg.car_id)
+        s.commit()
+        bump("usage_logs", "cars")
+        return car_id
+
+
+def delete_usage(usage_id: int) -> None:
+    with SessionLocal() as s:
+        u = s.get(UsageLog, usage_id)
+        if not u:
+            raise UsageError("ไม่พบรายการที่จะลบ")
+        # ถ้ายังไม่คืน ให้ปล่อยรถกลับ available
+        if u.returned_at is None and u.car:
+            u.car.status = "available"
+        s.delete(u)
+        s.commit()
+    bump("usage_logs", "cars")
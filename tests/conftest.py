@@ -0,0 +1,44 @@
+# tests/conftest.py
+"""ทุก test ใช้ไฟล์ SQLite ชั่วคราว (ตั้ง FLEET_DB_URL ก่อน import fleet.db) ; ไม่แตะฐานข้อมูลจริง"""
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = Path(tempfile.mkdtemp(prefix="fleet-tests-"))
+os.environ["FLEET_DB_URL"] = f"sqlite:///{(_TMP / 'fleet.db').as_posix()}"
+os.environ["FLEET_SCHEDULER"] = "0"
+os.environ["FLEET_CACHE_URL"] = "memory"
+os.environ.setdefault("FLEET_BACKUP_DIR", str(_TMP / "backups"))
+os.environ.setdefault("FLEET_SNAPSHOT_DIR", str(_TMP / "snapshots"))
+os.environ.setdefault("FLEET_JOBS_DIR", str(_TMP / "jobs_cache"))
+
+
+@pytest.fixture
+def db():
+    """schema จริง (init_db) บนฐานข้อมูลว่าง ; คืน engine"""
+    from sqlalchemy import text
+    from fleet.db import engine, init_db
+
+    engine.echo = False
+    init_db()
+    with engine.begin() as conn:
+        tables = [r[0] for r in conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")).all()]
+        for t in tables:
+            conn.execute(text(f'DELETE FROM "{t}"'))
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'")).first():
+            conn.execute(text("DELETE FROM sqlite_sequence"))
+    yield engine
+
+
+@pytest.fixture
+def fleet_data(db):
+    """รถ 3 คัน (id 1-3) + ผู้ใช้ 2 คน (id 1-2)"""
+    from sqlalchemy import text
+
+    with db.begin() as conn:
+        conn.execute(text("INSERT INTO cars (plate) VALUES ('กข 1'), ('กข 2'), ('กข 3')"))
+        conn.execute(text("INSERT INTO users (full_name) VALUES ('สมชาย'), ('สมหญิง')"))
+    return db
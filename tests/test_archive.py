@@ -0,0 +1,80 @@
+# tests/test_archive.py
+"""archive.run: ย้ายแถวเก่าไป *_archive เป็น batch โดยข้อมูลที่มองผ่าน view *_all และ rollup ไม่เปลี่ยน"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from fleet import archive
+from fleet.usage_service import checkout, delete_usage, return_usage
+
+TABLES = ("usage_logs", "maintenance_orders", "maintenance_items", "maintenance_committee")
+
+
+@pytest.fixture
+def history(fleet_data):
+    """ประวัติปีงบฯ 2568 (ย้ายได้เมื่อเก็บ 1 ปีงบฯ) + รายการปีนี้ ; คืน id ของรายการใช้รถ"""
+    ids = []
+    for i in range(5):
+        st = datetime(2025, 3, 3, 8, 0) + timedelta(days=7 * i)
+        uid = checkout(1 + i % 3, 1 + i % 2, st)
+        return_usage(uid, st + timedelta(hours=3 + i))
+        ids.append(uid)
+    ids.append(checkout(1, 2, datetime(2026, 10, 19, 9, 0)))          # ยังไม่คืน + ปีปัจจุบัน
+    with fleet_data.begin() as conn:
+        for i, accept in enumerate(("2025-01-10", "2025-02-11", "2025-06-12", None, "2026-10-05")):
+            oid = conn.execute(text("""
+                INSERT INTO maintenance_orders (car_id, repair_date, accept_date, grand_total)
+                VALUES (:car, '2025-01-01', :acc, :total)
+            """), {"car": 1 + i % 3, "acc": accept, "total": 1000.0 * (i + 1)}).lastrowid
+            conn.execute(text("INSERT INTO maintenance_items (order_id, item_no, amount) VALUES (:o, 1, 10), (:o, 2, 20)"),
+                         {"o": oid})
+            conn.execute(text("INSERT INTO maintenance_committee (order_id, user_id) VALUES (:o, 1), (:o, 2)"),
+                         {"o": oid})
+    return ids
+
+
+def _state(engine):
+    with engine.connect() as conn:
+        def rows(sql):
+            return conn.execute(text(sql)).all()
+        return {
+            **{t: rows(f"SELECT COUNT(*), IFNULL(SUM(rowid), 0) FROM {t}_all") for t in TABLES},
+            "usage_daily": rows("SELECT car_id, day, trips, round(hours, 6) FROM usage_daily ORDER BY 1, 2"),
+            "maint_monthly": rows("SELECT car_id, month, orders, spend FROM maint_monthly ORDER BY 1, 2"),
+        }
+
+def _triggers(engine):
+    names = ", ".join(f"'{t}'" for t in TABLES)
+    with engine.connect() as conn:
+        return sorted(conn.execute(text(
+            f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({names})")).all())
+
+
+def test_batches_keep_all_views_and_rollups(history, fleet_data):
+    before = _state(fleet_data)
+    res = archive.run(keep_fy=1, batch=1)                          # batch ละแถว -> วนหลายรอบ
+    assert res["rows"] == {"usage_logs": 5, "maintenance_orders": 3,
+                           "maintenance_items": 6, "maintenance_committee": 6}
+    assert _state(fleet_data) == before
+    with fleet_data.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM usage_logs")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM maintenance_orders")).scalar() == 2
+
+
+def test_run_restores_triggers(history, fleet_data):
+    before = _triggers(fleet_data)
+    assert any(not name.startswith("tv_") for name, _ in before)
+    archive.run(keep_fy=1)
+    assert _triggers(fleet_data) == before
+
+
+def test_checkout_after_archiving_does_not_reuse_ids(history, fleet_data):
+    archive.run(keep_fy=1)
+    delete_usage(history[-1])                      # ตารางร้อนว่าง ; id สูงสุดอยู่ใน archive
+    new = checkout(2, 1, datetime(2026, 10, 19, 10, 0))
+    with fleet_data.connect() as conn:
+        archived = conn.execute(text("SELECT id FROM usage_logs_archive")).scalars().all()
+        ids = conn.execute(text("SELECT id FROM usage_logs_all")).scalars().all()
+    assert new > max(archived)
+    assert len(ids) == len(set(ids))
@@ -0,0 +1,14 @@
+# tests/test_attachments.py
+"""ไฟล์แนบ: uploaded_at เป็นเวลาไทย (ไม่ใช่ CURRENT_TIMESTAMP ซึ่งเป็น UTC)"""
+from datetime import datetime
+
+from fleet import attachments
+
+
+def test_uploaded_at_is_bangkok_time(fleet_data, tmp_path, monkeypatch):
+    monkeypatch.setitem(attachments.ENTITY_DIRS, "car", tmp_path)
+    monkeypatch.setattr(attachments, "now_local", lambda: datetime(2026, 10, 19, 13, 5, 0))
+    row = attachments.save_attachment("car", 1, b"%PDF-1.4 test", filename="ใบเสร็จ.pdf")
+    assert row["uploaded_at"] == "2026-10-19 13:05:00"
+    assert row["mime"] == "application/pdf"
+
@@ -0,0 +1,163 @@
+# tests/test_cache_redis.py
+"""RedisBackend (fleet/cache.py) กับเซิร์ฟเวอร์ RESP จำลอง (socketserver) ; ไม่ต้องมี Redis จริง
+
+    python -m pytest -q tests/test_cache_redis.py
+"""
+import socketserver
+import threading
+
+import pytest
+
+from fleet.cache import RedisBackend
+
+
+class FakeRedis(socketserver.ThreadingTCPServer):
+    """เก็บค่าใน dict ; บันทึกทุกคำสั่ง ; สั่งให้ตอบ -ERR หรือปิด connection ในคำสั่งถัดไปได้"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.password = password
+        self.data = {}
+        self.commands = []
+        self.connections = 0
+        self.fail_next = None            # None / "err" / "drop"
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*"
+        parts = []
+        for _ in range(int(line[1:-2])):
+            n = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(n + 2)[:-2])
+        return parts
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.connections += 1
+        authed = srv.password is None
+        while True:
+            parts = self._read_command()
+            if parts is None:
+                return
+            cmd = parts[0].decode().upper()
+            with srv.lock:
+                srv.commands.append([cmd] + parts[1:])
+                fail, srv.fail_next = srv.fail_next, None
+            if fail == "drop":
+                return
+            if fail == "err":
+                self.wfile.write(b"-ERR injected\r\n")
+            elif cmd == "AUTH":
+                authed = parts[-1].decode() == srv.password
+                self.wfile.write(b"+OK\r\n" if authed else b"-WRONGPASS invalid password\r\n")
+            elif not authed:
+                self.wfile.write(b"-NOAUTH Authentication required.\r\n")
+            elif cmd == "SELECT":
+                self.wfile.write(b"+OK\r\n")
+            elif cmd == "GET":
+                value = srv.data.get(parts[1])
+                if value is None:
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+            elif cmd == "SET":
+                srv.data[parts[1]] = parts[2]
+                self.wfile.write(b"+OK\r\n")
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+            self.wfile.flush()
+
+
+@pytest.fixture
+def server():
+    srv = FakeRedis()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def auth_server():
+    srv = FakeRedis(password="s3cret")
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_get_miss_returns_none(server):
+    r = RedisBackend(f"redis://{server.url}/0")
+    assert r.get("nope") is None
+    assert server.commands == [["GET", b"nope"]]
+
+
+def test_set_ex_then_get_hit(server):
+    r = RedisBackend(f"redis://{server.url}/0")
+    payload = b"\x00\r\nbinary\xff" * 100          # มี \r\n อยู่ในค่า -> ต้องอ่านตามความยาว ไม่ใช่ตามบรรทัด
+    r.set("k", payload, ttl=42)
+    assert server.commands[-1] == ["SET", b"k", payload, b"EX", b"42"]
+    assert r.get("k") == payload
+    assert server.connections == 1                  # ใช้ socket เดิมของ thread
+
+
+def test_error_reply_then_reconnect(server):
+    r = RedisBackend(f"redis://{server.url}/0")
+    r.set("k", b"v")
+    server.fail_next = "err"
+    assert r.get("k") is None                       # -ERR -> miss (ไม่ raise)
+    assert r.get("k") == b"v"
+    assert server.connections == 2
+
+
+def test_dropped_connection_then_reconnect(server):
+    r = RedisBackend(f"redis://{server.url}/0")
+    r.set("k", b"v")
+    server.fail_next = "drop"
+    assert r.get("k") is None                       # server ปิด connection กลางคำสั่ง
+    assert r.get("k") == b"v"
+    assert server.connections == 2
+
+
+def test_server_down_is_a_miss():
+    srv = FakeRedis()
+    url = srv.url
+    srv.server_close()                              # ไม่มีใครฟัง port นี้แล้ว
+    r = RedisBackend(f"redis://{url}/0", timeout=0.2)
+    assert r.get("k") is None
+    r.set("k", b"v")                                # ไม่ raise
+
+
+def test_auth_and_select_on_connect(auth_server):
+    r = RedisBackend(f"redis://:s3cret@{auth_server.url}/3")
+    r.set("k", b"v")
+    assert auth_server.commands[:2] == [["AUTH", b"s3cret"], ["SELECT", b"3"]]
+    assert r.get("k") == b"v"
+
+
+def test_auth_with_username(auth_server):
+    r = RedisBackend(f"redis://app:s3cret@{auth_server.url}/0")
+    r.set("k", b"v")
+    assert auth_server.commands[0] == ["AUTH", b"app", b"s3cret"]
+    assert not any(c[0] == "SELECT" for c in auth_server.commands)     # db 0 -> ไม่ต้อง SELECT
+
+
+def test_wrong_password_is_a_miss_and_retries(auth_server):
+    auth_server.data[b"k"] = b"v"
+    bad = RedisBackend(f"redis://:wrong@{auth_server.url}/0")
+    assert bad.get("k") is None
+    assert bad.get("k") is None
+    assert auth_server.connections == 2             # ต่อใหม่ทุกครั้งหลัง AUTH ไม่ผ่าน
+    assert RedisBackend(f"redis://:s3cret@{auth_server.url}/0").get("k") == b"v"
@@ -0,0 +1,66 @@
+# tests/test_importer.py
+"""นำเข้าประวัติการใช้รถ: รายการที่ช่วง [start_time, returned_at) ทับกันของรถคันเดียวกันไม่ถูกเขียน"""
+import io
+from datetime import datetime
+
+from sqlalchemy import text
+
+from fleet import importer
+from fleet.usage_service import checkout, return_usage
+
+HEADER = "plate,borrower,start_time,returned_at\n"
+
+
+def _run(rows, dry_run=False):
+    data = (HEADER + "".join(f"{r}\n" for r in rows)).encode("utf-8")
+    return importer.run("usage", io.BytesIO(data), filename="trips.csv", dry_run=dry_run)
+
+
+def _errors(res):
+    return {e["row"]: e["message"] for e in res["errors"]}
+
+
+def test_overlap_within_file(fleet_data):
+    res = _run([
+        "กข 1,สมชาย,2026-01-05 08:00,2026-01-05 12:00",
+        "กข 1,สมหญิง,2026-01-05 11:00,2026-01-05 13:00",     # ทับแถวบน
+        "กข 1,สมหญิง,2026-01-05 12:00,2026-01-05 12:30",     # ทับแถวก่อนหน้า (11:00-13:00) ในไฟล์
+        "กข 1,สมหญิง,2026-01-05 13:00,2026-01-05 15:00",     # เริ่มตอนแถวก่อนหน้าคืน -> ไม่ทับ
+        "กข 2,สมหญิง,2026-01-05 11:00,2026-01-05 13:00",     # คนละคัน
+        "กข 3,สมชาย,2026-01-06 09:00,2026-01-06 10:00",
+        "กข 3,สมชาย,2026-01-04 09:00,2026-01-07 09:00",      # เริ่มก่อน -> แถวบนเป็นฝ่ายทับ
+    ])
+    errs = _errors(res)
+    assert res["inserted"] == 4
+    assert set(errs) == {3, 4, 7}
+    assert set(errs.values()) == {"ช่วงเวลาทับกับรายการอื่นของรถคันนี้ในไฟล์"}
+
+
+def test_overlap_with_existing_trips(fleet_data):
+    done = checkout(1, 1, datetime(2026, 1, 5, 8, 0))
+    return_usage(done, datetime(2026, 1, 5, 12, 0))
+    checkout(2, 1, datetime(2026, 1, 10, 8, 0))                # ยังไม่คืน -> ไม่มีเวลาสิ้นสุด
+    res = _run([
+        "กข 1,สมหญิง,2026-01-05 07:00,2026-01-05 09:00",     # คืนหลังรายการเดิมเริ่ม
+        "กข 1,สมหญิง,2026-01-05 09:00,2026-01-05 10:00",     # อยู่ในรายการเดิม
+        "กข 1,สมหญิง,2026-01-05 12:00,2026-01-05 14:00",     # เริ่มตอนรายการเดิมคืน -> ผ่าน
+        "กข 2,สมหญิง,2026-01-09 08:00,2026-01-09 18:00",     # ก่อนรายการที่ยังไม่คืน -> ผ่าน
+        "กข 2,สมหญิง,2026-02-01 08:00,2026-02-01 18:00",     # หลังเริ่มรายการที่ยังไม่คืน
+        "กข 1,สมชาย,2026-01-05 08:00,2026-01-05 12:00",      # ซ้ำ (รถ + เวลาเริ่ม)
+    ])
+    errs = _errors(res)
+    assert res["inserted"] == 2
+    assert set(errs) == {2, 3, 6, 7}
+    assert errs[7] == "มีรายการนี้อยู่แล้ว (รถ + เวลาเริ่ม)"
+    assert errs[2] == errs[3] == errs[6] == "ช่วงเวลาทับกับรายการที่มีอยู่แล้วของรถคันนี้"
+
+
+def test_overlap_across_chunks(fleet_data, monkeypatch):
+    monkeypatch.setattr(importer, "CHUNK", 1)
+    res = _run([
+        "กข 3,สมชาย,2026-03-01 08:00,2026-03-01 12:00",
+        "กข 3,สมหญิง,2026-03-01 10:00,2026-03-01 11:00",
+    ])
+    assert res["inserted"] == 1 and set(_errors(res)) == {3}
+    with fleet_data.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM usage_logs WHERE car_id = 3")).scalar() == 1
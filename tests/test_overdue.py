@@ -0,0 +1,37 @@
+# tests/test_overdue.py
+"""สถานะ overdue / scheduler.detect_overdue ใช้เวลาไทย ไม่ใช่นาฬิกาของเครื่อง server"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from fleet import queries, scheduler
+from fleet.usage_service import checkout, return_usage
+
+NOW = datetime(2026, 10, 19, 13, 0)          # เวลาไทย
+
+
+def test_sql_now_defaults_to_bangkok_time():
+    bangkok = datetime.now(ZoneInfo("Asia/Bangkok")).replace(tzinfo=None)
+    got = datetime.strptime(queries.sql_now(), "%Y-%m-%d %H:%M:%S")
+    assert abs(got - bangkok) < timedelta(seconds=5)
+
+
+def test_detect_overdue_at_fixed_time(fleet_data):
+    late = checkout(1, 1, NOW - timedelta(hours=5), planned_end_dt=NOW - timedelta(hours=1))
+    checkout(2, 1, NOW - timedelta(hours=5), planned_end_dt=NOW + timedelta(hours=1))      # ยังไม่ถึงกำหนด
+    done = checkout(3, 2, NOW - timedelta(hours=5), planned_end_dt=NOW - timedelta(hours=2))
+    return_usage(done, NOW - timedelta(hours=3))
+
+    events = scheduler.detect_overdue(now=NOW)
+    assert [e["entity_id"] for e in events] == [late]
+    assert events[0]["kind"] == "usage.overdue"
+    assert scheduler.detect_overdue(now=NOW) == []            # dedup_key: บันทึกครั้งเดียว
+    assert queries.get_usage(late, now=NOW)["status"] == "overdue"
+    assert queries.get_usage(late, now=NOW - timedelta(hours=2))["status"] == "in_use"
+
+
+def test_detect_overdue_default_now_is_local(fleet_data, monkeypatch):
+    # เวลาไทยเลยกำหนดไปแล้ว 1 ชม. ; ไม่ส่ง now -> ต้องใช้ fiscal.now_local() ไม่ใช่ datetime.now()
+    late = checkout(1, 1, NOW - timedelta(hours=5), planned_end_dt=NOW - timedelta(hours=1))
+    monkeypatch.setattr(queries, "now_local", lambda: NOW)
+    assert [e["entity_id"] for e in scheduler.detect_overdue()] == [late]
+    assert [r["id"] for r in queries.fetch_usage(status="overdue")] == [late]
@@ -0,0 +1,20 @@
+# tests/test_query_plans.py
+"""python -m fleet.plancheck บน DB จำลองขนาดเล็ก: ตัวอ่านของหน้าเว็บ/API ต้องไม่ SCAN ตารางร้อน
+
+plancheck ตั้ง FLEET_DB_URL เองตอน import -> รันเป็น process แยก
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_plancheck_passes(tmp_path):
+    env = {**os.environ, "FLEET_PLANCHECK_DB": str(tmp_path / "plancheck.db"), "FLEET_PLANCHECK_SCALE": "0.01"}
+    env.pop("FLEET_DB_URL", None)
+    proc = subprocess.run([sys.executable, "-m", "fleet.plancheck"], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=300)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    assert "usage.page " in proc.stdout
@@ -0,0 +1,59 @@
+# tests/test_rollups.py
+"""rollup ที่ trigger อัปเดตทีละแถว (เพิ่ม / คืน / แก้ / ลบ) ต้องเท่ากับ rebuild_rollups() จากตารางต้นทาง"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from fleet.rollups import rebuild_rollups
+from fleet.usage_service import checkout, delete_usage, return_usage
+
+T0 = datetime(2026, 5, 4, 8, 0)
+
+
+def _rollups(engine):
+    with engine.connect() as conn:
+        return (
+            conn.execute(text("SELECT car_id, day, trips, round(hours, 6) FROM usage_daily ORDER BY 1, 2")).all(),
+            conn.execute(text("SELECT car_id, month, orders, spend FROM maint_monthly ORDER BY 1, 2")).all(),
+        )
+
+
+def test_usage_triggers_match_rebuild(fleet_data):
+    a = checkout(1, 1, T0)
+    return_usage(a, T0 + timedelta(hours=2, minutes=30))
+    b = checkout(2, 1, T0)
+    return_usage(b, T0 + timedelta(hours=5))
+    c = checkout(3, 2, T0 + timedelta(days=1))               # ยังไม่คืน -> นับเที่ยว ชั่วโมง 0
+    d = checkout(1, 2, T0 + timedelta(days=2))
+    return_usage(d, T0 + timedelta(days=2, hours=1))
+    with fleet_data.begin() as conn:
+        # แก้รถ/วันเริ่ม/ประเภท -> ย้ายยอดจากแถวเดิมไปแถวใหม่
+        conn.execute(text("UPDATE usage_logs SET car_id = 3, start_time = :st WHERE id = :id"),
+                     {"st": T0 - timedelta(days=3), "id": b})
+        conn.execute(text("UPDATE usage_logs SET is_maintenance = 1 WHERE id = :id"), {"id": c})
+    delete_usage(d)
+
+    daily, _ = _rollups(fleet_data)
+    assert daily == [(1, "2026-05-04", 1, 2.5), (3, "2026-05-01", 1, 77.0)]     # เริ่มเร็วขึ้น 3 วัน คืนเวลาเดิม
+    rebuild_rollups()
+    assert _rollups(fleet_data)[0] == daily
+
+
+def test_maintenance_triggers_match_rebuild(fleet_data):
+    with fleet_data.begin() as conn:
+        def order(car, accept, total):
+            return conn.execute(text("""
+                INSERT INTO maintenance_orders (car_id, accept_date, grand_total) VALUES (:c, :a, :t)
+            """), {"c": car, "a": accept, "t": total}).lastrowid
+        a = order(1, "2026-05-10", 1000.0)
+        order(1, "2026-05-20", 500.0)
+        b = order(2, None, 700.0)                              # ยังไม่ตรวจรับ -> ไม่นับ
+        c = order(3, "2026-06-01", 300.0)
+        conn.execute(text("UPDATE maintenance_orders SET accept_date = '2026-06-02' WHERE id = :id"), {"id": b})
+        conn.execute(text("UPDATE maintenance_orders SET grand_total = 1200.0 WHERE id = :id"), {"id": a})
+        conn.execute(text("DELETE FROM maintenance_orders WHERE id = :id"), {"id": c})
+
+    _, monthly = _rollups(fleet_data)
+    assert monthly == [(1, "2026-05", 2, 1700.0), (2, "2026-06", 1, 700.0)]
+    rebuild_rollups()
+    assert _rollups(fleet_data)[1] == monthly
@@ -0,0 +1,57 @@
+# tests/test_snapshot.py
+"""snapshot อ่านทุกตารางจาก read transaction เดียว: archive.run ที่ commit ระหว่างอ่านต้องไม่ทำให้แถวซ้ำ"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from fleet import archive, snapshot
+from fleet.usage_service import checkout, return_usage
+
+OLD = datetime(2019, 1, 7, 8, 0)
+
+
+def _old_trips():
+    ids = []
+    for car in (1, 2):
+        uid = checkout(car, 1, OLD, planned_end_dt=OLD + timedelta(hours=4))
+        return_usage(uid, OLD + timedelta(hours=3))
+        ids.append(uid)
+    checkout(3, 2, datetime(2026, 10, 19, 9, 0))      # แถว id สูงสุดไม่ถูกย้าย
+    return ids
+
+
+def test_read_transaction_sees_one_point_in_time(fleet_data):
+    old = _old_trips()
+    with snapshot._read_transaction() as conn:
+        hot = conn.execute(text("SELECT id FROM usage_logs ORDER BY id")).scalars().all()
+        moved = archive.run(keep_fy=1)                 # อีก connection ย้ายแถวแล้ว commit (WAL: ไม่ต้องรอ)
+        cold = conn.execute(text("SELECT id FROM usage_logs_archive")).scalars().all()
+    assert moved["rows"]["usage_logs"] == len(old)
+    assert cold == []                                  # ยังเห็นภาพก่อนย้าย -> ไม่มีแถวซ้ำสองฝั่ง
+    assert set(old) <= set(hot)
+    with fleet_data.connect() as conn:
+        assert sorted(conn.execute(text("SELECT id FROM usage_logs_archive")).scalars()) == old
+
+
+def test_take_during_archive_has_no_duplicate_ids(fleet_data, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    _old_trips()
+    real = snapshot._arrow_safe
+    calls = []
+
+    def archive_midway(df):                            # archive.run ทำงานระหว่าง take อ่านตาราง
+        if not calls:
+            archive.run(keep_fy=1)
+        calls.append(1)
+        return real(df)
+
+    monkeypatch.setattr(snapshot, "_arrow_safe", archive_midway)
+    snapshot.take(tmp_path)
+    ids = []
+    for table in ("usage_logs", "usage_logs_archive"):
+        for f in (tmp_path / table).glob("*.parquet"):
+            ids += pd.read_parquet(f)["id"].tolist()
+    assert len(ids) == len(set(ids)) == 3